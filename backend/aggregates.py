@@ -0,0 +1,164 @@
+"""
+Incrementally maintained statistics aggregates.
+
+statistics_aggregates holds one row per (status, commodity group) with the number of
+requests and their summed cost. The request endpoints adjust it inside their own
+transaction, so /api/statistics only reads a few dozen rows however large the
+requests table grows. Archived requests stay counted. Run this file directly to
+rebuild it from scratch if it drifts.
+
+The upserts use INSERT ... ON CONFLICT DO UPDATE, so only PostgreSQL and SQLite are
+supported; ensure_aggregates refuses any other backend at startup.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine, Base
+from models import ProcurementRequest, ArchivedProcurementRequest, StatisticsAggregate
+
+# Dialect modules whose insert() has on_conflict_do_update, by dialect name
+UPSERT_DIALECTS = {"postgresql": postgresql, "sqlite": sqlite}
+
+
+class UnsupportedDatabaseError(RuntimeError):
+    """Raised when the database backend has no INSERT ... ON CONFLICT DO UPDATE"""
+
+
+def upsert_dialect(db: Session):
+    """The dialect module to build upserts with for db's backend"""
+    name = db.get_bind().dialect.name
+    if name not in UPSERT_DIALECTS:
+        raise UnsupportedDatabaseError(
+            f"The statistics aggregates and analytics rollups need PostgreSQL or SQLite, not {name}"
+        )
+    return UPSERT_DIALECTS[name]
+
+
+def _upsert(db: Session, status: str, commodity_group, count_delta: int, cost_delta: float):
+    """Add the deltas to one aggregate row, creating it if needed"""
+    stmt = upsert_dialect(db).insert(StatisticsAggregate.__table__).values(
+        status=status,
+        commodity_group=commodity_group or "",
+        request_count=count_delta,
+        total_cost=cost_delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["status", "commodity_group"],
+        set_={
+            "request_count": StatisticsAggregate.request_count + stmt.excluded.request_count,
+            "total_cost": StatisticsAggregate.total_cost + stmt.excluded.total_cost,
+        },
+    )
+    db.execute(stmt)
+
+
+def record_created(db: Session, request: ProcurementRequest):
+    """Count a newly created request"""
+    _upsert(db, request.status, request.commodity_group, 1, request.total_cost)
+
+
+def record_created_many(db: Session, requests: list):
+    """Count a batch of new requests, given as dicts with status, commodity_group and total_cost"""
+    deltas = {}
+    for request in requests:
+        key = (request["status"], request["commodity_group"] or "")
+        count, cost = deltas.get(key, (0, 0.0))
+        deltas[key] = (count + 1, cost + request["total_cost"])
+    for (status, commodity_group), (count, cost) in deltas.items():
+        _upsert(db, status, commodity_group, count, cost)
+
+
+def record_status_change(db: Session, request: ProcurementRequest, old_status: str):
+    """Move a request from its old status bucket to its current one"""
+    if old_status == request.status:
+        return
+    _upsert(db, old_status, request.commodity_group, -1, -request.total_cost)
+    _upsert(db, request.status, request.commodity_group, 1, request.total_cost)
+
+
+def record_status_changes(db: Session, requests: list, old_statuses: dict):
+    """Move a batch of requests, already carrying their new status, out of their old buckets"""
+    deltas = {}
+    for request in requests:
+        old_status = old_statuses[request.id]
+        if old_status == request.status:
+            continue
+        for status, sign in ((old_status, -1), (request.status, 1)):
+            key = (status, request.commodity_group or "")
+            count, cost = deltas.get(key, (0, 0.0))
+            deltas[key] = (count + sign, cost + sign * request.total_cost)
+    for (status, commodity_group), (count, cost) in deltas.items():
+        _upsert(db, status, commodity_group, count, cost)
+
+
+def rebuild_aggregates(db: Session):
+    """Recompute all aggregate rows from the live and archived requests"""
+    totals = {}
+    for model in (ProcurementRequest, ArchivedProcurementRequest):
+        group = func.coalesce(model.commodity_group, "")
+        rows = db.query(
+            model.status, group, func.count(model.id), func.coalesce(func.sum(model.total_cost), 0.0)
+        ).group_by(model.status, group)
+        for status, commodity_group, count, total in rows:
+            previous_count, previous_total = totals.get((status, commodity_group), (0, 0.0))
+            totals[(status, commodity_group)] = (previous_count + count, previous_total + total)
+
+    db.query(StatisticsAggregate).delete()
+    db.add_all([
+        StatisticsAggregate(status=status, commodity_group=group, request_count=count, total_cost=total)
+        for (status, group), (count, total) in totals.items()
+    ])
+    db.commit()
+
+
+def ensure_aggregates(db: Session):
+    """Build the aggregates once for databases created before they existed"""
+    upsert_dialect(db)  # fail at startup rather than on the first write
+    if db.query(StatisticsAggregate).first() is None and db.query(ProcurementRequest.id).first() is not None:
+        rebuild_aggregates(db)
+
+
+def get_aggregate_statistics(db: Session) -> dict:
+    """Assemble the /api/statistics payload from the aggregate rows"""
+    status_distribution = {}
+    commodity_totals = {}
+    total_requests = 0
+    total_cost = 0.0
+
+    for row in db.query(StatisticsAggregate).filter(StatisticsAggregate.request_count > 0):
+        status_distribution[row.status] = status_distribution.get(row.status, 0) + row.request_count
+        count, value = commodity_totals.get(row.commodity_group, (0, 0.0))
+        commodity_totals[row.commodity_group] = (count + row.request_count, value + row.total_cost)
+        total_requests += row.request_count
+        total_cost += row.total_cost
+
+    commodity_breakdown = [
+        {
+            "commodity_group": group or "Unclassified",
+            "count": count,
+            "total_value": float(value)
+        }
+        for group, (count, value) in commodity_totals.items()
+    ]
+
+    return {
+        "total_requests": total_requests,
+        "status_distribution": status_distribution,
+        "commodity_breakdown": commodity_breakdown,
+        "price_stats": {
+            "total_cost": float(total_cost),
+            "average_cost": float(total_cost / total_requests) if total_requests else 0.0
+        }
+    }
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Rebuilding statistics aggregates...")
+        rebuild_aggregates(db)
+        print("✓ Statistics aggregates rebuilt")
+    finally:
+        db.close()
@@ -1,29 +1,378 @@
 import openai
 import os
+import asyncio
+import io
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 import pdfplumber
 import json
+from typing import Optional
 from commodity_groups import COMMODITY_GROUPS
+from cache import TieredCache, content_key
+from classifier import LocalClassifier
+from metrics import observe_llm_call, llm_events
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF file"""
+# PDF parsing is CPU-bound, so it runs on a bounded pool instead of the event loop
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", os.cpu_count() or 4))
+PDF_PARSE_TIMEOUT_SECONDS = float(os.getenv("PDF_PARSE_TIMEOUT_SECONDS", 60))
+pdf_executor = ThreadPoolExecutor(max_workers=PDF_MAX_WORKERS, thread_name_prefix="pdf-parse")
+
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", 200))
+
+# Batch uploads parse on separate processes so pdfplumber is not limited by the GIL
+PDF_BATCH_PROCESSES = int(os.getenv("PDF_BATCH_PROCESSES", os.cpu_count() or 4))
+_pdf_process_pool = None
+
+# Requests classified per LLM call by classify_commodity_groups
+CLASSIFICATION_BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", 20))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_client = None
+_async_client = None
+
+# Deadline of a whole LLM call, retries included, and cap on one attempt. Single
+# classifications fall back to unclassified, so they give up sooner; extractions of long
+# offers normally take 10-30 s, so their attempts get much longer
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", 20))
+CLASSIFICATION_TIMEOUT_SECONDS = float(os.getenv("CLASSIFICATION_TIMEOUT_SECONDS", 15))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", 150))
+EXTRACTION_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_ATTEMPT_TIMEOUT_SECONDS", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", 0.5))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", 8))
+# Send a duplicate request when an attempt has not answered after this long (0 = never)
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 0))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+
+# Runs the attempts of hedged synchronous calls; only used when hedging is on
+llm_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+class PdfLimitError(ValueError):
+    """Raised when an uploaded PDF exceeds the configured size or page limits"""
+
+class LLMUnavailableError(Exception):
+    """Raised without calling OpenAI while the operation's circuit breaker is open"""
+
+def _get_pdf_process_pool() -> ProcessPoolExecutor:
+    """Process pool for batch parsing, started on first use rather than at import"""
+    global _pdf_process_pool
+    if _pdf_process_pool is None:
+        _pdf_process_pool = ProcessPoolExecutor(max_workers=PDF_BATCH_PROCESSES)
+    return _pdf_process_pool
+
+def shutdown_pdf_process_pool():
+    global _pdf_process_pool
+    if _pdf_process_pool is not None:
+        _pdf_process_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_process_pool = None
+
+# Retries are ours, so the clients' built-in ones are off
+def _get_client() -> openai.OpenAI:
+    """Shared sync OpenAI client, created on first use so a missing key only fails the call"""
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=openai.api_key, max_retries=0)
+    return _client
+
+def _get_async_client() -> openai.AsyncOpenAI:
+    """Shared async OpenAI client, created on first use so a missing key only fails the call"""
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(api_key=openai.api_key, max_retries=0)
+    return _async_client
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed attempts so calls fail fast instead
+    of waiting on an upstream that is down. After reset_seconds one probe call is let
+    through; it closes the breaker if it succeeds and reopens it if it fails.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds:
+                return False
+            # A probe that never reported back (e.g. cancelled) does not block the next one forever
+            if self._probe_started is not None and now - self._probe_started < self.reset_seconds:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or (
+                self._opened_at is None and self._failures >= self.failure_threshold
+            ):
+                self._trips += 1
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": int(self._opened_at is not None), "trips": self._trips}
+
+# One breaker per operation, so slow extractions cannot cut off healthy classifications
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker_for(operation: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(operation)
+        if breaker is None:
+            breaker = _breakers[operation] = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        return breaker
+
+def breaker_stats() -> dict:
+    """(operation, stat) -> value for every breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {(operation, name): value for operation, breaker in breakers for name, value in breaker.stats().items()}
+
+def _is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx answers; anything else would fail again"""
+    return isinstance(error, (
+        TimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError
+    ))
+
+def _retry_delay(retry: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, at least as long as a rate limit's Retry-After"""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY_SECONDS, LLM_RETRY_BASE_DELAY_SECONDS * 2 ** (retry - 1)))
+    if isinstance(error, openai.RateLimitError):
+        try:
+            delay = max(delay, float(error.response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+def _observe(operation: str, start: float, response=None, error: Exception = None):
+    """Record one attempt in the metrics and the circuit breaker"""
+    observe_llm_call(operation, time.perf_counter() - start, response, error=error)
+    # Errors the API answered deliberately (bad request, auth) say nothing about its health
+    if error is not None and _is_retryable(error):
+        breaker_for(operation).record_failure()
+    else:
+        breaker_for(operation).record_success()
+
+def _give_up(operation: str, error: Exception) -> Exception:
+    if isinstance(error, (TimeoutError, openai.APITimeoutError)):
+        timeout = TimeoutError(f"OpenAI {operation} call timed out")
+        timeout.__cause__ = error
+        return timeout
+    return error
+
+def _request(operation: str, timeout: float, kwargs: dict):
+    start = time.perf_counter()
+    try:
+        response = _get_client().chat.completions.create(timeout=timeout, **kwargs)
+    except Exception as e:
+        _observe(operation, start, error=e)
+        raise
+    _observe(operation, start, response)
+    return response
+
+def _attempt(operation: str, timeout: float, kwargs: dict):
+    """One request, plus a hedged duplicate if it is slow; the first success wins"""
+    if not 0 < LLM_HEDGE_AFTER_SECONDS < timeout:
+        return _request(operation, timeout, kwargs)
+    primary = llm_hedge_executor.submit(_request, operation, timeout, kwargs)
+    if not wait([primary], timeout=LLM_HEDGE_AFTER_SECONDS).done:
+        llm_events.inc(operation, "hedge")
+        hedge = llm_hedge_executor.submit(_request, operation, timeout - LLM_HEDGE_AFTER_SECONDS, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The loser cannot be interrupted and finishes in the background
+                    if future is hedge:
+                        llm_events.inc(operation, "hedge_won")
+                    return future.result()
+                error = future.exception()
+        raise error
+    return primary.result()
+
+def _chat_completion(
+    operation: str, deadline: float = LLM_TIMEOUT_SECONDS, attempt_timeout: Optional[float] = None, **kwargs
+):
+    """
+    Chat completion that gives up after deadline seconds. Each attempt gets at most
+    attempt_timeout (LLM_ATTEMPT_TIMEOUT_SECONDS by default), transient failures are
+    retried up to LLM_MAX_RETRIES times with jittered backoff, and LLMUnavailableError is
+    raised while the operation's circuit breaker is open. Latency, token usage and errors
+    are recorded under operation.
+    """
+    attempt_timeout = attempt_timeout or LLM_ATTEMPT_TIMEOUT_SECONDS
+    expires = time.monotonic() + deadline
+    retries = 0
+    while True:
+        if not breaker_for(operation).allow():
+            llm_events.inc(operation, "short_circuit")
+            raise LLMUnavailableError(f"OpenAI is unavailable, {operation} calls are paused by the circuit breaker")
+        try:
+            return _attempt(operation, min(attempt_timeout, expires - time.monotonic()), kwargs)
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            retries += 1
+            delay = _retry_delay(retries, e)
+            if retries > LLM_MAX_RETRIES or time.monotonic() + delay >= expires:
+                raise _give_up(operation, e)
+            llm_events.inc(operation, "retry")
+            time.sleep(delay)
+
+async def _request_async(operation: str, timeout: float, kwargs: dict):
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            _get_async_client().chat.completions.create(timeout=timeout, **kwargs), timeout
+        )
+    except Exception as e:
+        _observe(operation, start, error=e)
+        raise
+    _observe(operation, start, response)
+    return response
+
+async def _attempt_async(operation: str, timeout: float, kwargs: dict):
+    """Async variant of _attempt; the losing request is cancelled"""
+    if not 0 < LLM_HEDGE_AFTER_SECONDS < timeout:
+        return await _request_async(operation, timeout, kwargs)
+    pending = {asyncio.ensure_future(_request_async(operation, timeout, kwargs))}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=LLM_HEDGE_AFTER_SECONDS)
+        if done:
+            return done.pop().result()
+        llm_events.inc(operation, "hedge")
+        hedge = asyncio.ensure_future(_request_async(operation, timeout - LLM_HEDGE_AFTER_SECONDS, kwargs))
+        pending.add(hedge)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        llm_events.inc(operation, "hedge_won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _chat_completion_async(
+    operation: str, deadline: float = LLM_TIMEOUT_SECONDS, attempt_timeout: Optional[float] = None, **kwargs
+):
+    """Async variant of _chat_completion on the shared async client"""
+    attempt_timeout = attempt_timeout or LLM_ATTEMPT_TIMEOUT_SECONDS
+    expires = time.monotonic() + deadline
+    retries = 0
+    while True:
+        if not breaker_for(operation).allow():
+            llm_events.inc(operation, "short_circuit")
+            raise LLMUnavailableError(f"OpenAI is unavailable, {operation} calls are paused by the circuit breaker")
+        try:
+            return await _attempt_async(
+                operation, min(attempt_timeout, expires - time.monotonic()), kwargs
+            )
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            retries += 1
+            delay = _retry_delay(retries, e)
+            if retries > LLM_MAX_RETRIES or time.monotonic() + delay >= expires:
+                raise _give_up(operation, e)
+            llm_events.inc(operation, "retry")
+            await asyncio.sleep(delay)
+
+classification_cache = TieredCache(
+    "classification",
+    ttl_seconds=float(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+    max_memory_entries=int(os.getenv("CLASSIFICATION_CACHE_MEMORY_ENTRIES", 2048)),
+    max_disk_entries=int(os.getenv("CLASSIFICATION_CACHE_DISK_ENTRIES", 100_000)),
+)
+
+extraction_cache = TieredCache(
+    "pdf_extraction",
+    ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+    max_memory_entries=int(os.getenv("EXTRACTION_CACHE_MEMORY_ENTRIES", 256)),
+    max_disk_entries=int(os.getenv("EXTRACTION_CACHE_DISK_ENTRIES", 10_000)),
+)
+
+local_classifier = LocalClassifier()
+
+UNCLASSIFIED = {
+    "commodity_group_id": None,
+    "commodity_group": None,
+    "confidence": "low"
+}
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+def classification_cache_key(title: str, order_lines: list) -> str:
+    """Cache key that ignores case, whitespace and order-line ordering"""
+    descriptions = sorted(_normalize(line.get('position_description', '')) for line in order_lines)
+    return content_key(_normalize(title), descriptions)
+
+def extract_text_from_pdf(pdf) -> str:
+    """Extract text from a PDF given as a file path, a binary file object or raw bytes"""
+    if isinstance(pdf, bytes):
+        pdf = io.BytesIO(pdf)
+
     text = ""
-    with pdfplumber.open(pdf_path) as pdf:
+    with pdfplumber.open(pdf) as pdf:
+        if len(pdf.pages) > MAX_PDF_PAGES:
+            raise PdfLimitError(f"PDF has {len(pdf.pages)} pages; at most {MAX_PDF_PAGES} are allowed")
         for page in pdf.pages:
             page_text = page.extract_text()
             if page_text:
                 text += page_text + "\n"
     return text
 
-def extract_vendor_offer_data(pdf_text: str) -> dict:
-    """Use OpenAI to extract structured data from vendor offer text"""
-
+def _require_api_key():
     if not openai.api_key or "your-api-key" in openai.api_key.lower():
         raise ValueError("No valid OpenAI API key found. Please set OPENAI_API_KEY in .env file")
 
+def _parse_json_response(result: str):
+    """Parse a JSON model response, tolerating markdown code fences around it"""
+    result = result.strip()
+
+    # Remove markdown code blocks from the model response if present
+    if result.startswith("```json"):
+        result = result[7:]
+    if result.startswith("```"):
+        result = result[3:]
+    if result.endswith("```"):
+        result = result[:-3]
+
+    return json.loads(result.strip())
+
+def _extraction_messages(pdf_text: str) -> list:
     prompt = f"""
 You are an AI assistant helping to extract procurement information from vendor offers.
 Extract the following information from the text below and return it as a JSON object:
@@ -47,33 +396,89 @@ Vendor Offer Text:
 
 Return ONLY valid JSON, no additional text.
 """
+    return [
+        {"role": "system", "content": "You are a data extraction assistant. Always return valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def extract_vendor_offer_data(pdf_text: str) -> dict:
+    """Use OpenAI to extract structured data from vendor offer text"""
+    _require_api_key()
 
     print("Calling OpenAI API for data extraction...")
-    response = openai.chat.completions.create(
+    response = _chat_completion(
+        "extraction",
         model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a data extraction assistant. Always return valid JSON."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1
+        messages=_extraction_messages(pdf_text),
+        temperature=0.1,
+        deadline=EXTRACTION_TIMEOUT_SECONDS,
+        attempt_timeout=EXTRACTION_ATTEMPT_TIMEOUT_SECONDS
     )
 
-    result = response.choices[0].message.content.strip()
+    result = response.choices[0].message.content
     print(f"OpenAI response: {result[:200]}...")
 
-    # Remove markdown code blocks from the model response if present
-    if result.startswith("```json"):
-        result = result[7:]
-    if result.startswith("```"):
-        result = result[3:]
-    if result.endswith("```"):
-        result = result[:-3]
+    parsed_data = _parse_json_response(result)
+    print(f"Successfully parsed data: {parsed_data}")
+    return parsed_data
 
-    parsed_data = json.loads(result.strip())
+async def extract_text_from_pdf_async(pdf) -> str:
+    """Extract text from a PDF (path or bytes) on the bounded parsing pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(pdf_executor, extract_text_from_pdf, pdf),
+        timeout=PDF_PARSE_TIMEOUT_SECONDS
+    )
+
+async def extract_text_from_pdf_in_process(pdf) -> str:
+    """Extract text from a PDF (path or bytes) on the batch process pool"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(_get_pdf_process_pool(), extract_text_from_pdf, pdf),
+        timeout=PDF_PARSE_TIMEOUT_SECONDS
+    )
+
+async def extract_vendor_offer_data_async(pdf_text: str) -> dict:
+    """Async variant of extract_vendor_offer_data, limited to LLM_MAX_CONCURRENCY calls at a time"""
+    _require_api_key()
+
+    async with llm_semaphore:
+        print("Calling OpenAI API for data extraction...")
+        response = await _chat_completion_async(
+            "extraction",
+            model="gpt-4",
+            messages=_extraction_messages(pdf_text),
+            temperature=0.1,
+            deadline=EXTRACTION_TIMEOUT_SECONDS,
+            attempt_timeout=EXTRACTION_ATTEMPT_TIMEOUT_SECONDS
+        )
+
+    result = response.choices[0].message.content
+    print(f"OpenAI response: {result[:200]}...")
+
+    parsed_data = _parse_json_response(result)
     print(f"Successfully parsed data: {parsed_data}")
     return parsed_data
 
 def classify_commodity_group(title: str, order_lines: list) -> dict:
+    """Classify the request into a commodity group, reusing earlier results for identical requests"""
+    key = classification_cache_key(title, order_lines)
+    cached = classification_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Obvious cases are answered locally; only low-confidence ones reach the LLM
+    result = local_classifier.classify(title, order_lines)
+    if result is not None:
+        return result
+
+    result = _classify_with_llm(title, order_lines)
+    # Only successful classifications are cached so failures are retried next time
+    if result.get("commodity_group_id"):
+        classification_cache.set(key, result)
+    return result
+
+def _classify_with_llm(title: str, order_lines: list) -> dict:
     """Use OpenAI to classify the request into the correct commodity group"""
 
     # commodity groups list
@@ -102,29 +507,97 @@ Return ONLY valid JSON, no additional text.
 """
 
     try:
-        response = openai.chat.completions.create(
+        response = _chat_completion(
+            "classification",
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a classification assistant. Always return valid JSON."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.1
+            temperature=0.1,
+            deadline=CLASSIFICATION_TIMEOUT_SECONDS
         )
 
-        result = response.choices[0].message.content.strip()
+        return _parse_json_response(response.choices[0].message.content)
+    except Exception as e:
+        print(f"Error classifying commodity group: {e}")
+        return dict(UNCLASSIFIED)
+
+def classify_commodity_groups(items: list) -> list:
+    """
+    Classify many (title, order_lines) pairs at once.
 
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.startswith("```"):
-            result = result[3:]
-        if result.endswith("```"):
-            result = result[:-3]
+    The cache and the local classifier answer what they can; the remaining distinct
+    requests go to the LLM in batches of CLASSIFICATION_BATCH_SIZE per call.
+    """
+    results = [None] * len(items)
+    pending = {}  # cache key -> indexes of items sharing it
 
-        return json.loads(result.strip())
+    for i, (title, order_lines) in enumerate(items):
+        key = classification_cache_key(title, order_lines)
+        cached = classification_cache.get(key)
+        if cached is None:
+            cached = local_classifier.classify(title, order_lines)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+
+    keys = list(pending)
+    for start in range(0, len(keys), CLASSIFICATION_BATCH_SIZE):
+        chunk = keys[start:start + CLASSIFICATION_BATCH_SIZE]
+        classified = _classify_batch_with_llm([items[pending[key][0]] for key in chunk])
+        for key, result in zip(chunk, classified):
+            if result.get("commodity_group_id"):
+                classification_cache.set(key, result)
+            for i in pending[key]:
+                results[i] = result
+
+    return results
+
+def _classify_batch_with_llm(items: list) -> list:
+    """Use one OpenAI call to classify several requests; failures fall back to unclassified"""
+    groups_text = "\n".join([f"{g['id']}: {g['category']} - {g['group']}" for g in COMMODITY_GROUPS])
+    requests_text = "\n\n".join(
+        f"Request {i}:\nTitle: {title}\nItems:\n"
+        + "\n".join(f"- {line.get('position_description', '')}" for line in order_lines)
+        for i, (title, order_lines) in enumerate(items)
+    )
+
+    prompt = f"""
+You are a procurement classification assistant. Classify each of the following requests into the most appropriate commodity group.
+
+{requests_text}
+
+Available Commodity Groups:
+{groups_text}
+
+Return ONLY a JSON array with one object per request, in the same order, each with:
+- index: The request number
+- commodity_group_id: The ID (e.g., "031")
+- commodity_group: The full name (e.g., "Software")
+- confidence: Your confidence level (high/medium/low)
+
+Return ONLY valid JSON, no additional text.
+"""
+
+    try:
+        response = _chat_completion(
+            "batch_classification",
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a classification assistant. Always return valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1
+        )
+
+        by_index = {entry.get("index"): entry for entry in _parse_json_response(response.choices[0].message.content)}
+        return [
+            {key: by_index[i].get(key) for key in ("commodity_group_id", "commodity_group", "confidence")}
+            if i in by_index else dict(UNCLASSIFIED)
+            for i in range(len(items))
+        ]
     except Exception as e:
-        print(f"Error classifying commodity group: {e}")
-        return {
-            "commodity_group_id": None,
-            "commodity_group": None,
-            "confidence": "low"
-        }
+        print(f"Error classifying commodity groups: {e}")
+        return [dict(UNCLASSIFIED) for _ in items]
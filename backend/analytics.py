@@ -0,0 +1,340 @@
+"""
+Spend and lead-time analytics served from incrementally maintained rollups.
+
+spend_rollups holds, per day, the number and summed cost of requests created for each
+department, vendor and commodity group. A spend query reads one dimension's day rows in
+the requested range and folds them into day, week or month buckets in SQL, so it reads a
+few rows per day of history whatever the size of the requests table.
+
+lead_time_rollups holds, per status transition and month, a histogram of how long
+requests stayed in the old status (the time since their previous status change), in
+logarithmic buckets LEAD_TIME_BUCKET_GROWTH apart, along with the fastest and slowest
+lead time seen in each bucket. Percentiles are read off the cumulative histogram and
+interpolated between those observed extremes, never beyond them. Above a minute that
+keeps them within half a bucket (about ±10%); the first bucket spans everything under a
+minute, so there they are only as precise as the spread of what was observed (sub-second
+transitions report sub-second percentiles). Counts and means are exact.
+
+The request endpoints adjust both inside their own transaction; run this file directly
+to rebuild them from the requests and status_history tables.
+"""
+import math
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, cast, func, insert, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from aggregates import upsert_dialect
+from models import (
+    ProcurementRequest, StatusHistory, ArchivedProcurementRequest, ArchivedStatusHistory,
+    SpendRollup, LeadTimeRollup
+)
+
+SPEND_DIMENSIONS = ("department", "vendor", "commodity_group")
+SPEND_INTERVALS = ("day", "week", "month")
+LEAD_TIME_PERCENTILES = (50, 90, 95, 99)
+
+# Bucket 0 holds lead times under a minute, bucket i >= 1 those in
+# [60 * growth^(i-1), 60 * growth^i) seconds; the last bucket is open-ended
+LEAD_TIME_BUCKET_GROWTH = 1.2
+LEAD_TIME_BUCKETS = 100
+
+
+def _increment(
+    db: Session, model, keys: dict, lowest: Optional[dict] = None, highest: Optional[dict] = None, **deltas
+):
+    """Add deltas to the counters of one rollup row, creating it if needed. lowest and highest
+    map columns to values that are kept only if smaller, or larger, than the stored one."""
+    lowest, highest = lowest or {}, highest or {}
+    stmt = upsert_dialect(db).insert(model.__table__).values(**keys, **deltas, **lowest, **highest)
+    # SQLite's two-argument min() and max() are scalar, like least() and greatest()
+    if db.get_bind().dialect.name == "postgresql":
+        smaller, larger = func.least, func.greatest
+    else:
+        smaller, larger = func.min, func.max
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            **{name: getattr(model, name) + stmt.excluded[name] for name in deltas},
+            **{name: smaller(getattr(model, name), stmt.excluded[name]) for name in lowest},
+            **{name: larger(getattr(model, name), stmt.excluded[name]) for name in highest},
+        },
+    )
+    db.execute(stmt)
+
+
+def _utc_date(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def duration_bucket(seconds: float) -> int:
+    if seconds < 60:
+        return 0
+    return min(1 + int(math.log(seconds / 60) / math.log(LEAD_TIME_BUCKET_GROWTH)), LEAD_TIME_BUCKETS - 1)
+
+
+def _bucket_bounds(bucket: int) -> Tuple[float, float]:
+    if bucket == 0:
+        return 0.0, 60.0
+    return 60 * LEAD_TIME_BUCKET_GROWTH ** (bucket - 1), 60 * LEAD_TIME_BUCKET_GROWTH ** bucket
+
+
+def _spend_names(request) -> Dict[str, str]:
+    return {
+        "department": request["department"],
+        "vendor": request["vendor_name"],
+        "commodity_group": request["commodity_group"] or "",
+    }
+
+
+def record_created_many(db: Session, requests: list):
+    """Count a batch of new requests, given as dicts with created_at, department, vendor_name,
+    commodity_group and total_cost"""
+    deltas = {}
+    for request in requests:
+        day = _utc_date(request["created_at"])
+        for dimension, name in _spend_names(request).items():
+            count, cost = deltas.get((dimension, day, name), (0, 0.0))
+            deltas[(dimension, day, name)] = (count + 1, cost + request["total_cost"])
+    for (dimension, day, name), (count, cost) in deltas.items():
+        _increment(
+            db, SpendRollup, {"dimension": dimension, "day": day, "name": name},
+            request_count=count, total_cost=cost
+        )
+
+
+def record_created(db: Session, request: ProcurementRequest):
+    """Count a newly created, flushed request"""
+    record_created_many(db, [{
+        "created_at": request.created_at,
+        "department": request.department,
+        "vendor_name": request.vendor_name,
+        "commodity_group": request.commodity_group,
+        "total_cost": request.total_cost,
+    }])
+
+
+def _add_transitions(deltas: dict, transitions):
+    """Fold (old_status, new_status, previous_change_at, changed_at) tuples into per-row deltas"""
+    for old_status, new_status, previous_change_at, changed_at in transitions:
+        if old_status is None or old_status == new_status or previous_change_at is None:
+            continue
+        seconds = max((_utc_naive(changed_at) - _utc_naive(previous_change_at)).total_seconds(), 0.0)
+        key = (old_status, new_status, _utc_date(changed_at).replace(day=1), duration_bucket(seconds))
+        count, total, fastest, slowest = deltas.get(key, (0, 0.0, seconds, seconds))
+        deltas[key] = (count + 1, total + seconds, min(fastest, seconds), max(slowest, seconds))
+
+
+def _write_transitions(db: Session, deltas: dict):
+    for (old_status, new_status, month, bucket), (count, total, fastest, slowest) in deltas.items():
+        _increment(
+            db, LeadTimeRollup,
+            {"from_status": old_status, "to_status": new_status, "month": month, "bucket": bucket},
+            lowest={"min_seconds": fastest}, highest={"max_seconds": slowest},
+            transition_count=count, total_seconds=total
+        )
+
+
+def record_transitions(db: Session, transitions: list):
+    """
+    Count status transitions, given as (old_status, new_status, previous_change_at, changed_at)
+    tuples where previous_change_at is when the request entered old_status.
+    """
+    deltas = {}
+    _add_transitions(deltas, transitions)
+    _write_transitions(db, deltas)
+
+
+def last_status_change(db: Session, request_id: int) -> Optional[datetime]:
+    """When the request entered its current status; call before adding the new history row"""
+    return last_status_changes(db, [request_id]).get(request_id)
+
+
+def last_status_changes(db: Session, request_ids: List[int]) -> Dict[int, datetime]:
+    """last_status_change for many requests in one query"""
+    if not request_ids:
+        return {}
+    return dict(db.query(StatusHistory.request_id, func.max(StatusHistory.changed_at)).filter(
+        StatusHistory.request_id.in_(request_ids)
+    ).group_by(StatusHistory.request_id).all())
+
+
+def rebuild_spend_rollups(db: Session):
+    """Recompute the spend rollups from the live and archived requests"""
+    db.query(SpendRollup).delete()
+    requests = union_all(*[
+        select(
+            model.created_at, model.department, model.vendor_name.label("vendor"),
+            func.coalesce(model.commodity_group, "").label("commodity_group"), model.total_cost
+        )
+        for model in (ProcurementRequest, ArchivedProcurementRequest)
+    ]).subquery()
+    day = func.date(requests.c.created_at)
+    for dimension in SPEND_DIMENSIONS:
+        column = requests.c[dimension]
+        db.execute(insert(SpendRollup).from_select(
+            ["dimension", "day", "name", "request_count", "total_cost"],
+            select(
+                literal(dimension), day, column, func.count(), func.coalesce(func.sum(requests.c.total_cost), 0.0)
+            ).group_by(day, column)
+        ))
+    db.commit()
+
+
+def rebuild_lead_time_rollups(db: Session, batch_size: int = 50_000):
+    """Recompute the lead-time rollups from the live and archived status history"""
+    db.query(LeadTimeRollup).delete()
+    deltas = {}
+    # A request's history is archived with it, so each table holds whole histories
+    for model in (StatusHistory, ArchivedStatusHistory):
+        previous_change_at = func.lag(model.changed_at, type_=DateTime).over(
+            partition_by=model.request_id, order_by=(model.changed_at, model.id)
+        )
+        rows = db.execute(
+            select(model.old_status, model.new_status, previous_change_at, model.changed_at),
+            execution_options={"yield_per": batch_size}
+        )
+        for partition in rows.partitions():
+            _add_transitions(deltas, partition)
+    _write_transitions(db, deltas)
+    db.commit()
+
+
+def ensure_analytics(db: Session):
+    """Build the rollups once for databases created before they existed"""
+    # create_all does not add columns to an existing table, so recreate it if it predates them
+    columns = {column["name"] for column in inspect(db.get_bind()).get_columns(LeadTimeRollup.__tablename__)}
+    if not {"min_seconds", "max_seconds"} <= columns:
+        LeadTimeRollup.__table__.drop(db.get_bind())
+        LeadTimeRollup.__table__.create(db.get_bind())
+
+    if db.query(ProcurementRequest.id).first() is None:
+        return
+    if db.query(SpendRollup).first() is None:
+        rebuild_spend_rollups(db)
+    if db.query(LeadTimeRollup).first() is None:
+        rebuild_lead_time_rollups(db)
+
+
+def _period(db: Session, interval: str):
+    """SQL expression folding SpendRollup.day into the first day of its interval"""
+    day = SpendRollup.day
+    if db.get_bind().dialect.name == "postgresql":
+        return day if interval == "day" else cast(func.date_trunc(interval, day), Date)
+    if interval == "week":
+        # Forward to the week's Sunday, then back to its Monday, as ISO weeks run Monday to Sunday
+        return func.date(day, "weekday 0", "-6 days")
+    if interval == "month":
+        return func.strftime("%Y-%m-01", day)
+    return day
+
+
+def get_spend(
+    db: Session,
+    interval: str,
+    group_by: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> dict:
+    """Request count and spend per interval and per value of the group_by dimension"""
+    period = _period(db, interval).label("period")
+    query = db.query(
+        period, SpendRollup.name, func.sum(SpendRollup.request_count), func.sum(SpendRollup.total_cost)
+    ).filter(SpendRollup.dimension == group_by, SpendRollup.request_count > 0)
+    if date_from:
+        query = query.filter(SpendRollup.day >= date_from)
+    if date_to:
+        query = query.filter(SpendRollup.day <= date_to)
+
+    buckets = [
+        {
+            "period": str(period_start)[:10],
+            group_by: name or "Unclassified",
+            "request_count": count,
+            "total_cost": float(cost),
+        }
+        for period_start, name, count, cost in query.group_by(period, SpendRollup.name).order_by(period, SpendRollup.name)
+    ]
+    return {"interval": interval, "group_by": group_by, "buckets": buckets}
+
+
+def _percentile(histogram: List[Tuple[int, int, float, float]], total: int, percentile: float) -> float:
+    """
+    Seconds below which percentile% of the transitions fall, interpolated within its bucket
+    between the fastest and slowest lead time observed there. histogram holds
+    (bucket, count, min_seconds, max_seconds) rows, where the extremes may be None.
+    """
+    rank = percentile / 100 * total
+    seen = 0
+    for bucket, count, fastest, slowest in histogram:
+        if seen + count >= rank:
+            low, high = _bucket_bounds(bucket)
+            if fastest is not None and slowest is not None:
+                low, high = max(low, fastest), min(high, slowest)
+            fraction = (rank - seen) / count
+            if low <= 0:
+                return low + (high - low) * fraction
+            return low * (high / low) ** fraction
+        seen += count
+    bucket, _, _, slowest = histogram[-1]
+    return slowest if slowest is not None else _bucket_bounds(bucket)[1]
+
+
+def get_lead_times(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """Count, mean and percentiles of the time spent in a status, per transition"""
+    query = db.query(
+        LeadTimeRollup.from_status, LeadTimeRollup.to_status, LeadTimeRollup.bucket,
+        func.sum(LeadTimeRollup.transition_count), func.sum(LeadTimeRollup.total_seconds),
+        func.min(LeadTimeRollup.min_seconds), func.max(LeadTimeRollup.max_seconds)
+    ).filter(LeadTimeRollup.transition_count > 0)
+    # Months are the rollup's resolution, so the range covers whole months
+    if date_from:
+        query = query.filter(LeadTimeRollup.month >= date_from.replace(day=1))
+    if date_to:
+        query = query.filter(LeadTimeRollup.month <= date_to.replace(day=1))
+    rows = query.group_by(
+        LeadTimeRollup.from_status, LeadTimeRollup.to_status, LeadTimeRollup.bucket
+    ).order_by(LeadTimeRollup.from_status, LeadTimeRollup.to_status, LeadTimeRollup.bucket).all()
+
+    histograms: Dict[Tuple[str, str], list] = {}
+    for from_status, to_status, bucket, count, seconds, fastest, slowest in rows:
+        histograms.setdefault((from_status, to_status), []).append((bucket, count, seconds, fastest, slowest))
+
+    transitions = []
+    for (from_status, to_status), buckets in histograms.items():
+        total = sum(count for _, count, _, _, _ in buckets)
+        histogram = [(bucket, count, fastest, slowest) for bucket, count, _, fastest, slowest in buckets]
+        transitions.append({
+            "from_status": from_status,
+            "to_status": to_status,
+            "count": total,
+            "mean_hours": sum(seconds for _, _, seconds, _, _ in buckets) / total / 3600,
+            **{
+                f"p{p}_hours": _percentile(histogram, total, p) / 3600
+                for p in LEAD_TIME_PERCENTILES
+            },
+        })
+    return {"transitions": transitions}
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine, Base
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Rebuilding analytics rollups...")
+        rebuild_spend_rollups(db)
+        rebuild_lead_time_rollups(db)
+        print("✓ Analytics rollups rebuilt")
+    finally:
+        db.close()
@@ -0,0 +1,181 @@
+"""
+Hot/cold archival of long-closed requests.
+
+Requests closed for more than ARCHIVE_AFTER_DAYS days are moved, with their order lines
+and status history, into archived_procurement_requests, archived_order_lines and
+archived_status_history, keeping their ids. Moving ARCHIVE_BATCH_SIZE requests is one
+transaction, and a background task runs batches every ARCHIVE_INTERVAL_SECONDS until
+nothing is left to move, so the live tables hold little more than open work. Archival is
+off unless ARCHIVE_AFTER_DAYS is set; run this file directly for a one-off pass.
+
+The detail endpoint falls back to the archive and the list and export endpoints take an
+include_archived flag. Statistics aggregates and analytics rollups count archived
+requests like any other, so moving them leaves those untouched; their rebuilds read both
+tables. Archived requests leave the search index and can no longer change status.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, delete, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import (
+    ProcurementRequest, OrderLine, StatusHistory,
+    ArchivedProcurementRequest, ArchivedOrderLine, ArchivedStatusHistory
+)
+from versioning import bump_version
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 0))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", 3600))
+
+# Pause between batches so request writes get the database in between
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.05
+
+# (live table, archive table) pairs, parents first
+TABLES = [
+    (ProcurementRequest, ArchivedProcurementRequest),
+    (OrderLine, ArchivedOrderLine),
+    (StatusHistory, ArchivedStatusHistory),
+]
+
+
+def _columns(model) -> List[str]:
+    return [column.name for column in model.__table__.columns]
+
+
+def _protected_requests(db: Session) -> List[int]:
+    """
+    Requests holding the highest id of a live table. SQLite hands out max(id) + 1 as the
+    next id, so moving those rows would let a new row reuse an archived id.
+    """
+    ids = [
+        db.query(func.max(ProcurementRequest.id)).scalar(),
+        db.query(OrderLine.request_id).order_by(OrderLine.id.desc()).limit(1).scalar(),
+        db.query(StatusHistory.request_id).order_by(StatusHistory.id.desc()).limit(1).scalar(),
+    ]
+    return [request_id for request_id in ids if request_id is not None]
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move up to batch_size requests closed before cutoff into the archive; returns how many moved"""
+    candidates = db.scalars(
+        select(ProcurementRequest.id)
+        .where(
+            ProcurementRequest.status == "Closed",
+            ProcurementRequest.updated_at < cutoff,
+            ProcurementRequest.id.notin_(_protected_requests(db)),
+        )
+        .order_by(ProcurementRequest.updated_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not candidates:
+        return 0
+
+    # Conditions are checked again as the rows are copied, in case one was reopened meanwhile
+    archived_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.execute(insert(ArchivedProcurementRequest).from_select(
+        _columns(ProcurementRequest) + ["archived_at"],
+        select(*ProcurementRequest.__table__.columns, literal(archived_at)).where(
+            ProcurementRequest.id.in_(candidates),
+            ProcurementRequest.status == "Closed",
+            ProcurementRequest.updated_at < cutoff,
+        )
+    ))
+    ids = db.scalars(
+        select(ArchivedProcurementRequest.id).where(ArchivedProcurementRequest.id.in_(candidates))
+    ).all()
+    if not ids:
+        db.commit()
+        return 0
+
+    for live, archived in TABLES[1:]:
+        db.execute(insert(archived).from_select(
+            _columns(live), select(*live.__table__.columns).where(live.request_id.in_(ids))
+        ))
+    for live, _ in reversed(TABLES[1:]):
+        db.execute(delete(live).where(live.request_id.in_(ids)))
+    _remove_from_search(db, ids)
+    db.execute(delete(ProcurementRequest).where(ProcurementRequest.id.in_(ids)))
+    bump_version(db)
+    db.commit()
+    return len(ids)
+
+
+def _remove_from_search(db: Session, ids: List[int]):
+    key = "request_id" if db.get_bind().dialect.name == "postgresql" else "rowid"
+    db.execute(
+        text(f"DELETE FROM request_search WHERE {key} IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids}
+    )
+
+
+def archive_closed(days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive every request closed more than days ago, batch by batch; returns how many moved"""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    moved = 0
+    with SessionLocal() as db:
+        while True:
+            count = archive_batch(db, cutoff, batch_size)
+            moved += count
+            if count < batch_size:
+                return moved
+
+
+def is_archived(db: Session, request_id: int) -> bool:
+    return db.get(ArchivedProcurementRequest, request_id) is not None
+
+
+class Archiver:
+    """Background task running archival passes while ARCHIVE_AFTER_DAYS is set"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if ARCHIVE_AFTER_DAYS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=ARCHIVE_AFTER_DAYS)
+            try:
+                while await run_in_threadpool(_archive_batch, cutoff) == ARCHIVE_BATCH_SIZE:
+                    await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+            except Exception as e:
+                print(f"Error archiving requests: {e}")
+            await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+def _archive_batch(cutoff: datetime) -> int:
+    with SessionLocal() as db:
+        return archive_batch(db, cutoff)
+
+
+archiver = Archiver()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import engine, Base
+
+    parser = argparse.ArgumentParser(description="Archive requests closed more than --days days ago")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS or 180)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"Archiving requests closed more than {args.days:g} days ago...")
+    print(f"✓ Archived {archive_closed(args.days, args.batch_size):,} requests")
@@ -0,0 +1,283 @@
+"""
+Calibration of the local classifier's acceptance gates against labelled requests.
+
+LABELLED holds requests as the runtime classifies them, a title plus order-line
+descriptions, with the commodity group a buyer would pick, or None for requests the fast
+path must leave to the LLM: out-of-scope purchases and near misses that share a word or
+two with some group. It includes every product the sample data generator uses. For every
+combination of confidence threshold, minimum similarity and minimum margin, the sweep
+reports the share of in-scope requests the fast path answers (coverage) and the share of
+its answers that are wrong (error rate), then prints the combination with the best
+coverage among those within --max-error-rate. LocalClassifier's defaults are that
+combination.
+
+Usage (from backend/):
+    python -m benchmarks.classifier_calibration --max-error-rate 0.01
+"""
+import argparse
+import itertools
+import json
+from typing import List, Optional, Tuple
+
+from classifier import LocalClassifier
+
+# Share of fast-path answers allowed to be wrong when picking the gates
+MAX_ERROR_RATE = 0.01
+
+# (title, order-line descriptions, expected group id or None), shaped like the requests
+# create_request classifies: a short title plus one line per item
+LABELLED = [
+    ("Hotel rooms for the Berlin sales team", ["Double room, 3 nights", "Breakfast"], "001"),
+    ("Serviced apartment for interns", ["Monthly apartment rental", "Final cleaning fee"], "001"),
+    ("Accommodation for conference speakers", ["Hotel room, 2 nights", "Hotel room, 1 night"], "001"),
+    ("Chamber of commerce membership", ["Annual membership fee 2025"], "002"),
+    ("Industry association dues", ["Association dues 2025", "Working group fee"], "002"),
+    ("Professional association membership", ["Membership renewal"], "002"),
+    ("PPE for site staff", ["Safety helmets", "Protective gloves", "High-visibility vests"], "003"),
+    ("First aid and fire safety", ["First aid kits", "Fire extinguishers"], "003"),
+    ("Occupational safety inspection", ["Workstation safety inspection", "Safety report"], "003"),
+    ("Strategy review", ["Management consulting, 10 days", "Strategy workshop"], "004"),
+    ("Process advisory", ["Consulting hours", "Advisory report"], "004"),
+    ("Consultant for reorganisation", ["Strategy consultant day rate"], "004"),
+    ("Annual audit", ["External audit fee", "Accounting review"], "005"),
+    ("Year-end closing", ["Tax advisor fees"], "005"),
+    ("Payment services", ["Banking fees", "Payment services fee"], "005"),
+    ("Company cars for sales", ["Company car leasing, 36 months", "Fuel cards"], "006"),
+    ("Fleet renewal", ["Delivery van leasing", "Vehicle fleet insurance handling"], "006"),
+    ("Fuel cards for the vehicle fleet", ["Fuel card fee"], "006"),
+    ("CTO search", ["Headhunter fee", "Candidate assessment"], "007"),
+    ("Hiring campaign", ["Job posting package", "Recruiting agency fee"], "007"),
+    ("Recruitment for warehouse staff", ["Candidate sourcing", "Staffing agency fee"], "007"),
+    ("Leadership training for team leads", ["Leadership workshop, 2 days", "Coaching sessions"], "008"),
+    ("Project management certification", ["Certification course", "Exam fee"], "008"),
+    ("Compliance e-learning", ["E-learning seminar licenses", "Training sessions"], "008"),
+    ("Security awareness training for developers", ["Training sessions"], "008"),
+    ("Business liability insurance", ["Liability insurance premium"], "010"),
+    ("Equipment insurance", ["Insurance policy for company equipment", "Coverage extension"], "010"),
+    ("Cyber insurance renewal", ["Cyber insurance premium"], "010"),
+    ("Event insurance", ["Insurance premium for customer event"], "010"),
+    ("Office wiring", ["Electrician hours", "Sockets and cabling"], "011"),
+    ("Lighting upgrade", ["LED lighting installation", "Electrical cabling"], "011"),
+    ("Server room electrical work", ["Electrical wiring", "Electrician hours"], "011"),
+    ("Facility management for headquarters", ["Facility management services, monthly"], "012"),
+    ("Building services contract", ["Janitorial services", "Building services"], "012"),
+    ("Branch office facility management", ["Property facility management"], "012"),
+    ("Night security", ["Security guard service, night shift"], "013"),
+    ("Surveillance upgrade", ["CCTV cameras", "Alarm system installation"], "013"),
+    ("Main entrance access control", ["Access control system", "Security badges"], "013"),
+    ("Office renovation", ["Painting", "Flooring", "Construction work"], "014"),
+    ("Meeting room refurbishment", ["Refurbishment of meeting rooms"], "014"),
+    ("Reception remodeling", ["Remodeling of reception area", "Construction work"], "014"),
+    ("Furniture for new hires", ["Office chairs", "Desks"], "015"),
+    ("Office supplies", ["Printer paper", "Whiteboard markers"], "015"),
+    ("Storage furniture", ["Filing cabinets", "Desk organizers"], "015"),
+    ("Solar panels for the roof", ["Solar panel installation", "Energy savings audit"], "016"),
+    ("Utility contract", ["Electricity supply", "Gas supply"], "016"),
+    ("Warehouse heating", ["Heating energy supply"], "016"),
+    ("HVAC service", ["HVAC maintenance", "Annual inspection"], "017"),
+    ("Elevator contract", ["Elevator servicing"], "017"),
+    ("Air conditioning upkeep", ["Facility maintenance for air conditioning"], "017"),
+    ("Kitchenette supplies", ["Coffee", "Beverages", "Water"], "018"),
+    ("Cafeteria catering", ["Catering food, monthly"], "018"),
+    ("Water for the kitchen", ["Water dispensers"], "018"),
+    ("Office cleaning", ["Office cleaning service", "Window cleaning"], "019"),
+    ("Sanitation supplies", ["Housekeeping supplies", "Sanitation products"], "019"),
+    ("Cleaning products", ["Detergent", "Cleaning products"], "019"),
+    ("Product launch video", ["Video production", "Filming, 2 days"], "020"),
+    ("Podcast", ["Studio recording", "Audio editing"], "020"),
+    ("Corporate photos", ["Photography session"], "020"),
+    ("Company library", ["Books", "DVD media"], "021"),
+    ("Media collection", ["DVD and CD media"], "021"),
+    ("Engineering books", ["Technical books"], "021"),
+    ("Trade show print material", ["Brochure printing", "Flyer printing"], "022"),
+    ("Product catalogue", ["Offset print run"], "022"),
+    ("Annual report", ["Printing of annual report brochures"], "022"),
+    ("Editorial system", ["Publishing platform development", "Editorial system licenses"], "023"),
+    ("Website CMS", ["CMS development for publishing software"], "023"),
+    ("Print production materials", ["Raw material", "Ink"], "024"),
+    ("Magazine paper", ["Paper stock for magazine production"], "024"),
+    ("Catalogue distribution", ["Production shipping", "Freight for printed catalogues"], "025"),
+    ("Shipping print products to distributor", ["Freight shipping"], "025"),
+    ("Digital edition", ["App development", "Digital edition hosting"], "026"),
+    ("Ebook", ["Ebook digital product development"], "026"),
+    ("New title pre-production", ["Typesetting", "Layout"], "027"),
+    ("Manuscript", ["Proofreading", "Editing"], "027"),
+    ("Campaign video post-production", ["Color grading", "Post-production"], "028"),
+    ("Book finishing", ["Binding", "Finishing of printed books"], "028"),
+    ("Laptops for developers", ["Dell Latitude laptops"], "029"),
+    ("Workstation upgrade", ["HP monitors 27 inch", "Logitech keyboards"], "029"),
+    ("Network refresh", ["Cisco network switches", "Router"], "029"),
+    ("Cloud hosting", ["Cloud hosting", "Managed services"], "030"),
+    ("AWS", ["AWS cloud storage", "Support tickets"], "030"),
+    ("Helpdesk", ["Helpdesk support", "Implementation services"], "030"),
+    ("Microsoft Office 365", ["Microsoft Office 365 licenses"], "031"),
+    ("Creative software", ["Adobe Creative Cloud subscription"], "031"),
+    ("CRM renewal", ["Salesforce CRM enterprise license renewal"], "031"),
+    ("Contract courier", ["DHL express courier"], "032"),
+    ("Parcel shipping", ["Postage", "UPS parcel shipping"], "032"),
+    ("Courier services", ["FedEx courier services"], "032"),
+    ("Warehouse racking", ["Racking", "Pallet storage"], "033"),
+    ("Warehousing services", ["Warehousing", "Material handling"], "033"),
+    ("External warehouse", ["Pallet storage space"], "033"),
+    ("Freight to Poland", ["Trucking", "Freight forwarding"], "034"),
+    ("Machine transport", ["Haulage transportation of machines"], "034"),
+    ("Logistics partner", ["Transportation logistics, monthly"], "034"),
+    ("Last mile delivery", ["Last mile delivery service"], "035"),
+    ("Sample distribution", ["Distribution and delivery of samples"], "035"),
+    ("Spring campaign", ["Advertising campaign", "Media buying"], "036"),
+    ("TV commercial", ["TV commercial ad campaign"], "036"),
+    ("Outdoor campaign", ["Billboard advertising", "Posters"], "037"),
+    ("Transit advertising", ["Transit advertising signage"], "037"),
+    ("Rebranding", ["Creative agency for branding"], "038"),
+    ("PR agency", ["PR agency retainer"], "038"),
+    ("Brand refresh", ["Marketing agency fee"], "038"),
+    ("Letter campaign", ["Direct mail letter campaign"], "039"),
+    ("Customer mailshot", ["Mailshot to existing customers"], "039"),
+    ("Customer newsletter", ["Newsletter", "SMS customer communication"], "040"),
+    ("Call center", ["Call center customer service outsourcing"], "040"),
+    ("Online marketing", ["SEO", "Google Ads"], "041"),
+    ("Social media campaign", ["Social media digital marketing"], "041"),
+    ("Trade fair", ["Trade fair booth", "Exhibition venue"], "042"),
+    ("Customer conference", ["Conference venue", "Event management"], "042"),
+    ("Annual customer event", ["Event venue rental"], "042"),
+    ("Merchandise", ["Branded merchandise", "Giveaways"], "043"),
+    ("Trade show swag", ["Promotional materials"], "043"),
+    ("Warehouse fit-out", ["Shelving", "Trolleys", "Workbench"], "044"),
+    ("Operational equipment", ["Warehouse equipment", "Operational equipment"], "044"),
+    ("Production line", ["CNC machine"], "045"),
+    ("Assembly line", ["Assembly line production machinery"], "045"),
+    ("Hydraulic press", ["Hydraulic press machine"], "045"),
+    ("Packaging machine parts", ["Spare parts", "Replacement parts"], "046"),
+    ("Replacement components", ["Replacement component parts"], "046"),
+    ("Conveyor", ["Conveyor belt for internal transportation"], "047"),
+    ("Pallet jacks", ["Pallet jack for internal transport"], "047"),
+    ("Production materials", ["Steel", "Aluminium"], "048"),
+    ("Plastics", ["Plastic granulate", "Resin"], "048"),
+    ("Printer consumables", ["Toner cartridges", "Batteries"], "049"),
+    ("Workshop consumables", ["Gloves", "Tape", "Lubricant"], "049"),
+    ("Machine overhaul", ["Machine repair and overhaul"], "050"),
+    ("Production equipment repairs", ["Repairs of production equipment"], "050"),
+    # Out of scope or near misses: the fast path must escalate these
+    ("Forklift rental", ["Forklift rental, 1 week"], None),
+    ("Forklift rental for inventory week", ["Forklift rental"], None),
+    ("Car rental for client visit", ["Car rental, 2 days"], None),
+    ("Room divider screens", ["Room divider screens"], None),
+    ("Video game licenses for the break room", ["Video game licenses"], None),
+    ("Coffee machine repair", ["Coffee machine repair"], None),
+    ("Printer repair", ["Printer repair"], None),
+    ("Legal translation", ["Translation of legal contracts"], None),
+    ("Trademark dispute", ["Legal counsel"], None),
+    ("Notary", ["Notary fees"], None),
+    ("Team building", ["Team building boat trip"], None),
+    ("Christmas gifts", ["Christmas gifts for employees"], None),
+    ("Lobby plants", ["Plants for the office lobby"], None),
+    ("Visitor parking", ["Parking spaces for visitors"], None),
+    ("Medical check-ups", ["Medical check-ups for employees"], None),
+    ("Interpreter", ["Sign language interpreter"], None),
+    ("Roof survey", ["Drone survey of the roof"], None),
+    ("Patent filing", ["Patent filing fees"], None),
+    ("Reception uniforms", ["Uniforms for reception staff"], None),
+    ("Charity donation", ["Charity donation"], None),
+    ("Piano tuning", ["Piano tuning"], None),
+    ("Aquarium maintenance", ["Aquarium maintenance"], None),
+    ("Umbrellas", ["Umbrellas"], None),
+    ("Laboratory reagents", ["Laboratory reagents"], None),
+    ("Customs clearance", ["Customs clearance"], None),
+    ("Background checks for new hires", ["Background checks"], None),
+    ("Pest control", ["Pest control"], None),
+    ("Bicycle leasing for employees", ["Bicycle leasing"], None),
+]
+
+# The products the sample data generator uses, with the group a buyer would pick; they are
+# labelled the way seed_data.py titles them ("Category Purchase - Product")
+SEED_PRODUCTS = {
+    "Software": [
+        ("Microsoft Office 365 Licenses", "031"),
+        ("Adobe Creative Cloud Subscription", "031"),
+        ("Salesforce CRM Licenses", "031"),
+        ("Slack Business+ Subscription", "031"),
+        ("Zoom Enterprise License", "031"),
+    ],
+    "Hardware": [
+        ("Dell Latitude Laptops", "029"),
+        ("HP Monitors 27 inch", "029"),
+        ("Logitech Keyboards", "029"),
+        ("Cisco Network Switches", "029"),
+        ("External Hard Drives 2TB", "029"),
+    ],
+    "Services": [
+        ("Cloud Storage", "030"),
+        ("Consulting Hours", "004"),
+        ("Training Sessions", "008"),
+        ("Support Tickets", "030"),
+        ("API Calls", "030"),
+    ],
+    "Office Supplies": [
+        ("Printer Paper A4", "015"),
+        ("Office Chairs", "015"),
+        ("Whiteboard Markers", "015"),
+        ("Filing Cabinets", "015"),
+        ("Desk Organizers", "015"),
+    ],
+}
+LABELLED += [
+    (f"{category} Purchase - {product}", [product], group_id)
+    for category, products in SEED_PRODUCTS.items()
+    for product, group_id in products
+]
+
+
+def evaluate(classifier: LocalClassifier, threshold: float, min_similarity: float, min_margin: float) -> dict:
+    """Fast-path coverage of the in-scope requests and error rate of the fast-path answers"""
+    answered = in_scope_answered = wrong = 0
+    for title, descriptions, expected in LABELLED:
+        order_lines = [{"position_description": description} for description in descriptions]
+        result = classifier.classify(
+            title, order_lines, threshold=threshold, min_similarity=min_similarity, min_margin=min_margin
+        )
+        if result is not None:
+            answered += 1
+            in_scope_answered += expected is not None
+            wrong += result["commodity_group_id"] != expected
+    in_scope = sum(expected is not None for _, _, expected in LABELLED)
+    return {
+        "threshold": threshold,
+        "min_similarity": min_similarity,
+        "min_margin": min_margin,
+        "coverage": round(in_scope_answered / in_scope, 3),
+        "error_rate": round(wrong / answered, 3) if answered else 0.0,
+        "wrong": wrong,
+    }
+
+
+def sweep(classifier: LocalClassifier, max_error_rate: float) -> Tuple[Optional[dict], List[dict]]:
+    """Every gate combination, and the one with the best coverage within max_error_rate;
+    ties go to the strictest gates"""
+    results = [
+        evaluate(classifier, threshold, min_similarity, min_margin)
+        for threshold, min_similarity, min_margin in itertools.product(
+            (0.0, 0.5, 0.7, 0.8, 0.9, 0.95),
+            (0.5, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85),
+            (0.0, 0.05, 0.1, 0.15, 0.2),
+        )
+    ]
+    acceptable = [result for result in results if result["error_rate"] <= max_error_rate]
+    best = max(
+        acceptable,
+        key=lambda r: (r["coverage"], -r["error_rate"], r["min_similarity"], r["min_margin"], r["threshold"]),
+        default=None,
+    )
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-error-rate", type=float, default=MAX_ERROR_RATE)
+    args = parser.parse_args()
+
+    best, results = sweep(LocalClassifier(), args.max_error_rate)
+    print(json.dumps({"labelled": len(LABELLED), "best": best, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Concurrent read/write benchmark for the database engine configurations in database.py.
+
+Seeds a fresh database per configuration, then runs dashboard-style page reads and
+status-update writes from several threads at once and reports throughput and read
+latency for each.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency --requests 20000 --seconds 10
+    python -m benchmarks.db_concurrency --postgres-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, SQLITE_PRAGMAS, create_db_engine
+from models import ProcurementRequest, StatusHistory
+import schemas
+from queries import apply_request_filters, paginate_requests
+
+STATUSES = ["Open", "In Progress", "Closed"]
+
+
+def sqlite_configurations(directory: str) -> dict:
+    return {
+        "sqlite-default": (f"sqlite:///{directory}/default.db", {}),
+        "sqlite-wal": (f"sqlite:///{directory}/wal.db", {"journal_mode": "WAL", "busy_timeout": 5000}),
+        "sqlite-tuned": (f"sqlite:///{directory}/tuned.db", SQLITE_PRAGMAS),
+    }
+
+
+def seed(engine, count: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(ProcurementRequest), [
+            {
+                "requestor_name": "Bench", "title": f"Request {i}", "vendor_name": f"Vendor {i % 50}",
+                "vat_id": "DE123456789", "total_cost": float(i % 1000), "department": "IT",
+                "status": random.choice(STATUSES), "created_at": now, "updated_at": now,
+            }
+            for i in range(count)
+        ])
+
+
+def run(engine, request_count: int, seconds: float, readers: int, writers: int) -> dict:
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    read_latencies, write_latencies, errors = [], [], []
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    query = apply_request_filters(db.query(ProcurementRequest), schemas.RequestFilters(status="Open"))
+                    paginate_requests(query, 50)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - start)
+
+    def writer():
+        while not stop.is_set():
+            request_id = random.randint(1, request_count)
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    request = db.get(ProcurementRequest, request_id)
+                    old_status, request.status = request.status, random.choice(STATUSES)
+                    db.add(StatusHistory(request_id=request_id, old_status=old_status, new_status=request.status))
+                    db.commit()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                write_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def percentile(values, q):
+        return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 2) if len(values) > 1 else None
+
+    return {
+        "reads_per_second": round(len(read_latencies) / seconds, 1),
+        "writes_per_second": round(len(write_latencies) / seconds, 1),
+        "read_p50_ms": percentile(read_latencies, 50),
+        "read_p95_ms": percentile(read_latencies, 95),
+        "read_p99_ms": percentile(read_latencies, 99),
+        "write_p95_ms": percentile(write_latencies, 95),
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--postgres-url", help="also benchmark this PostgreSQL database (its tables are dropped)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configurations = sqlite_configurations(directory)
+        if args.postgres_url:
+            configurations["postgresql"] = (args.postgres_url, None)
+
+        results = {}
+        for name, (url, pragmas) in configurations.items():
+            engine = create_db_engine(url, sqlite_pragmas=pragmas)
+            seed(engine, args.requests)
+            results[name] = run(engine, args.requests, args.seconds, args.readers, args.writers)
+            engine.dispose()
+            print(f"{name}: {results[name]}", flush=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
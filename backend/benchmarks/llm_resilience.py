@@ -0,0 +1,119 @@
+"""
+Behaviour of the LLM client layer in ai_services.py against a misbehaving upstream.
+
+Starts the OpenAI stub on a free port and sends classification calls through
+_chat_completion from several threads, once per scenario:
+
+- tail: a share of responses takes --slow-ms; compares latency without and with hedging
+- errors: a share of calls fails with 500; compares success rates without and with retries
+- outage: every call fails; shows the circuit breaker opening and later calls failing fast
+- hang: the upstream never answers in time; shows calls giving up at their deadline
+
+Usage (from backend/):
+    python -m benchmarks.llm_resilience --calls 200 --concurrency 8
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.openai_stub import StubConfig, start_stub
+
+MESSAGES = [
+    {"role": "system", "content": "You are a classification assistant. Always return valid JSON."},
+    {"role": "user", "content": "Request Title: Adobe licenses\n\nItems:\n- Adobe Photoshop"},
+]
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def run(ai_services, config: StubConfig, calls: int, concurrency: int, deadline: float, **settings) -> dict:
+    """Send calls classification requests with the given ai_services settings and summarize them"""
+    for name, value in settings.items():
+        setattr(ai_services, name, value)
+    ai_services.breaker_for("benchmark").record_success()
+    config.calls = 0
+
+    def call(_):
+        start = time.perf_counter()
+        try:
+            ai_services._chat_completion("benchmark", deadline=deadline, model="gpt-4", messages=MESSAGES)
+            outcome = "ok"
+        except Exception as e:
+            outcome = type(e).__name__
+        return outcome, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(calls)))
+    latencies = [seconds for _, seconds in results]
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        "settings": settings,
+        "outcomes": outcomes,
+        "upstream_calls": config.calls,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    config = StubConfig(latency_ms=args.latency_ms)
+    stub = start_stub(0, config)
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}/v1"
+    import ai_services  # after the environment points the clients at the stub
+
+    hedge_after = max(4 * args.latency_ms / 1000, 0.05)
+    plain = {"LLM_MAX_RETRIES": 0, "LLM_HEDGE_AFTER_SECONDS": 0.0}
+    results = {}
+    try:
+        config.slow_rate, config.slow_ms = args.slow_rate, args.slow_ms
+        results["tail"] = [
+            run(ai_services, config, args.calls, args.concurrency, 30, **plain),
+            run(ai_services, config, args.calls, args.concurrency, 30,
+                LLM_MAX_RETRIES=0, LLM_HEDGE_AFTER_SECONDS=hedge_after),
+        ]
+        config.slow_rate, config.error_rate = 0.0, args.error_rate
+        results["errors"] = [
+            run(ai_services, config, args.calls, args.concurrency, 30, **plain),
+            run(ai_services, config, args.calls, args.concurrency, 30,
+                LLM_MAX_RETRIES=3, LLM_RETRY_BASE_DELAY_SECONDS=0.05, LLM_HEDGE_AFTER_SECONDS=0.0),
+        ]
+        config.error_rate = 1.0
+        results["outage"] = [
+            run(ai_services, config, args.calls, args.concurrency, 30,
+                LLM_MAX_RETRIES=2, LLM_RETRY_BASE_DELAY_SECONDS=0.05, LLM_HEDGE_AFTER_SECONDS=0.0),
+        ]
+        config.error_rate, config.latency_ms = 0.0, 60_000
+        # Keep the breaker closed so every call runs into its own deadline
+        ai_services.breaker_for("benchmark").failure_threshold = 10 ** 6
+        results["hang"] = [
+            run(ai_services, config, args.concurrency, args.concurrency, 2,
+                LLM_MAX_RETRIES=2, LLM_ATTEMPT_TIMEOUT_SECONDS=0.5, LLM_RETRY_BASE_DELAY_SECONDS=0.05),
+        ]
+    finally:
+        stub.shutdown()
+
+    print(json.dumps({"config": vars(args), "scenarios": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Load test for every API endpoint at a chosen data scale.
+
+Populates a fresh SQLite database with --requests procurement requests, starts the API
+under uvicorn against it with OpenAI replaced by the local stub in openai_stub.py, then
+drives each scenario with --concurrency clients for --seconds. Throughput and
+p50/p95/p99 latency per scenario are written as JSON so runs can be compared.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --requests 100000 --output results.json
+    python -m benchmarks.load_test --scenarios list,statistics --compare results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from database import create_db_engine
+from seed_data import generate_sample_requests
+from benchmarks.openai_stub import StubConfig, start_stub
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUSES = ["Open", "In Progress", "Closed"]
+
+
+def populate(url: str, count: int, seed: int):
+    """Fill a fresh database with reproducible sample requests"""
+    engine = create_db_engine(url)
+    # Keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        generate_sample_requests(count, seed=seed, chunk_size=20_000, days=365, engine=engine)
+    engine.dispose()
+
+
+def minimal_pdf(text: str) -> bytes:
+    """A one-page PDF containing text, so uploads exercise the real parser"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode()
+
+
+def bulk_items(count: int) -> list:
+    return [
+        {
+            "requestor_name": "Load Test", "title": f"Bulk {random.random()}", "vendor_name": "Vendor",
+            "vat_id": "DE123456789", "commodity_group_id": "031", "commodity_group": "Software",
+            "total_cost": 20.0, "department": "IT",
+            "order_lines": [{"position_description": "Item", "unit_price": 10.0, "amount": 2.0, "unit": "pieces", "total_price": 20.0}],
+        }
+        for _ in range(count)
+    ]
+
+
+def scenarios(request_count: int, bulk_size: int, status_batch: int) -> dict:
+    """Scenario name -> coroutine function issuing one request (or batch) with the given client"""
+    def random_id():
+        return random.randint(1, request_count)
+
+    async def status_individual(client):
+        # The same work as status_bulk, one PATCH per request
+        new_status = random.choice(STATUSES)
+        for _ in range(status_batch):
+            response = await client.patch(
+                f"/api/requests/{random_id()}/status", json={"new_status": new_status, "notes": "load test"}
+            )
+            if response.status_code >= 400:
+                return response
+        return response
+
+    return {
+        "list": lambda c: c.get("/api/requests", params={"limit": 50}),
+        "list_filtered": lambda c: c.get("/api/requests", params={"limit": 50, "status": "Open", "department": "IT"}),
+        "summary": lambda c: c.get("/api/requests/summary", params={"limit": 50}),
+        "detail": lambda c: c.get(f"/api/requests/{random_id()}"),
+        "statistics": lambda c: c.get("/api/statistics"),
+        "status_update": lambda c: c.patch(
+            f"/api/requests/{random_id()}/status", json={"new_status": random.choice(STATUSES), "notes": "load test"}
+        ),
+        "upload_pdf": lambda c: c.post(
+            "/api/upload-pdf", files={"file": ("offer.pdf", minimal_pdf(f"Offer {random.random()}"), "application/pdf")}
+        ),
+        "bulk_create": lambda c: c.post("/api/requests/bulk", json=bulk_items(bulk_size)),
+        "status_bulk": lambda c: c.patch("/api/requests/status", json={
+            "ids": [random_id() for _ in range(status_batch)],
+            "new_status": random.choice(STATUSES),
+            "notes": "load test",
+        }),
+        "status_individual": status_individual,
+    }
+
+
+async def drive(base_url: str, send, concurrency: int, seconds: float, background=None) -> dict:
+    """Run send from concurrency clients for seconds; background, if set, runs alongside unmeasured"""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await send(client)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        async def background_worker():
+            while time.perf_counter() < deadline:
+                try:
+                    await background(client)
+                except httpx.HTTPError:
+                    pass
+
+        tasks = [worker() for _ in range(concurrency)]
+        if background:
+            tasks += [background_worker() for _ in range(concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    def percentile(q):
+        if len(latencies) < 2:
+            return round(latencies[0] * 1000, 2) if latencies else None
+        return round(statistics.quantiles(latencies, n=100)[q - 1] * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url: str, cache_path: str, stub_port: int, workers: int) -> tuple:
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "CACHE_DB_PATH": cache_path,
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def compare(previous: dict, current: dict):
+    print(f"{'scenario':<26}{'metric':<16}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = before.get(metric), result.get(metric)
+            if old and new:
+                print(f"{name:<26}{metric:<16}{old:>12}{new:>12}{(new - old) / old:>+10.1%}")
+
+
+def main():
+    all_scenarios = list(scenarios(1, 1, 1)) + ["list_during_uploads"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000, help="procurement requests to populate")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the populated data")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=15, help="duration of each scenario")
+    parser.add_argument("--scenarios", default=",".join(all_scenarios))
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bulk-size", type=int, default=500, help="items per bulk_create call")
+    parser.add_argument("--status-batch", type=int, default=50,
+                        help="requests moved per status_bulk call, and per status_individual batch of PATCHes")
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="previous JSON results to diff against")
+    args = parser.parse_args()
+
+    stub = start_stub(0, StubConfig(latency_ms=args.llm_latency_ms))
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite:///{directory}/load.db"
+        populate(database_url, args.requests, args.seed)
+
+        process, base_url = start_server(database_url, f"{directory}/cache.db", stub.server_port, args.workers)
+        available = scenarios(args.requests, args.bulk_size, args.status_batch)
+        results = {}
+        try:
+            for name in args.scenarios.split(","):
+                print(f"Running {name}...", file=sys.stderr, flush=True)
+                if name == "list_during_uploads":
+                    # GET latency while PDF extractions occupy the server
+                    result = asyncio.run(drive(
+                        base_url, available["list"], args.concurrency, args.seconds, background=available["upload_pdf"]
+                    ))
+                else:
+                    result = asyncio.run(drive(base_url, available[name], args.concurrency, args.seconds))
+                if name == "bulk_create":
+                    result["rows_per_second"] = round(result["throughput_rps"] * args.bulk_size, 1)
+                elif name in ("status_bulk", "status_individual"):
+                    result["rows_per_second"] = round(result["throughput_rps"] * args.status_batch, 1)
+                results[name] = result
+        finally:
+            process.terminate()
+            process.wait()
+            stub.shutdown()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local stand-in for the OpenAI chat completions API, for benchmarks and failure testing.
+
+Answers POST /v1/chat/completions with canned but well-formed extraction or
+classification JSON after an optional injected delay, and can fail a share of calls or
+make a share of them very slow to produce a latency tail.
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage (from backend/):
+    python -m benchmarks.openai_stub --port 8100 --latency-ms 800 --jitter-ms 400 --error-rate 0.05 \
+        --slow-rate 0.02 --slow-ms 15000
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # Share of calls delayed by slow_ms instead of latency_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.calls = 0
+
+
+def _answer(messages: list) -> str:
+    system = messages[0]["content"] if messages else ""
+    prompt = messages[-1]["content"] if messages else ""
+
+    if "classification" not in system:
+        return json.dumps({
+            "vendor_name": "Stub Supplies GmbH",
+            "vat_id": "DE123456789",
+            "department": "IT",
+            "order_lines": [
+                {"position_description": "Stub Laptop", "unit_price": 999.0, "amount": 2, "unit": "pieces", "total_price": 1998.0}
+            ],
+            "total_cost": 1998.0,
+        })
+
+    classification = {"commodity_group_id": "031", "commodity_group": "Software", "confidence": "medium"}
+    if "JSON array" in prompt:
+        count = len(re.findall(r"^Request \d+:", prompt, flags=re.MULTILINE))
+        return json.dumps([{"index": i, **classification} for i in range(count)])
+    return json.dumps(classification)
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            config.calls += 1
+
+            delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if random.random() < config.slow_rate:
+                delay = config.slow_ms
+            time.sleep(max(delay, 0) / 1000)
+
+            if random.random() < config.error_rate:
+                self._send(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+                return
+
+            content = _answer(body.get("messages", []))
+            self._send(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(json.dumps(body)) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(json.dumps(body)) + len(content)) // 4},
+            })
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up, e.g. a timed-out or cancelled hedged request
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Start the stub on a background thread; port 0 picks a free port (see server.server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server = start_stub(args.port, StubConfig(
+        args.latency_ms, args.jitter_ms, args.error_rate, args.slow_rate, args.slow_ms
+    ))
+    print(f"OpenAI stub listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,107 @@
+"""
+Per-row cost of building the request list response, through response_model and through
+the fast path in serialization.py.
+
+Populates a fresh SQLite database, then builds pages of --page-size requests with their
+order lines both ways and reports microseconds per row, split into loading the rows and
+turning them into the response body.
+
+Usage (from backend/):
+    python -m benchmarks.serialization --requests 20000 --page-size 500
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import json
+import sys
+import tempfile
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from database import create_db_engine
+from models import ProcurementRequest
+from seed_data import generate_sample_requests
+import schemas
+import serialization
+
+
+def load_orm(db, page_size: int, offset: int) -> list:
+    return db.query(ProcurementRequest).options(selectinload(ProcurementRequest.order_lines)).order_by(
+        ProcurementRequest.id
+    ).offset(offset).limit(page_size).all()
+
+
+def load_rows(db, page_size: int, offset: int) -> list:
+    rows = serialization.summary_query(db).order_by(ProcurementRequest.id).offset(offset).limit(page_size).all()
+    return serialization.with_order_lines(db, serialization.summaries(rows))
+
+
+async def encode_response_model(field, requests: list) -> bytes:
+    """What FastAPI does with a response_model: validate from attributes, dump, json-encode"""
+    content = await serialize_response(field=field, response_content={"items": requests, "next_cursor": None})
+    return JSONResponse(content).body
+
+
+def measure(load, encode, db, page_size: int, pages: int, request_count: int) -> dict:
+    load_seconds = encode_seconds = 0.0
+    size = 0
+    for page in range(pages):
+        offset = page * page_size % max(request_count - page_size, 1)
+        db.expunge_all()
+        start = time.perf_counter()
+        items = load(db, page_size, offset)
+        loaded = time.perf_counter()
+        body = encode(items)
+        load_seconds += loaded - start
+        encode_seconds += time.perf_counter() - loaded
+        size += len(body)
+    rows = page_size * pages
+    return {
+        "load_us_per_row": round(load_seconds / rows * 1e6, 2),
+        "serialize_us_per_row": round(encode_seconds / rows * 1e6, 2),
+        "total_us_per_row": round((load_seconds + encode_seconds) / rows * 1e6, 2),
+        "bytes_per_row": round(size / rows, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    field = create_model_field(name="Response", type_=schemas.ProcurementRequestPage, mode="serialization")
+    loop = asyncio.new_event_loop()
+    paths = {
+        "response_model": (load_orm, lambda items: loop.run_until_complete(encode_response_model(field, items))),
+        "fast": (load_rows, lambda items: serialization.dumps({"items": items, "next_cursor": None})),
+        "fast_gzip": (load_rows, lambda items: gzip.compress(
+            serialization.dumps({"items": items, "next_cursor": None}), compresslevel=serialization.JSON_GZIP_LEVEL
+        )),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{directory}/serialization.db")
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_sample_requests(args.requests, seed=args.seed, chunk_size=20_000, engine=engine)
+        Session = sessionmaker(bind=engine)
+        results = {}
+        with Session() as db:
+            for name, (load, encode) in paths.items():
+                measure(load, encode, db, args.page_size, 2, args.requests)  # warm up
+                results[name] = measure(load, encode, db, args.page_size, args.pages, args.requests)
+        engine.dispose()
+    loop.close()
+
+    print(json.dumps({"config": vars(args), "paths": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Bulk operations on procurement requests, written as set-based statements in one transaction
+"""
+import os
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+import schemas
+from ai_services import classify_commodity_groups
+from aggregates import record_created_many, record_status_changes
+from versioning import bump_version
+import analytics
+import changes
+from queries import apply_request_filters
+from search import index_requests
+from models import ProcurementRequest, OrderLine, StatusHistory, ArchivedProcurementRequest
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 5000))
+
+
+class BulkLimitError(ValueError):
+    """Raised when a bulk call selects more than BULK_MAX_ITEMS requests"""
+
+
+def create_requests_bulk(db: Session, items: List[dict]) -> schemas.BulkCreateResponse:
+    """
+    Validate and insert many requests with their order lines and initial status history.
+
+    Each item is validated on its own so one bad row is reported instead of failing the
+    batch. Unclassified requests are classified together, then requests, order lines and
+    history rows are each written with a single executemany insert.
+    """
+    results = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, schemas.ProcurementRequestCreate.model_validate(item)))
+        except ValidationError as e:
+            results[i] = schemas.BulkCreateResult(
+                index=i, status="invalid", errors=e.errors(include_url=False, include_context=False)
+            )
+
+    unclassified = [(i, request) for i, request in valid if not request.commodity_group_id]
+    classifications = classify_commodity_groups([
+        (request.title, [line.model_dump() for line in request.order_lines]) for _, request in unclassified
+    ])
+    groups = {i: (c.get("commodity_group_id"), c.get("commodity_group")) for (i, _), c in zip(unclassified, classifications)}
+
+    now = datetime.now(timezone.utc)
+    request_rows = []
+    for i, request in valid:
+        commodity_group_id, commodity_group = groups.get(i, (request.commodity_group_id, request.commodity_group))
+        request_rows.append({
+            **request.model_dump(exclude={"order_lines", "commodity_group_id", "commodity_group"}),
+            "commodity_group_id": commodity_group_id,
+            "commodity_group": commodity_group,
+            "status": "Open",
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    if request_rows:
+        ids = db.scalars(
+            insert(ProcurementRequest).returning(ProcurementRequest.id, sort_by_parameter_order=True),
+            request_rows
+        ).all()
+
+        line_rows = [
+            {**line.model_dump(), "request_id": request_id}
+            for request_id, (_, request) in zip(ids, valid)
+            for line in request.order_lines
+        ]
+        if line_rows:
+            db.execute(insert(OrderLine), line_rows)
+        index_requests(db, ids)
+
+        db.execute(insert(StatusHistory), [
+            {"request_id": request_id, "old_status": None, "new_status": "Open", "changed_at": now, "notes": "Request created"}
+            for request_id in ids
+        ])
+
+        record_created_many(db, request_rows)
+        analytics.record_created_many(db, request_rows)
+        changes.record_created_many(db, [{**row, "id": request_id} for request_id, row in zip(ids, request_rows)])
+        bump_version(db)
+        db.commit()
+
+        for request_id, row, (i, _) in zip(ids, request_rows, valid):
+            results[i] = schemas.BulkCreateResult(
+                index=i, status="created", id=request_id, commodity_group_id=row["commodity_group_id"]
+            )
+
+    return schemas.BulkCreateResponse(
+        created=len(valid),
+        failed=len(items) - len(valid),
+        results=results
+    )
+
+
+def update_status_bulk(db: Session, update_request: schemas.BulkStatusUpdate) -> schemas.BulkStatusResponse:
+    """
+    Move the requests selected by ids or filters to a new status in one transaction.
+
+    The requests are read with one SELECT, changed with one UPDATE and logged with one
+    executemany insert of history rows, however many there are. Requests already in
+    the target status are reported as unchanged and get no history row, archived ones
+    as archived.
+    """
+    new_status = update_request.new_status
+    query = db.query(ProcurementRequest).with_for_update()
+    if update_request.ids is not None:
+        ids = list(dict.fromkeys(update_request.ids))
+        requests = query.filter(ProcurementRequest.id.in_(ids)).all() if ids else []
+    else:
+        requests = apply_request_filters(query, update_request.filters).order_by(
+            ProcurementRequest.id
+        ).limit(BULK_MAX_ITEMS + 1).all()
+        if len(requests) > BULK_MAX_ITEMS:
+            raise BulkLimitError(f"The filters match more than {BULK_MAX_ITEMS} requests")
+        ids = [request.id for request in requests]
+
+    old_statuses = {request.id: request.status for request in requests}
+    pending = [request_id for request_id, status in old_statuses.items() if status != new_status]
+    updated = set()
+    if pending:
+        previous_change_at = analytics.last_status_changes(db, pending)
+        now = datetime.now(timezone.utc)
+        # Requests moved to new_status since the SELECT are skipped and reported as unchanged
+        updated = set(db.scalars(
+            update(ProcurementRequest)
+            .where(ProcurementRequest.id.in_(pending), ProcurementRequest.status != new_status)
+            .values(status=new_status, updated_at=now)
+            .returning(ProcurementRequest.id),
+            execution_options={"synchronize_session": "evaluate"}
+        ).all())
+
+    if updated:
+        changed = [request for request in requests if request.id in updated]
+        db.execute(insert(StatusHistory), [
+            {
+                "request_id": request.id,
+                "old_status": old_statuses[request.id],
+                "new_status": new_status,
+                "changed_at": now,
+                "notes": update_request.notes,
+            }
+            for request in changed
+        ])
+        record_status_changes(db, changed, old_statuses)
+        analytics.record_transitions(db, [
+            (old_statuses[request.id], new_status, previous_change_at.get(request.id), now) for request in changed
+        ])
+        changes.record_status_changes(db, changed, old_statuses)
+        bump_version(db)
+    db.commit()
+
+    missing = [request_id for request_id in ids if request_id not in old_statuses]
+    archived = set(db.scalars(
+        select(ArchivedProcurementRequest.id).where(ArchivedProcurementRequest.id.in_(missing))
+    ).all()) if missing else set()
+
+    results = []
+    for request_id in ids:
+        if request_id not in old_statuses:
+            results.append(schemas.BulkStatusResult(
+                id=request_id, outcome="archived" if request_id in archived else "not_found"
+            ))
+        else:
+            results.append(schemas.BulkStatusResult(
+                id=request_id,
+                outcome="updated" if request_id in updated else "unchanged",
+                old_status=old_statuses[request_id],
+            ))
+    return schemas.BulkStatusResponse(
+        updated=len(updated),
+        unchanged=len(old_statuses) - len(updated),
+        not_found=len(missing) - len(archived),
+        archived=len(archived),
+        results=results,
+    )
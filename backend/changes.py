@@ -0,0 +1,242 @@
+"""
+Live change feed of request creations and status changes.
+
+Writers append a compact event to change_events in the same transaction as the change.
+One broadcaster task per process reads new events from the table (immediately after a
+local commit, and every CHANGE_FEED_POLL_SECONDS to pick up other processes' writes)
+into an in-memory buffer, and every connected client streams from that buffer. Ids are
+handed out when a transaction inserts, not when it commits, so on PostgreSQL a later id
+can become visible first. Events are therefore published only up to the first missing
+id; a gap still open after CHANGE_FEED_GAP_SECONDS is taken to be a rolled-back insert
+and skipped. Published ids only ever grow, so a single last-seen id stays a valid
+cursor. A client
+reconnecting with the id of the last event it saw gets everything after it, from the
+buffer or, if it fell further behind, from the table. Events older than
+CHANGE_LOG_RETENTION_DAYS are pruned; a client asking to resume from before that is
+sent a 'reset' event and should reload.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+
+import schemas
+from database import SessionLocal
+from models import ChangeEvent
+
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", 1.0))
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", 1000))
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", 7))
+CHANGE_FEED_GAP_SECONDS = float(os.getenv("CHANGE_FEED_GAP_SECONDS", 5.0))
+
+# Events read from the table per query when a client catches up
+CHANGE_FEED_PAGE = 500
+SSE_KEEPALIVE_SECONDS = 15
+PRUNE_EVERY_SECONDS = 3600
+
+
+def _payload(request, old_status: Optional[str] = None) -> str:
+    summary = schemas.ProcurementRequestSummary.model_validate(request)
+    # Timestamps read back from the database are naive UTC; match them for fresh objects
+    for field in ("created_at", "updated_at"):
+        value = getattr(summary, field)
+        if value.tzinfo is not None:
+            setattr(summary, field, value.astimezone(timezone.utc).replace(tzinfo=None))
+    data = summary.model_dump(mode="json")
+    if old_status is not None:
+        data["old_status"] = old_status
+    return json.dumps(data)
+
+
+def record_created(db: Session, request):
+    """Log the creation of a flushed request"""
+    db.add(ChangeEvent(kind="request_created", request_id=request.id, payload=_payload(request)))
+    db.info["changes_recorded"] = True
+
+
+def record_created_many(db: Session, requests: list):
+    """Log a batch of new requests, given as dicts including their id"""
+    db.execute(insert(ChangeEvent), [
+        {"kind": "request_created", "request_id": request["id"], "payload": _payload(request)}
+        for request in requests
+    ])
+    db.info["changes_recorded"] = True
+
+
+def record_status_change(db: Session, request, old_status: str):
+    """Log a status change; request already carries its new status"""
+    db.add(ChangeEvent(
+        kind="status_changed", request_id=request.id, payload=_payload(request, old_status)
+    ))
+    db.info["changes_recorded"] = True
+
+
+def record_status_changes(db: Session, requests: list, old_statuses: dict):
+    """Log a batch of status changes; requests already carry their new status"""
+    db.execute(insert(ChangeEvent), [
+        {
+            "kind": "status_changed",
+            "request_id": request.id,
+            "payload": _payload(request, old_statuses[request.id]),
+        }
+        for request in requests
+    ])
+    db.info["changes_recorded"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _notify_feed(session):
+    if session.info.pop("changes_recorded", False):
+        feed.notify()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("changes_recorded", None)
+
+
+def _sse(event_id: int, kind: str, payload: str) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def _load_after(last_id: int, limit: int, up_to: Optional[int] = None) -> List[Tuple[int, str]]:
+    """(id, SSE message) for the events after last_id (and at most up_to), oldest first"""
+    with SessionLocal() as db:
+        query = db.query(ChangeEvent.id, ChangeEvent.kind, ChangeEvent.payload).filter(ChangeEvent.id > last_id)
+        if up_to is not None:
+            query = query.filter(ChangeEvent.id <= up_to)
+        rows = query.order_by(ChangeEvent.id).limit(limit).all()
+        return [(event_id, _sse(event_id, kind, payload)) for event_id, kind, payload in rows]
+
+
+def _id_range() -> Tuple[Optional[int], Optional[int]]:
+    with SessionLocal() as db:
+        return db.query(func.min(ChangeEvent.id), func.max(ChangeEvent.id)).one()
+
+
+def _prune():
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+    with SessionLocal() as db:
+        db.query(ChangeEvent).filter(ChangeEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._buffer: "deque[Tuple[int, str]]" = deque(maxlen=CHANGE_FEED_BUFFER)
+        self._last_id = 0
+        # First missing id after _last_id and when it was first noticed
+        self._gap: Optional[Tuple[int, float]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poke: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._poke = asyncio.Event()
+        self._changed = asyncio.Event()
+        _, latest = await run_in_threadpool(_id_range)
+        self._last_id = latest or 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+
+    def notify(self):
+        """Wake the broadcaster after a local commit; safe to call from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._poke.set)
+
+    async def _run(self):
+        pruned_at = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._poke.wait(), timeout=CHANGE_FEED_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._poke.clear()
+
+            try:
+                events = await run_in_threadpool(_load_after, self._last_id, CHANGE_FEED_BUFFER)
+                if time.monotonic() - pruned_at > PRUNE_EVERY_SECONDS:
+                    await run_in_threadpool(_prune)
+                    pruned_at = time.monotonic()
+            except Exception as e:
+                print(f"Error reading change events: {e}")
+                continue
+
+            published = self._advance(events)
+            if published:
+                self._buffer.extend(published)
+                changed, self._changed = self._changed, asyncio.Event()
+                changed.set()
+                if len(published) == CHANGE_FEED_BUFFER:
+                    self._poke.set()  # there may be more
+
+    def _advance(self, events: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Events that can be published in order, moving _last_id past them"""
+        published = []
+        for event_id, message in events:
+            expected = self._last_id + 1
+            if event_id > expected:
+                if self._gap is None or self._gap[0] != expected:
+                    self._gap = (expected, time.monotonic())
+                if time.monotonic() - self._gap[1] < CHANGE_FEED_GAP_SECONDS:
+                    break  # the missing ids may still commit
+            published.append((event_id, message))
+            self._last_id = event_id
+        if self._gap is not None and self._gap[0] <= self._last_id:
+            self._gap = None
+        return published
+
+    def _buffered_after(self, last_id: int) -> Optional[List[Tuple[int, str]]]:
+        """Buffered events after last_id, or None if the buffer no longer reaches back that far"""
+        if last_id >= self._last_id:
+            return []
+        if self._buffer and last_id >= self._buffer[0][0] - 1:
+            return [entry for entry in self._buffer if entry[0] > last_id]
+        return None
+
+    async def stream(self, last_id: Optional[int] = None) -> AsyncIterator[str]:
+        """SSE messages for every event after last_id; with no last_id, only for new events"""
+        yield f"retry: {int(CHANGE_FEED_POLL_SECONDS * 1000)}\n\n"
+        if last_id is None:
+            last_id = self._last_id
+        elif self._buffered_after(last_id) is None:
+            oldest, _ = await run_in_threadpool(_id_range)
+            if oldest is not None and last_id < oldest - 1:
+                # Some events in between were pruned; the client has to reload
+                yield "event: reset\ndata: {}\n\n"
+                last_id = oldest - 1
+
+        while True:
+            changed = self._changed
+            events = self._buffered_after(last_id)
+            if events is None:
+                events = await run_in_threadpool(_load_after, last_id, CHANGE_FEED_PAGE, self._last_id)
+            for event_id, message in events:
+                yield message
+                last_id = event_id
+            if events:
+                continue
+
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+
+feed = ChangeFeed()
@@ -0,0 +1,235 @@
+"""
+Local commodity classifier used as a fast path in front of the LLM.
+
+Each commodity group is a TF-IDF document built from its category, name and keywords
+(and, optionally, from requests already classified in the database). A request (title
+plus order-line descriptions) is scored by cosine similarity against every group, and a
+softmax over those scores gives the confidence. Group documents differ a lot in length,
+so the raw cosine says little about how well a request fits; its similarity is instead
+the share of the request the best group's vocabulary explains (the cosine between the
+request and its words the group knows). Unknown words count against it, so "Forklift
+rental" is only half explained by Accommodation Rentals. A prediction is used only if
+its confidence reaches LOCAL_CLASSIFIER_THRESHOLD, its similarity
+LOCAL_CLASSIFIER_MIN_SIMILARITY and its similarity lead over the runner-up group
+LOCAL_CLASSIFIER_MIN_MARGIN; everything else is escalated to the LLM. The defaults are
+the gates benchmarks/classifier_calibration.py selects on its labelled requests.
+
+Run this file directly to benchmark it against the LLM on stored requests.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from commodity_groups import COMMODITY_GROUPS, COMMODITY_KEYWORDS
+
+# Selected by benchmarks/classifier_calibration.py: 92% of in-scope requests answered
+# locally, 0.7% of those answers wrong
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", 0.5))
+LOCAL_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("LOCAL_CLASSIFIER_MIN_SIMILARITY", 0.6))
+LOCAL_CLASSIFIER_MIN_MARGIN = float(os.getenv("LOCAL_CLASSIFIER_MIN_MARGIN", 0.1))
+# Sharpness of the softmax that turns similarities into a confidence
+LOCAL_CLASSIFIER_TEMPERATURE = float(os.getenv("LOCAL_CLASSIFIER_TEMPERATURE", 25))
+LOCAL_CLASSIFIER_TRAIN_FROM_DB = os.getenv("LOCAL_CLASSIFIER_TRAIN_FROM_DB", "false").lower() == "true"
+
+STOPWORDS = {"and", "the", "for", "with", "of", "to", "in", "a", "an", "per", "more", "purchase", "new", "inch"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens plus adjacent-word bigrams, with a naive plural strip"""
+    words = []
+    for word in _TOKEN_RE.findall((text or "").lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def request_text(title: str, order_lines: list) -> str:
+    return " ".join([title or ""] + [line.get("position_description", "") for line in order_lines])
+
+
+class Prediction(NamedTuple):
+    group: Optional[dict]
+    confidence: float  # softmax over all groups, in [0, 1]; not calibrated on its own
+    similarity: float  # share of the request the best group's vocabulary explains, in [0, 1]
+    margin: float  # similarity lead over the runner-up group
+
+
+class LocalClassifier:
+    def __init__(self, groups: List[dict] = COMMODITY_GROUPS, keywords: Dict[str, List[str]] = COMMODITY_KEYWORDS):
+        self.groups = {g["id"]: g for g in groups}
+        self._seed_docs = {
+            g["id"]: tokenize(" ".join([g["category"], g["group"], g["group"]] + keywords.get(g["id"], [])))
+            for g in groups
+        }
+        self._lock = threading.Lock()
+        self.fast_path_hits = 0
+        self.escalations = 0
+        self.fit()
+
+    def fit(self, examples: Iterable[Tuple[str, str]] = ()):
+        """(Re)build the index from the group vocabulary plus (text, group id) examples"""
+        docs = {group_id: Counter(tokens) for group_id, tokens in self._seed_docs.items()}
+        for text, group_id in examples:
+            if group_id in docs:
+                docs[group_id].update(tokenize(text))
+
+        document_frequency = Counter(token for counts in docs.values() for token in counts)
+        idf = {token: math.log(len(docs) / df) + 1.0 for token, df in document_frequency.items()}
+
+        # Inverted index of token -> [(group id, normalized tf-idf weight)]
+        index = defaultdict(list)
+        for group_id, counts in docs.items():
+            weights = {token: (1 + math.log(tf)) * idf[token] for token, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for token, weight in weights.items():
+                index[token].append((group_id, weight / norm))
+
+        self._idf = idf
+        # Unknown words weigh like the rarest known ones
+        self._unknown_idf = math.log(len(docs)) + 1.0
+        self._index = dict(index)
+        self._vocabularies = {group_id: set(counts) for group_id, counts in docs.items()}
+
+    def predict(self, title: str, order_lines: list) -> Prediction:
+        """Best matching group with its confidence, similarity and margin; group None when nothing matches"""
+        # An unseen pair of known words is no evidence against a match; unseen words are
+        counts = Counter(
+            token for token in tokenize(request_text(title, order_lines)) if "_" not in token or token in self._idf
+        )
+        query = {
+            token: (1 + math.log(tf)) * self._idf.get(token, self._unknown_idf) for token, tf in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in query.values()))
+        scores = defaultdict(float)
+        for token, weight in query.items():
+            for group_id, group_weight in self._index.get(token, ()):
+                scores[group_id] += weight / norm * group_weight
+        if not scores:
+            return Prediction(None, 0.0, 0.0, 0.0)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = scores[ranked[0]]
+        # Groups without any overlap score 0 and still take part in the softmax
+        exp_sum = sum(math.exp(LOCAL_CLASSIFIER_TEMPERATURE * (score - best)) for score in scores.values())
+        exp_sum += (len(self.groups) - len(scores)) * math.exp(-LOCAL_CLASSIFIER_TEMPERATURE * best)
+
+        def explained(group_id: str) -> float:
+            vocabulary = self._vocabularies[group_id]
+            return math.sqrt(sum(w * w for token, w in query.items() if token in vocabulary)) / norm
+
+        similarity = explained(ranked[0])
+        runner_up = explained(ranked[1]) if len(ranked) > 1 else 0.0
+        return Prediction(self.groups[ranked[0]], 1.0 / exp_sum, similarity, similarity - runner_up)
+
+    def classify(
+        self,
+        title: str,
+        order_lines: list,
+        threshold: float = LOCAL_CLASSIFIER_THRESHOLD,
+        min_similarity: float = LOCAL_CLASSIFIER_MIN_SIMILARITY,
+        min_margin: float = LOCAL_CLASSIFIER_MIN_MARGIN,
+    ) -> Optional[dict]:
+        """Classification result if the prediction clears all three gates, otherwise None"""
+        prediction = self.predict(title, order_lines)
+        group, confidence = prediction.group, prediction.confidence
+        accepted = (
+            group is not None
+            and confidence >= threshold
+            and prediction.similarity >= min_similarity
+            and prediction.margin >= min_margin
+        )
+        with self._lock:
+            if accepted:
+                self.fast_path_hits += 1
+            else:
+                self.escalations += 1
+        if not accepted:
+            return None
+        return {
+            "commodity_group_id": group["id"],
+            "commodity_group": group["group"],
+            "confidence": "high",
+            "source": "local",
+            "score": round(confidence, 4),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.fast_path_hits + self.escalations
+            return {
+                "fast_path_hits": self.fast_path_hits,
+                "escalations": self.escalations,
+                "fast_path_hit_rate": self.fast_path_hits / total if total else 0.0,
+            }
+
+
+def training_examples(db, limit: int = 20_000) -> List[Tuple[str, str]]:
+    """(text, group id) pairs from the most recent already-classified requests"""
+    from sqlalchemy.orm import selectinload
+    from models import ProcurementRequest
+
+    rows = db.query(ProcurementRequest).options(
+        selectinload(ProcurementRequest.order_lines)
+    ).filter(
+        ProcurementRequest.commodity_group_id.isnot(None)
+    ).order_by(ProcurementRequest.id.desc()).limit(limit).all()
+
+    return [
+        (request_text(r.title, [{"position_description": l.position_description} for l in r.order_lines]), r.commodity_group_id)
+        for r in rows
+    ]
+
+
+def benchmark(limit: int = 200):
+    """Compare latency and agreement of the local classifier and the LLM on stored requests"""
+    from database import SessionLocal
+    from ai_services import _classify_with_llm
+
+    db = SessionLocal()
+    try:
+        examples = training_examples(db, limit)
+    finally:
+        db.close()
+
+    classifier = LocalClassifier()
+    local_time = llm_time = 0.0
+    confident = agree_confident = agree_all = 0
+
+    print(f"Benchmarking on {len(examples)} classified requests...")
+    for text, _ in examples:
+        lines = [{"position_description": text}]
+
+        start = time.perf_counter()
+        prediction = classifier.predict("", lines)
+        local_time += time.perf_counter() - start
+        group = prediction.group
+
+        start = time.perf_counter()
+        llm = _classify_with_llm("", lines)
+        llm_time += time.perf_counter() - start
+
+        same = group is not None and group["id"] == llm.get("commodity_group_id")
+        agree_all += same
+        if classifier.classify("", lines) is not None:
+            confident += 1
+            agree_confident += same
+
+    n = len(examples) or 1
+    print(f"Local: {local_time / n * 1e6:,.1f} µs per request")
+    print(f"LLM:   {llm_time / n * 1e3:,.1f} ms per request")
+    print(f"Fast-path coverage: {confident / n:.1%}")
+    print(f"Agreement with LLM: {agree_all / n:.1%} overall, "
+          f"{agree_confident / (confident or 1):.1%} on fast-path predictions")
+
+
+if __name__ == "__main__":
+    benchmark()
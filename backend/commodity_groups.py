@@ -51,6 +51,60 @@ COMMODITY_GROUPS = [
     {"id": "050", "category": "Production", "group": "Maintenance and Repairs"},
 ]
 
+# Typical purchase vocabulary per group, used by the local classifier alongside the group names
+COMMODITY_KEYWORDS = {
+    "001": ["hotel", "accommodation", "apartment", "lodging", "room", "rental", "stay", "airbnb"],
+    "002": ["membership", "association", "fee", "dues", "chamber", "subscription fee"],
+    "003": ["safety", "ppe", "helmet", "first aid", "fire extinguisher", "protective", "occupational"],
+    "004": ["consulting", "consultant", "advisory", "strategy", "management consulting", "consulting hours"],
+    "005": ["bank", "banking", "audit", "tax advisor", "accounting", "financial", "payment services"],
+    "006": ["fleet", "car", "vehicle", "leasing", "company car", "fuel card", "van"],
+    "007": ["recruitment", "recruiting", "headhunter", "job posting", "staffing", "hiring", "candidate"],
+    "008": ["training", "course", "workshop", "seminar", "certification", "coaching", "training sessions", "e-learning"],
+    "009": ["miscellaneous", "service", "services", "other"],
+    "010": ["insurance", "liability", "policy", "premium", "coverage"],
+    "011": ["electrical", "wiring", "electrician", "cabling", "lighting", "socket"],
+    "012": ["facility", "facility management", "building services", "janitorial", "property"],
+    "013": ["security", "guard", "surveillance", "cctv", "access control", "alarm"],
+    "014": ["renovation", "refurbishment", "painting", "construction", "remodeling", "flooring"],
+    "015": ["office", "chair", "chairs", "desk", "furniture", "filing cabinet", "whiteboard", "marker", "paper", "printer paper", "stationery", "organizer", "office supplies"],
+    "016": ["energy", "electricity", "power", "gas", "heating", "solar", "utility"],
+    "017": ["maintenance", "facility maintenance", "hvac", "elevator", "servicing", "inspection"],
+    "018": ["cafeteria", "kitchen", "coffee", "catering", "food", "beverages", "kitchenette", "water"],
+    "019": ["cleaning", "cleaner", "detergent", "sanitation", "housekeeping", "window cleaning"],
+    "020": ["audio", "video", "production", "filming", "recording", "studio", "photography"],
+    "021": ["book", "books", "video", "cd", "dvd", "media", "library"],
+    "022": ["printing", "print", "brochure", "flyer", "print run", "offset"],
+    "023": ["publishing software", "editorial system", "cms development", "publishing platform"],
+    "024": ["material", "paper stock", "ink", "raw material"],
+    "025": ["shipping", "freight", "production shipping"],
+    "026": ["digital product", "app development", "ebook", "digital edition", "web product"],
+    "027": ["pre-production", "layout", "typesetting", "design", "proofreading", "editing"],
+    "028": ["post-production", "color grading", "post production", "finishing", "binding"],
+    "029": ["hardware", "laptop", "laptops", "notebook", "computer", "monitor", "monitors", "keyboard", "keyboards", "mouse", "server", "switch", "switches", "router", "hard drive", "drives", "tablet", "phone", "dell", "hp", "lenovo", "logitech", "cisco"],
+    "030": ["it services", "cloud", "hosting", "cloud storage", "support", "support tickets", "api calls", "managed services", "helpdesk", "implementation", "aws", "azure", "google cloud", "saas support"],
+    "031": ["software", "license", "licenses", "licence", "subscription", "saas", "office 365", "microsoft", "adobe", "creative cloud", "salesforce", "crm", "slack", "zoom", "enterprise license", "renewal"],
+    "032": ["courier", "express", "postal", "parcel", "postage", "mail", "dhl", "ups", "fedex"],
+    "033": ["warehousing", "warehouse", "storage", "pallet", "forklift", "material handling", "racking"],
+    "034": ["transportation", "logistics", "trucking", "haulage", "freight forwarding"],
+    "035": ["delivery", "last mile", "delivery service", "distribution"],
+    "036": ["advertising", "ad", "ads", "campaign", "media buying", "commercial"],
+    "037": ["billboard", "outdoor advertising", "poster", "signage", "transit advertising"],
+    "038": ["marketing agency", "agency", "creative agency", "branding", "pr agency"],
+    "039": ["direct mail", "mailing", "mailshot", "letter campaign"],
+    "040": ["customer communication", "newsletter", "call center", "customer service", "sms"],
+    "041": ["online marketing", "seo", "sea", "google ads", "social media", "digital marketing", "adwords"],
+    "042": ["event", "events", "conference", "trade fair", "exhibition", "venue", "booth"],
+    "043": ["promotional", "merchandise", "giveaways", "branded", "swag", "promotional materials"],
+    "044": ["operational equipment", "shelving", "trolley", "workbench", "warehouse equipment"],
+    "045": ["machine", "machinery", "production machinery", "cnc", "press", "assembly line"],
+    "046": ["spare parts", "spare", "replacement part", "component", "parts"],
+    "047": ["internal transport", "conveyor", "pallet jack", "internal transportation"],
+    "048": ["production materials", "steel", "plastic", "resin", "aluminium", "granulate"],
+    "049": ["consumables", "gloves", "lubricant", "tape", "toner", "cartridge", "batteries"],
+    "050": ["repair", "repairs", "maintenance and repairs", "machine repair", "overhaul"],
+}
+
 def get_commodity_groups():
     return COMMODITY_GROUPS
 
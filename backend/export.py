@@ -0,0 +1,208 @@
+"""
+Streaming exports of requests or order lines as CSV, NDJSON or Parquet.
+
+Rows are read through a server-side cursor EXPORT_CHUNK_ROWS at a time, oldest first in
+the order of the (created_at, id) indexes so the database streams them without sorting,
+and each chunk is encoded and sent before the next is read. Memory use therefore stays
+flat however many rows are exported. CSV and NDJSON are gzip-compressed on the fly for
+clients that accept it. Parquet needs the optional pyarrow package; each PARQUET_ROW_GROUP_ROWS rows
+become one compressed row group.
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import orjson
+from sqlalchemy import select
+
+from database import SessionLocal
+from models import ProcurementRequest, OrderLine, ArchivedProcurementRequest, ArchivedOrderLine
+from queries import apply_request_filters
+import schemas
+from serialization import SUMMARY_FIELDS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, only needed for Parquet exports
+    pyarrow = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))
+PARQUET_ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", 100_000))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", 5))
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Each order line comes with the fields of its request needed to reconcile it
+_LINE_REQUEST_FIELDS = (
+    "requestor_name", "title", "vendor_name", "vat_id", "department",
+    "commodity_group_id", "commodity_group", "status", "created_at",
+)
+_LINE_FIELDS = ("position_description", "unit_price", "amount", "unit", "total_price")
+
+
+class ExportUnavailableError(Exception):
+    """Raised when the requested export format needs a package that is not installed"""
+
+
+def _columns(rows: str, archived: bool = False) -> List[Tuple[str, object]]:
+    request, line = (ArchivedProcurementRequest, ArchivedOrderLine) if archived else (ProcurementRequest, OrderLine)
+    if rows == "requests":
+        return [(field, getattr(request, field)) for field in SUMMARY_FIELDS]
+    return [
+        ("request_id", request.id),
+        *[(field, getattr(request, field)) for field in _LINE_REQUEST_FIELDS],
+        ("line_id", line.id),
+        *[(field, getattr(line, field)) for field in _LINE_FIELDS],
+    ]
+
+
+def _export_query(rows: str, filters: schemas.RequestFilters, archived: bool = False):
+    request, line = (ArchivedProcurementRequest, ArchivedOrderLine) if archived else (ProcurementRequest, OrderLine)
+    query = select(*[column.label(name) for name, column in _columns(rows, archived)])
+    # The (created_at, id) order matches every composite filter index, so no sort is needed
+    order = [request.created_at, request.id]
+    if rows == "order_lines":
+        query = query.join_from(request, line, line.request_id == request.id)
+        order.append(line.id)
+    return apply_request_filters(query.order_by(*order), filters, request)
+
+
+def _chunks(rows: str, filters: schemas.RequestFilters, include_archived: bool) -> Iterator[list]:
+    """Lists of up to EXPORT_CHUNK_ROWS row tuples read from a server-side cursor, live requests first"""
+    with SessionLocal() as db:
+        for archived in (False, True) if include_archived else (False,):
+            result = db.execute(
+                _export_query(rows, filters, archived),
+                execution_options={"stream_results": True, "yield_per": EXPORT_CHUNK_ROWS},
+            )
+            for partition in result.partitions():
+                yield partition
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv(names: List[str], chunks: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for chunk in chunks:
+        writer.writerows([_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(names: List[str], chunks: Iterator[list]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in chunk)
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer produces until it is drained"""
+
+    def __init__(self):
+        self._pending = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._pending += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._pending = bytes(self._pending), bytearray()
+        return data
+
+
+def _parquet_schema(rows: str):
+    types = {
+        "id": pyarrow.int64(), "request_id": pyarrow.int64(), "line_id": pyarrow.int64(),
+        "total_cost": pyarrow.float64(), "unit_price": pyarrow.float64(),
+        "amount": pyarrow.float64(), "total_price": pyarrow.float64(),
+        "created_at": pyarrow.timestamp("us"), "updated_at": pyarrow.timestamp("us"),
+    }
+    return pyarrow.schema([(name, types.get(name, pyarrow.string())) for name, _ in _columns(rows)])
+
+
+def _parquet(rows: str, chunks: Iterator[list]) -> Iterator[bytes]:
+    schema = _parquet_schema(rows)
+    sink = _ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    # Chunks are converted to compact Arrow batches right away and written as one row group
+    batches, pending_rows = [], 0
+    for chunk in chunks:
+        columns = zip(*chunk)
+        batches.append(pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        pending_rows += len(chunk)
+        if pending_rows >= PARQUET_ROW_GROUP_ROWS:
+            writer.write_table(pyarrow.Table.from_batches(batches), row_group_size=pending_rows)
+            batches, pending_rows = [], 0
+            yield sink.drain()
+    if batches:
+        writer.write_table(pyarrow.Table.from_batches(batches), row_group_size=pending_rows)
+    writer.close()
+    yield sink.drain()
+
+
+def export_requests(
+    format: str, rows: str, filters: schemas.RequestFilters, gzip: bool = False, include_archived: bool = False
+) -> Tuple[Iterator[bytes], dict]:
+    """
+    The encoded export as an iterator of byte chunks, and the response headers to send
+    with it. rows is "requests" for one row per request or "order_lines" for one row per
+    order line; gzip compresses CSV and NDJSON (Parquet is compressed internally).
+    Archived requests follow the live ones if include_archived is set.
+    """
+    if format == "parquet" and pyarrow is None:
+        raise ExportUnavailableError("Parquet export requires the pyarrow package")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    names = [name for name, _ in _columns(rows)]
+    chunks = _chunks(rows, filters, include_archived)
+    if format == "parquet":
+        body = _parquet(rows, chunks)
+    else:
+        body = _csv(names, chunks) if format == "csv" else _ndjson(names, chunks)
+
+    headers = {
+        "content-type": media_type,
+        "content-disposition": f'attachment; filename="{rows}.{extension}"',
+    }
+    if gzip and format != "parquet":
+        body = _gzip(body)
+        headers["content-encoding"] = "gzip"
+        headers["vary"] = "Accept-Encoding"
+    return body, headers
@@ -0,0 +1,390 @@
+"""
+PDF vendor offer extraction pipeline shared by the upload endpoint and the background job workers
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+from typing import IO, AsyncIterator, List, Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+import schemas
+from ai_services import (
+    PdfLimitError,
+    extract_text_from_pdf_async,
+    extract_text_from_pdf_in_process,
+    extract_vendor_offer_data_async,
+    extraction_cache,
+)
+from cache import SingleFlight
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+# Uploads up to this size are parsed straight from memory; larger ones go to a temp file
+UPLOAD_MEMORY_THRESHOLD_BYTES = int(os.getenv("UPLOAD_MEMORY_THRESHOLD_BYTES", 4 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 100))
+# Total size of the PDFs in one batch, ZIP members counted uncompressed
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", 200 * 1024 * 1024))
+
+pdf_extractions = SingleFlight()
+
+
+def pdf_digest(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+class UploadedPdf:
+    """
+    An uploaded PDF held in memory, in a temp file private to this upload, or in the
+    request's own spooled upload file, which stays open only while the request does
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        digest: str,
+        data: Optional[bytes] = None,
+        path: Optional[str] = None,
+        file: Optional[IO[bytes]] = None,
+    ):
+        self.filename = filename
+        self.digest = digest
+        self.data = data
+        self.path = path
+        self.file = file
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        if self.file is not None:
+            return self.file.seek(0, os.SEEK_END)
+        return os.path.getsize(self.path)
+
+    @classmethod
+    def from_bytes(cls, filename: str, contents: bytes) -> "UploadedPdf":
+        if len(contents) > MAX_UPLOAD_BYTES:
+            raise PdfLimitError(f"{filename} is larger than the {MAX_UPLOAD_BYTES} byte upload limit")
+        return cls(filename, pdf_digest(contents), data=contents)
+
+    @property
+    def source(self):
+        """What the PDF parser should open: the bytes, the upload file or the temp file path"""
+        if self.data is not None:
+            return self.data
+        if self.file is not None:
+            self.file.seek(0)
+            return self.file
+        return self.path
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        if self.file is not None:
+            self.file.seek(0)
+            return self.file.read()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def cleanup(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _Spool:
+    """
+    Collects a file written in chunks, hashing it and enforcing MAX_UPLOAD_BYTES.
+
+    The bytes stay in memory up to UPLOAD_MEMORY_THRESHOLD_BYTES; past that they are
+    spilled to a uniquely named temp file, so same-named uploads never collide.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._sha256 = hashlib.sha256()
+        self._chunks = []
+        self._size = 0
+        self._path = None
+        self._spill = None
+
+    def write(self, chunk: bytes):
+        self._size += len(chunk)
+        if self._size > MAX_UPLOAD_BYTES:
+            raise PdfLimitError(f"{self.filename} is larger than the {MAX_UPLOAD_BYTES} byte upload limit")
+        self._sha256.update(chunk)
+
+        if self._spill is None and self._size > UPLOAD_MEMORY_THRESHOLD_BYTES:
+            fd, self._path = tempfile.mkstemp(prefix="upload-", suffix=".pdf")
+            self._spill = os.fdopen(fd, "wb")
+            self._spill.writelines(self._chunks)
+            self._chunks = []
+        if self._spill is not None:
+            self._spill.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def finish(self) -> UploadedPdf:
+        if self._spill is not None:
+            self._spill.close()
+            return UploadedPdf(self.filename, self._sha256.hexdigest(), path=self._path)
+        return UploadedPdf(self.filename, self._sha256.hexdigest(), data=b"".join(self._chunks))
+
+    def discard(self):
+        if self._spill is not None:
+            self._spill.close()
+            os.remove(self._path)
+
+
+async def open_upload(file: UploadFile) -> UploadedPdf:
+    """
+    Hash an upload in place, enforcing MAX_UPLOAD_BYTES, without copying it.
+
+    The result reads from the upload's own spooled file, so it may only be used until
+    the request finishes; use read_upload for anything that outlives the request.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise PdfLimitError(f"{file.filename} is larger than the {MAX_UPLOAD_BYTES} byte upload limit")
+        sha256.update(chunk)
+    await file.seek(0)
+    return UploadedPdf(file.filename, sha256.hexdigest(), file=file.file)
+
+
+async def read_upload(file: UploadFile) -> UploadedPdf:
+    """Copy an upload in chunks, hashing it and enforcing MAX_UPLOAD_BYTES as it streams in"""
+    spool = _Spool(file.filename)
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            spool.write(chunk)
+    except BaseException:
+        spool.discard()
+        raise
+    return spool.finish()
+
+
+def _read_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo) -> UploadedPdf:
+    """Inflate one ZIP member in chunks, spilling it to a temp file like a large upload"""
+    spool = _Spool(member.filename)
+    try:
+        with archive.open(member) as f:
+            while chunk := f.read(UPLOAD_CHUNK_BYTES):
+                spool.write(chunk)
+    except BaseException:
+        spool.discard()
+        raise
+    return spool.finish()
+
+
+async def _extract_pdf(upload: UploadedPdf, parse, parsed: asyncio.Event) -> dict:
+    """Extract vendor offer data from an uploaded PDF and cache the validated result"""
+    try:
+        pdf_text = await parse(upload.source)
+    finally:
+        parsed.set()  # the upload is not read after this
+
+    # Use AI to extract structured data
+    extracted_data = schemas.ExtractedData(**await extract_vendor_offer_data_async(pdf_text)).model_dump()
+    await run_in_threadpool(extraction_cache.set, upload.digest, extracted_data)
+    return extracted_data
+
+
+async def _outlive(parsed: asyncio.Event):
+    """Wait for parsed even through further cancellations"""
+    waiter = asyncio.ensure_future(parsed.wait())
+    while not waiter.done():
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            pass
+
+
+async def extract_pdf_data(upload: UploadedPdf, in_process: bool = False) -> dict:
+    """
+    Return the ExtractedData dict for a PDF, parsing it on the batch process pool if in_process.
+
+    Identical files share one cache entry and one in-flight extraction. The shared
+    extraction parses the upload of the caller that started it, so that caller, even
+    when cancelled, does not return before the parse is over: its upload is released
+    (closed or deleted) as soon as it returns.
+    """
+    extracted_data = await run_in_threadpool(extraction_cache.get, upload.digest)
+    if extracted_data is not None:
+        return extracted_data
+
+    parse = extract_text_from_pdf_in_process if in_process else extract_text_from_pdf_async
+    parsed = None
+
+    def start():
+        nonlocal parsed
+        parsed = asyncio.Event()
+        return _extract_pdf(upload, parse, parsed)
+
+    try:
+        return await pdf_extractions.do(upload.digest, start)
+    except asyncio.CancelledError:
+        if parsed is not None:
+            await _outlive(parsed)
+        raise
+
+
+def _check_batch(count: int, total_bytes: int):
+    if count > MAX_BATCH_FILES:
+        raise ValueError(f"A batch may contain at most {MAX_BATCH_FILES} PDF files")
+    if total_bytes > MAX_BATCH_BYTES:
+        raise PdfLimitError(f"A batch may contain at most {MAX_BATCH_BYTES} bytes of PDF files")
+
+
+def unpack_batch(uploads: List[UploadedPdf]) -> List[UploadedPdf]:
+    """
+    Expand zip archives into their PDF members and reject anything that is not a PDF.
+
+    File count and total size are checked against the sizes the archives declare before
+    anything is inflated; zipfile never inflates a member past its declared size.
+    Members are inflated like uploads, so large ones go to temp files, which the caller
+    removes with cleanup() like any other upload.
+    """
+    pdfs = []
+    total_bytes = 0
+    try:
+        for upload in uploads:
+            if upload.filename.lower().endswith(".zip"):
+                source = io.BytesIO(upload.data) if upload.data is not None else upload.path
+                try:
+                    with zipfile.ZipFile(source) as archive:
+                        members = [
+                            member for member in archive.infolist()
+                            if not member.is_dir() and member.filename.lower().endswith(".pdf")
+                        ]
+                        for member in members:
+                            if member.file_size > MAX_UPLOAD_BYTES:
+                                raise PdfLimitError(
+                                    f"{member.filename} is larger than the {MAX_UPLOAD_BYTES} byte upload limit"
+                                )
+                        total_bytes += sum(member.file_size for member in members)
+                        _check_batch(len(pdfs) + len(members), total_bytes)
+                        for member in members:
+                            pdfs.append(_read_member(archive, member))
+                except zipfile.BadZipFile:
+                    raise ValueError(f"Not a valid ZIP archive: {upload.filename}")
+            elif upload.filename.lower().endswith(".pdf"):
+                total_bytes += upload.size
+                _check_batch(len(pdfs) + 1, total_bytes)
+                pdfs.append(upload)
+            else:
+                raise ValueError(f"Only PDF and ZIP files are allowed: {upload.filename}")
+    except BaseException:
+        for pdf in pdfs:
+            if pdf not in uploads:
+                pdf.cleanup()
+        raise
+    return pdfs
+
+
+async def extract_pdf_batch(pdfs: List[UploadedPdf]) -> AsyncIterator[schemas.BatchExtractionResult]:
+    """
+    Extract every PDF concurrently and yield one result per file as soon as it finishes.
+
+    Parsing fans out over the process pool; the LLM calls are bounded by LLM_MAX_CONCURRENCY.
+    """
+    async def run(upload: UploadedPdf) -> schemas.BatchExtractionResult:
+        filename, digest = upload.filename, upload.digest
+        try:
+            result = await extract_pdf_data(upload, in_process=True)
+        except asyncio.TimeoutError:
+            return schemas.BatchExtractionResult(
+                filename=filename, sha256=digest, status="failed", error="Timed out processing PDF"
+            )
+        except Exception as e:
+            return schemas.BatchExtractionResult(
+                filename=filename, sha256=digest, status="failed", error=f"Error processing PDF: {str(e)}"
+            )
+        return schemas.BatchExtractionResult(filename=filename, sha256=digest, status="completed", result=result)
+
+    tasks = [asyncio.ensure_future(run(upload)) for upload in pdfs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let them finish reading their files before the caller deletes them
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+def _body_limit(path: str) -> Optional[int]:
+    if path == "/api/upload-pdf":
+        return MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    if path == "/api/upload-pdf/batch":
+        return MAX_BATCH_BYTES + MULTIPART_OVERHEAD_BYTES
+    return None
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware answering 413 as soon as an upload body is known to be too large.
+
+    A Content-Length over the limit is rejected before any of the body is read; without
+    one, the body is counted as it streams in and the request stops once it passes the
+    limit, instead of spooling the whole body first.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = _body_limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse(
+            status_code=413, content={"detail": f"Upload is larger than the {limit} byte request limit"}
+        )
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def counting_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return  # the app's own error for the aborted body is replaced below
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not started:
+            await too_large(scope, receive, send)
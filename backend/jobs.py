@@ -0,0 +1,308 @@
+"""
+Background PDF extraction jobs.
+
+Uploads submitted in async mode are stored in extraction_jobs and processed by a small
+pool of asyncio workers running the same cached pipeline as the synchronous endpoint.
+A worker claims a job atomically and stamps it with its process's WORKER_ID; the process
+refreshes heartbeat_at on its running jobs every EXTRACTION_JOB_HEARTBEAT_SECONDS.
+Pending jobs are queued at startup, and running jobs whose heartbeat is older than
+EXTRACTION_JOB_STALE_SECONDS (their process died) are re-queued at startup and then
+periodically, so several server processes never run the same job twice. Finished jobs
+are deleted after EXTRACTION_JOB_RETENTION_DAYS.
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect, or_, text, update
+
+import schemas
+from database import SessionLocal, engine
+from extraction import UploadedPdf, extract_pdf_data
+from models import ExtractionJob
+
+EXTRACTION_JOB_WORKERS = int(os.getenv("EXTRACTION_JOB_WORKERS", 2))
+EXTRACTION_JOB_RETENTION_DAYS = float(os.getenv("EXTRACTION_JOB_RETENTION_DAYS", 7))
+EXTRACTION_JOB_HEARTBEAT_SECONDS = float(os.getenv("EXTRACTION_JOB_HEARTBEAT_SECONDS", 10))
+EXTRACTION_JOB_STALE_SECONDS = float(os.getenv("EXTRACTION_JOB_STALE_SECONDS", 60))
+
+PRUNE_EVERY_SECONDS = 3600
+
+# How long an event stream waits for a job to change before sending a keep-alive
+SSE_KEEPALIVE_SECONDS = 15
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# Jobs this process is running, kept alive by its heartbeat
+_running: Set[str] = set()
+# Set (and replaced) whenever a job's status changes in this process
+_changed: Dict[str, asyncio.Event] = {}
+
+
+def _signal(job_id: str):
+    event = _changed.pop(job_id, None)
+    if event:
+        event.set()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _to_schema(job: ExtractionJob) -> schemas.ExtractionJob:
+    return schemas.ExtractionJob(
+        id=job.id,
+        filename=job.filename,
+        status=job.status,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+def _create(upload: UploadedPdf) -> schemas.ExtractionJob:
+    with SessionLocal() as db:
+        job = ExtractionJob(
+            id=uuid.uuid4().hex,
+            filename=upload.filename,
+            sha256=upload.digest,
+            content=upload.read_bytes(),
+            status="pending",
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return _to_schema(job)
+
+
+def _load(job_id: str) -> Optional[schemas.ExtractionJob]:
+    with SessionLocal() as db:
+        job = db.get(ExtractionJob, job_id)
+        return _to_schema(job) if job else None
+
+
+def _claim(job_id: str) -> Optional[UploadedPdf]:
+    """Mark a pending job as running by this process and return its file, or None if it
+    is not pending; only one process can win the claim"""
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(ExtractionJob)
+            .where(ExtractionJob.id == job_id, ExtractionJob.status == "pending")
+            .values(status="running", worker_id=WORKER_ID, heartbeat_at=_now())
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        job = db.get(ExtractionJob, job_id)
+        return UploadedPdf(job.filename, job.sha256, data=job.content)
+
+
+def _finish(job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+    with SessionLocal() as db:
+        job = db.get(ExtractionJob, job_id)
+        if job is None:
+            return
+        job.status = "failed" if error else "completed"
+        job.result = json.dumps(result) if result is not None else None
+        job.error = error
+        job.content = None  # the file is no longer needed once the job is done
+        db.commit()
+
+
+def _ensure_columns():
+    """Add the ownership columns to extraction_jobs tables created before they existed"""
+    existing = {column["name"] for column in inspect(engine).get_columns(ExtractionJob.__tablename__)}
+    with engine.begin() as connection:
+        for column in (ExtractionJob.worker_id, ExtractionJob.heartbeat_at):
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {ExtractionJob.__tablename__} ADD COLUMN {column.name} {column_type}"
+                ))
+
+
+def _heartbeat(job_ids: List[str]):
+    with SessionLocal() as db:
+        db.execute(
+            update(ExtractionJob)
+            .where(ExtractionJob.id.in_(job_ids), ExtractionJob.worker_id == WORKER_ID)
+            .values(heartbeat_at=_now())
+        )
+        db.commit()
+
+
+def _reclaim_stale() -> List[str]:
+    """Return running jobs whose process stopped sending heartbeats to pending, and their ids"""
+    cutoff = _now() - timedelta(seconds=EXTRACTION_JOB_STALE_SECONDS)
+    with SessionLocal() as db:
+        stale = [job_id for job_id, in db.query(ExtractionJob.id).filter(
+            ExtractionJob.status == "running",
+            or_(ExtractionJob.heartbeat_at.is_(None), ExtractionJob.heartbeat_at < cutoff),
+        ).order_by(ExtractionJob.created_at).all()]
+        if stale:
+            # Re-check staleness in the UPDATE so a job that just sent a heartbeat is left alone
+            db.execute(
+                update(ExtractionJob)
+                .where(
+                    ExtractionJob.id.in_(stale),
+                    ExtractionJob.status == "running",
+                    or_(ExtractionJob.heartbeat_at.is_(None), ExtractionJob.heartbeat_at < cutoff),
+                )
+                .values(status="pending", worker_id=None)
+            )
+            db.commit()
+        return stale
+
+
+def _recover() -> List[str]:
+    """Re-queue jobs of processes that died and return every pending job id, oldest first;
+    jobs other live processes are running are left to them"""
+    _reclaim_stale()
+    with SessionLocal() as db:
+        rows = db.query(ExtractionJob.id).filter(
+            ExtractionJob.status == "pending"
+        ).order_by(ExtractionJob.created_at).all()
+        return [job_id for job_id, in rows]
+
+
+def _prune():
+    """Delete finished jobs last updated more than EXTRACTION_JOB_RETENTION_DAYS ago"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=EXTRACTION_JOB_RETENTION_DAYS)
+    with SessionLocal() as db:
+        db.query(ExtractionJob).filter(
+            ExtractionJob.status.in_(TERMINAL_STATUSES), ExtractionJob.updated_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+async def _process(job_id: str):
+    upload = await run_in_threadpool(_claim, job_id)
+    if upload is None:
+        return
+    _running.add(job_id)
+    _signal(job_id)
+    try:
+        result = await extract_pdf_data(upload)
+    except asyncio.TimeoutError:
+        await run_in_threadpool(_finish, job_id, None, "Timed out processing PDF")
+        return
+    except Exception as e:
+        await run_in_threadpool(_finish, job_id, None, f"Error processing PDF: {str(e)}")
+        return
+    await run_in_threadpool(_finish, job_id, result)
+
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _process(job_id)
+        except Exception as e:
+            # A database error while claiming or finishing must not end the worker
+            print(f"Error processing extraction job {job_id}: {e}")
+            try:
+                await run_in_threadpool(_finish, job_id, None, f"Error processing PDF: {str(e)}")
+            except Exception as e:
+                print(f"Error marking extraction job {job_id} as failed: {e}")
+        finally:
+            _running.discard(job_id)
+            _signal(job_id)
+            _queue.task_done()
+
+
+async def start_workers():
+    """Start the worker pool and re-queue jobs left over from a previous run"""
+    global _queue
+    _queue = asyncio.Queue()
+    await run_in_threadpool(_ensure_columns)
+    for job_id in await run_in_threadpool(_recover):
+        _queue.put_nowait(job_id)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(EXTRACTION_JOB_WORKERS))
+    _workers.append(asyncio.create_task(_pruner()))
+    _workers.append(asyncio.create_task(_keep_alive()))
+
+
+async def _keep_alive():
+    """Send heartbeats for this process's running jobs and take over those of dead processes"""
+    while True:
+        await asyncio.sleep(EXTRACTION_JOB_HEARTBEAT_SECONDS)
+        try:
+            if _running:
+                await run_in_threadpool(_heartbeat, list(_running))
+            for job_id in await run_in_threadpool(_reclaim_stale):
+                _queue.put_nowait(job_id)
+        except Exception as e:
+            print(f"Error sending extraction job heartbeats: {e}")
+
+
+async def _pruner():
+    while True:
+        try:
+            await run_in_threadpool(_prune)
+        except Exception as e:
+            print(f"Error pruning extraction jobs: {e}")
+        await asyncio.sleep(PRUNE_EVERY_SECONDS)
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def submit_job(upload: UploadedPdf) -> schemas.ExtractionJob:
+    """Persist a new extraction job and queue it"""
+    job = await run_in_threadpool(_create, upload)
+    _queue.put_nowait(job.id)
+    return job
+
+
+async def get_job(job_id: str) -> Optional[schemas.ExtractionJob]:
+    return await run_in_threadpool(_load, job_id)
+
+
+def _sse(event: str, job: schemas.ExtractionJob) -> str:
+    return f"event: {event}\ndata: {job.model_dump_json()}\n\n"
+
+
+async def job_events(job_id: str) -> AsyncIterator[str]:
+    """
+    Server-sent events for a job: one 'status' event per change, ending with 'completed',
+    'failed', or 'not_found' if the job is unknown or was pruned.
+
+    Changes made by this process wake the stream at once; changes made by other server
+    processes show up at the next keep-alive.
+    """
+    last_status = None
+    while True:
+        # Subscribe before reading so a change between the two is not missed
+        event = _changed.setdefault(job_id, asyncio.Event())
+        job = await get_job(job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            _changed.pop(job_id, None)
+            if job is None:
+                yield f"event: not_found\ndata: {json.dumps({'id': job_id})}\n\n"
+            else:
+                yield _sse(job.status, job)
+            return
+        if job.status != last_status:
+            yield _sse("status", job)
+            last_status = job.status
+        else:
+            yield ": keep-alive\n\n"
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout=SSE_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -1,21 +1,90 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-from typing import List
-import shutil
-import os
-from datetime import datetime, timezone
+from typing import List, Optional
+import asyncio
+import json
+from datetime import date, datetime, timezone
 
-from database import engine, get_db, Base
-from models import ProcurementRequest, OrderLine, StatusHistory
+from database import engine, get_db, Base, SessionLocal
+from models import ProcurementRequest, OrderLine, StatusHistory, ArchivedProcurementRequest
 import schemas
-from ai_services import extract_text_from_pdf, extract_vendor_offer_data, classify_commodity_group
+from ai_services import (
+    classify_commodity_group, shutdown_pdf_process_pool, PdfLimitError, LLMUnavailableError, local_classifier,
+    classification_cache, extraction_cache, breaker_stats
+)
+from classifier import LOCAL_CLASSIFIER_TRAIN_FROM_DB, training_examples
 from commodity_groups import get_commodity_groups
+from queries import apply_request_filters, paginate_requests, paginate_merged
+from extraction import (
+    UploadLimitMiddleware, extract_pdf_data, open_upload, read_upload, unpack_batch, extract_pdf_batch
+)
+import jobs
+import changes
+from bulk import create_requests_bulk, update_status_bulk, BulkLimitError, BULK_MAX_ITEMS
+from aggregates import record_created, record_status_change, ensure_aggregates, get_aggregate_statistics
+from metrics import MetricsMiddleware, instrument_engine, register_collector, render_metrics
+import profiling
+from versioning import ConditionalGetMiddleware, ensure_data_version, bump_version
+from search import ensure_search_index, index_requests, search_requests
+import analytics
+import serialization
+import archive
+from export import export_requests, ExportUnavailableError
+
+instrument_engine(engine)
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="askLio Procurement API")
+# create_all skips existing tables, so make sure indexes added later also exist on older databases
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+with SessionLocal() as startup_db:
+    ensure_aggregates(startup_db)
+    ensure_data_version(startup_db)
+    ensure_search_index(startup_db)
+    analytics.ensure_analytics(startup_db)
+    if LOCAL_CLASSIFIER_TRAIN_FROM_DB:
+        local_classifier.fit(training_examples(startup_db))
+
+register_collector(
+    lambda: {
+        (cache.namespace, name): value
+        for cache in (classification_cache, extraction_cache)
+        for name, value in cache.stats().items()
+    },
+    "cache_stat", "Hit, miss and size counters of the AI result caches", ("cache", "stat")
+)
+register_collector(
+    lambda: {(name,): value for name, value in local_classifier.stats().items()},
+    "local_classifier_stat", "Fast-path hits and escalations of the local classifier", ("stat",)
+)
+register_collector(
+    breaker_stats, "llm_circuit_breaker_stat",
+    "Whether each operation's OpenAI circuit breaker is open, and how often it opened", ("operation", "stat")
+)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await jobs.start_workers()
+    await changes.feed.start()
+    archive.archiver.start()
+    yield
+    await archive.archiver.stop()
+    await changes.feed.stop()
+    await jobs.stop_workers()
+    shutdown_pdf_process_pool()
+
+app = FastAPI(title="askLio Procurement API", lifespan=lifespan)
+
+app.add_middleware(UploadLimitMiddleware)
+# Added early so it runs inside CORS and 304s still carry the CORS headers
+app.add_middleware(ConditionalGetMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],
@@ -23,13 +92,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-os.makedirs("uploads", exist_ok=True)
+app.add_middleware(MetricsMiddleware)
+profiling.install(app, engine)
 
 @app.get("/")
 def read_root():
     return {"message": "askLio Procurement API", "version": "1.0.0"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/profiles/{profile_id}", dependencies=[Depends(profiling.require_profiling_token)])
+def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    """Get a stored request profile: the JSON summary, or the stacks in collapsed format for flamegraphs"""
+    content = profiling.load_profile(profile_id, folded=format == "folded")
+    if content is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(content)
+    return JSONResponse(json.loads(content))
+
 @app.get("/api/commodity-groups")
 def get_all_commodity_groups():
     """Get all available commodity groups"""
@@ -78,24 +162,115 @@ def create_request(request: schemas.ProcurementRequestCreate, db: Session = Depe
     db_request.status_history.append(status_hist)
 
     db.add(db_request)
+    db.flush()  # assigns the id and timestamps the change event carries
+    record_created(db, db_request)
+    analytics.record_created(db, db_request)
+    changes.record_created(db, db_request)
+    index_requests(db, [db_request.id])
+    bump_version(db)
     db.commit()
     db.refresh(db_request)
 
     return db_request
 
-@app.get("/api/requests", response_model=List[schemas.ProcurementRequest])
-def get_requests(db: Session = Depends(get_db)):
-    """Get all procurement requests"""
-    requests = db.query(ProcurementRequest).order_by(ProcurementRequest.created_at.desc()).all()
-    return requests
+@app.post("/api/requests/bulk", response_model=schemas.BulkCreateResponse)
+def create_requests_in_bulk(items: List[dict], db: Session = Depends(get_db)):
+    """Create many procurement requests in one transaction, reporting a result per item"""
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} requests per call")
+    return create_requests_bulk(db, items)
+
+def _request_page(db: Session, filters: schemas.RequestFilters, limit: int, cursor: Optional[str],
+                  include_archived: bool):
+    """Summary rows of one page of live (and optionally archived) requests, and the next cursor"""
+    query = apply_request_filters(serialization.summary_query(db), filters)
+    if not include_archived:
+        return paginate_requests(query, limit, cursor)
+    archived = apply_request_filters(
+        serialization.summary_query(db, ArchivedProcurementRequest), filters, ArchivedProcurementRequest
+    )
+    return paginate_merged([(query, ProcurementRequest), (archived, ArchivedProcurementRequest)], limit, cursor)
+
+@app.get("/api/requests", response_model=schemas.ProcurementRequestPage)
+def get_requests(
+    http_request: Request,
+    filters: schemas.RequestFilters = Depends(),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    include_archived: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Get one page of procurement requests, newest first"""
+    try:
+        rows, next_cursor = _request_page(db, filters, limit, cursor, include_archived)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Order lines for the whole page come from one batched IN query
+    items = serialization.with_order_lines(db, serialization.summaries(rows), include_archived)
+    return serialization.json_response(http_request, {"items": items, "next_cursor": next_cursor})
+
+@app.get("/api/requests/summary", response_model=schemas.ProcurementRequestSummaryPage)
+def get_request_summaries(
+    http_request: Request,
+    filters: schemas.RequestFilters = Depends(),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    include_archived: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Get one page of procurement requests without order lines, for list views"""
+    try:
+        rows, next_cursor = _request_page(db, filters, limit, cursor, include_archived)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return serialization.json_response(
+        http_request, {"items": serialization.summaries(rows), "next_cursor": next_cursor}
+    )
+
+@app.get("/api/requests/search", response_model=schemas.ProcurementRequestSearchPage)
+def search_procurement_requests(
+    http_request: Request,
+    q: str = Query(..., min_length=1),
+    filters: schemas.RequestFilters = Depends(),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over titles, vendor names and order-line descriptions, best matches first"""
+    hits, next_offset = search_requests(db, q, filters, limit, offset)
+    items = [{**serialization.summary_from_request(request), "score": score} for request, score in hits]
+    return serialization.json_response(http_request, {"items": items, "next_offset": next_offset})
+
+@app.get("/api/export")
+def export_procurement_requests(
+    http_request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    rows: str = Query("requests", pattern="^(requests|order_lines)$"),
+    include_archived: bool = False,
+    filters: schemas.RequestFilters = Depends()
+):
+    """Stream all requests, or all order lines with their request, matching the filters"""
+    try:
+        body, headers = export_requests(
+            format, rows, filters, gzip=serialization.accepts_gzip(http_request), include_archived=include_archived
+        )
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(body, headers=headers)
 
 @app.get("/api/requests/{request_id}", response_model=schemas.ProcurementRequest)
-def get_request(request_id: int, db: Session = Depends(get_db)):
-    """Get a specific procurement request"""
-    request = db.query(ProcurementRequest).filter(ProcurementRequest.id == request_id).first()
-    if not request:
+def get_request(http_request: Request, request_id: int, db: Session = Depends(get_db)):
+    """Get a specific procurement request, live or archived"""
+    rows = serialization.summary_query(db).filter(ProcurementRequest.id == request_id).all()
+    archived = not rows
+    if archived:
+        rows = serialization.summary_query(db, ArchivedProcurementRequest).filter(
+            ArchivedProcurementRequest.id == request_id
+        ).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Request not found")
-    return request
+    item, = serialization.with_order_lines(db, serialization.summaries(rows), include_archived=archived)
+    return serialization.json_response(http_request, item)
 
 @app.patch("/api/requests/{request_id}/status")
 def update_request_status(
@@ -106,104 +281,188 @@ def update_request_status(
     """Update the status of a procurement request"""
     request = db.query(ProcurementRequest).filter(ProcurementRequest.id == request_id).first()
     if not request:
+        if archive.is_archived(db, request_id):
+            raise HTTPException(status_code=409, detail="Request is archived")
         raise HTTPException(status_code=404, detail="Request not found")
 
     if status_update.new_status not in ["Open", "In Progress", "Closed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
 
     old_status = request.status
+    previous_change_at = analytics.last_status_change(db, request_id)
+    now = datetime.now(timezone.utc)
     request.status = status_update.new_status
-    request.updated_at = datetime.now(timezone.utc)
+    request.updated_at = now
 
     # Add status history
     status_hist = StatusHistory(
         request_id=request_id,
         old_status=old_status,
         new_status=status_update.new_status,
+        changed_at=now,
         notes=status_update.notes
     )
     db.add(status_hist)
+    record_status_change(db, request, old_status)
+    analytics.record_transitions(db, [(old_status, request.status, previous_change_at, now)])
+    changes.record_status_change(db, request, old_status)
+    bump_version(db)
 
     db.commit()
     db.refresh(request)
 
     return {"message": "Status updated successfully", "request": request}
 
+@app.patch("/api/requests/status", response_model=schemas.BulkStatusResponse)
+def update_request_statuses(update: schemas.BulkStatusUpdate, db: Session = Depends(get_db)):
+    """Update the status of the requests given by ids or matching filters, reporting an outcome per request"""
+    if update.new_status not in ["Open", "In Progress", "Closed"]:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    if (update.ids is None) == (update.filters is None):
+        raise HTTPException(status_code=400, detail="Pass either ids or filters")
+    if update.filters is not None and not update.filters.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="filters must restrict the requests")
+    if update.ids is not None and len(update.ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} requests per call")
+    try:
+        return update_status_bulk(db, update)
+    except BulkLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
 @app.get("/api/statistics")
 def get_statistics(db: Session = Depends(get_db)):
     """Get dashboard statistics"""
-    from sqlalchemy import func
-
-    # Get all requests
-    all_requests = db.query(ProcurementRequest).all()
-    total_requests = len(all_requests)
-
-    # Status distribution
-    status_counts = db.query(
-        ProcurementRequest.status,
-        func.count(ProcurementRequest.id)
-    ).group_by(ProcurementRequest.status).all()
-
-    status_distribution = {status: count for status, count in status_counts}
-
-    # Commodity group breakdown
-    commodity_counts = db.query(
-        ProcurementRequest.commodity_group,
-        func.count(ProcurementRequest.id),
-        func.sum(ProcurementRequest.total_cost)
-    ).group_by(ProcurementRequest.commodity_group).all()
-
-    commodity_breakdown = [
-        {
-            "commodity_group": group or "Unclassified",
-            "count": count,
-            "total_value": float(total or 0)
-        }
-        for group, count, total in commodity_counts
-    ]
-
-    # Price statistics
-    total_cost = db.query(func.sum(ProcurementRequest.total_cost)).scalar() or 0
-    avg_cost = db.query(func.avg(ProcurementRequest.total_cost)).scalar() or 0
-
-    return {
-        "total_requests": total_requests,
-        "status_distribution": status_distribution,
-        "commodity_breakdown": commodity_breakdown,
-        "price_stats": {
-            "total_cost": float(total_cost),
-            "average_cost": float(avg_cost)
-        }
-    }
-
-@app.post("/api/upload-pdf", response_model=schemas.ExtractedData)
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload a PDF and extract vendor offer data"""
+    return get_aggregate_statistics(db)
+
+@app.get("/api/analytics/spend")
+def get_spend_analytics(
+    interval: str = Query("month", pattern="^(day|week|month)$"),
+    group_by: str = Query("department", pattern="^(department|vendor|commodity_group)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Request count and spend per day, week or month, broken down by department, vendor or commodity group"""
+    return analytics.get_spend(db, interval, group_by, date_from, date_to)
 
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+@app.get("/api/analytics/lead-times")
+def get_lead_time_analytics(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Count, mean and percentiles (in hours) of the time requests spend in a status before each transition"""
+    return analytics.get_lead_times(db, date_from, date_to)
+
+@app.get("/api/changes")
+async def stream_changes(after: Optional[int] = None, last_event_id: Optional[int] = Header(None)):
+    """
+    Stream request creations and status changes as server-sent events.
+
+    Each event carries the request summary after the change (status changes also carry
+    old_status). Reconnecting clients resume after Last-Event-ID, or after the given id.
+    """
+    return StreamingResponse(
+        changes.feed.stream(after if after is not None else last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
-    # Save the uploaded file
-    file_path = f"uploads/{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+@app.post(
+    "/api/upload-pdf",
+    response_model=schemas.ExtractedData,
+    responses={202: {"model": schemas.ExtractionJob}}
+)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    mode: str = Query("sync", pattern="^(sync|async)$")
+):
+    """
+    Upload a PDF and extract vendor offer data.
 
-    try:
-        # Extract text from PDF
-        pdf_text = extract_text_from_pdf(file_path)
+    With mode=async the extraction runs in the background and a job is returned
+    immediately; poll /api/extraction-jobs/{id} or stream its /events for the result.
+    """
 
-        # Use AI to extract structured data
-        extracted_data = extract_vendor_offer_data(pdf_text)
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-        return schemas.ExtractedData(**extracted_data)
+    try:
+        # Parsed straight from the spooled upload, which lives until this handler returns
+        upload = await open_upload(file)
+    except PdfLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
+    try:
+        if mode == "async":
+            job = await jobs.submit_job(upload)
+            return JSONResponse(status_code=202, content=jsonable_encoder(job))
+
+        extracted_data = await extract_pdf_data(upload)
+    except PdfLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out processing PDF")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
-
     finally:
-        # Clean up the uploaded file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        upload.cleanup()
+
+    return schemas.ExtractedData(**extracted_data)
+
+@app.post("/api/upload-pdf/batch")
+async def upload_pdf_batch(files: List[UploadFile] = File(...)):
+    """
+    Upload several PDFs (or ZIP archives of PDFs) and extract them in parallel.
+
+    Results are streamed back as NDJSON, one BatchExtractionResult per file in completion order.
+    """
+    uploads = []
+    try:
+        # Copied, because the spooled uploads are closed before the response streams
+        for file in files:
+            uploads.append(await read_upload(file))
+        pdfs = unpack_batch(uploads)
+    except PdfLimitError as e:
+        for upload in uploads:
+            upload.cleanup()
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        for upload in uploads:
+            upload.cleanup()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        try:
+            async for item in extract_pdf_batch(pdfs):
+                yield item.model_dump_json() + "\n"
+        finally:
+            # ZIP members spilled to temp files are cleaned up along with the uploads
+            for upload in uploads + pdfs:
+                upload.cleanup()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/api/extraction-jobs/{job_id}", response_model=schemas.ExtractionJob)
+async def get_extraction_job(job_id: str):
+    """Get the status and, once finished, the result of a PDF extraction job"""
+    job = await jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/extraction-jobs/{job_id}/events")
+async def stream_extraction_job(job_id: str):
+    """Stream a PDF extraction job's progress as server-sent events"""
+    if not await jobs.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        jobs.job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
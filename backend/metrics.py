@@ -0,0 +1,231 @@
+"""
+In-process metrics exposed in the Prometheus text format on /metrics.
+
+Counters and histograms are plain dicts keyed by label values behind one lock, so
+recording a sample costs a dict lookup and a bisect. MetricsMiddleware times every
+HTTP request per route template and status code, instrument_engine hooks SQLAlchemy
+to time every statement and attribute query counts to the request that issued them,
+and observe_llm_call records latency, token usage and errors of OpenAI calls.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Seconds; HTTP and SQL share the fine buckets, LLM calls take much longer
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[tuple, object] = {}
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            items = [(key, self._snapshot(value)) for key, value in self._values.items()]
+        for key, value in sorted(items):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def _snapshot(self, value):
+        return value
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f"{self.name}_total{_format_labels(self.labels, key)} {value}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _snapshot(self, value):
+        return list(value[0]), value[1], value[2]
+
+    def _render_sample(self, key, value) -> List[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def register_collector(collect: Callable[[], Dict[Tuple[str, ...], float]], name: str, documentation: str,
+                       labels: Tuple[str, ...] = ()):
+    """Expose a gauge whose samples are read from collect() at scrape time"""
+    def render() -> List[str]:
+        lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        for key, value in sorted(collect().items()):
+            lines.append(f"{name}{_format_labels(labels, key)} {value}")
+        return lines
+    _collectors.append(render)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status code",
+    ("method", "route", "status")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement type", ("statement",)
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements issued while handling one HTTP request",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+)
+db_time_per_request = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL while handling one HTTP request", ("method", "route")
+)
+db_query_errors = Counter("db_query_errors", "SQL statements that raised", ("statement",))
+llm_call_duration = Histogram(
+    "llm_call_duration_seconds", "OpenAI call latency by operation and outcome",
+    ("operation", "outcome"), buckets=LLM_LATENCY_BUCKETS
+)
+llm_tokens = Counter("llm_tokens", "OpenAI tokens used by operation and kind", ("operation", "kind"))
+llm_errors = Counter("llm_errors", "Failed OpenAI calls by operation and exception type", ("operation", "error"))
+llm_events = Counter(
+    "llm_events", "OpenAI retries, hedged requests, hedges that won and calls refused by the circuit breaker",
+    ("operation", "event")
+)
+
+# [query count, seconds in SQL] for the HTTP request being handled, if any
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+_STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "CREATE"}
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its response has been sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            # The route template keeps label cardinality bounded; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(elapsed, method, route, str(status))
+            db_queries_per_request.observe(queries[0], method, route)
+            db_time_per_request.observe(queries[1], method, route)
+
+
+def instrument_engine(engine):
+    """Time every statement run on engine and attribute it to the current HTTP request"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_query_duration.observe(elapsed, _statement_type(statement))
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        db_query_errors.inc(_statement_type(context.statement or ""))
+
+
+def _statement_type(statement: str) -> str:
+    words = statement[:32].split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in _STATEMENT_TYPES else "OTHER"
+
+
+def observe_llm_call(operation: str, seconds: float, response=None, error: Optional[BaseException] = None):
+    """Record one OpenAI call; response supplies token usage, error marks it as failed"""
+    llm_call_duration.observe(seconds, operation, "error" if error is not None else "success")
+    if error is not None:
+        llm_errors.inc(operation, type(error).__name__)
+        return
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_tokens.inc(operation, "prompt", amount=usage.prompt_tokens or 0)
+        llm_tokens.inc(operation, "completion", amount=usage.completion_tokens or 0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -22,12 +22,24 @@ class ProcurementRequest(Base):
     order_lines = relationship("OrderLine", back_populates="request", cascade="all, delete-orphan")
     status_history = relationship("StatusHistory", back_populates="request", cascade="all, delete-orphan")
 
+    # Composite indexes matching the dashboard's keyset pagination on (created_at, id),
+    # one per equality filter so a filtered page is still a single index range scan
+    __table_args__ = (
+        Index("ix_procurement_requests_created_at_id", "created_at", "id"),
+        Index("ix_procurement_requests_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_procurement_requests_department_created_at_id", "department", "created_at", "id"),
+        Index("ix_procurement_requests_vendor_name_created_at_id", "vendor_name", "created_at", "id"),
+        Index("ix_procurement_requests_commodity_group_id_created_at_id", "commodity_group_id", "created_at", "id"),
+        # Finds requests closed long enough ago to be archived
+        Index("ix_procurement_requests_status_updated_at", "status", "updated_at"),
+    )
+
 
 class OrderLine(Base):
     __tablename__ = "order_lines"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("procurement_requests.id"))
+    request_id = Column(Integer, ForeignKey("procurement_requests.id"), index=True)
     position_description = Column(String, nullable=False)
     unit_price = Column(Float, nullable=False)
     amount = Column(Float, nullable=False)
@@ -41,10 +53,130 @@ class StatusHistory(Base):
     __tablename__ = "status_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("procurement_requests.id"))
+    request_id = Column(Integer, ForeignKey("procurement_requests.id"), index=True)
     old_status = Column(String, nullable=True)
     new_status = Column(String, nullable=False)
     changed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     notes = Column(Text, nullable=True)
 
     request = relationship("ProcurementRequest", back_populates="status_history")
+
+
+class ArchivedProcurementRequest(Base):
+    """A request moved out of procurement_requests by archive.py, keeping its id"""
+    __tablename__ = "archived_procurement_requests"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    requestor_name = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    vendor_name = Column(String, nullable=False)
+    vat_id = Column(String, nullable=False)
+    commodity_group_id = Column(String, nullable=True)
+    commodity_group = Column(String, nullable=True)
+    total_cost = Column(Float, nullable=False)
+    department = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_archived_procurement_requests_created_at_id", "created_at", "id"),
+    )
+
+
+class ArchivedOrderLine(Base):
+    __tablename__ = "archived_order_lines"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    request_id = Column(Integer, nullable=False, index=True)
+    position_description = Column(String, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    amount = Column(Float, nullable=False)
+    unit = Column(String, nullable=False)
+    total_price = Column(Float, nullable=False)
+
+
+class ArchivedStatusHistory(Base):
+    __tablename__ = "archived_status_history"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    request_id = Column(Integer, nullable=False, index=True)
+    old_status = Column(String, nullable=True)
+    new_status = Column(String, nullable=False)
+    changed_at = Column(DateTime)
+    notes = Column(Text, nullable=True)
+
+
+class StatisticsAggregate(Base):
+    """Running request count and cost per (status, commodity group), kept in step with the requests table"""
+    __tablename__ = "statistics_aggregates"
+
+    status = Column(String, primary_key=True)
+    commodity_group = Column(String, primary_key=True)  # "" for unclassified requests
+    request_count = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+
+
+class SpendRollup(Base):
+    """Requests created and their cost per day for each department, vendor and commodity group"""
+    __tablename__ = "spend_rollups"
+
+    dimension = Column(String, primary_key=True)  # department, vendor or commodity_group
+    day = Column(Date, primary_key=True)
+    name = Column(String, primary_key=True)  # "" for unclassified requests
+    request_count = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+
+
+class LeadTimeRollup(Base):
+    """Histogram of time spent in a status before each transition, per month of the transition"""
+    __tablename__ = "lead_time_rollups"
+
+    from_status = Column(String, primary_key=True)
+    to_status = Column(String, primary_key=True)
+    month = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # see analytics.duration_bucket
+    transition_count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0.0)
+    # Fastest and slowest lead time seen in this bucket, to narrow percentile interpolation
+    min_seconds = Column(Float)
+    max_seconds = Column(Float)
+
+
+class DataVersion(Base):
+    """Single-row counter bumped by every write to procurement requests; drives ETags"""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+
+class ChangeEvent(Base):
+    """Append-only log of request creations and status changes, replayed by the /api/changes feed"""
+    __tablename__ = "change_events"
+    # AUTOINCREMENT on SQLite so ids are never reused after old events are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # request_created, status_changed
+    request_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON, the request summary after the change
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+
+class ExtractionJob(Base):
+    """A queued PDF extraction; the file is kept until the job finishes so it survives restarts"""
+    __tablename__ = "extraction_jobs"
+
+    id = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    sha256 = Column(String, nullable=False)
+    content = Column(LargeBinary, nullable=True)
+    status = Column(String, default="pending", index=True)  # pending, running, completed, failed
+    worker_id = Column(String, nullable=True)  # process running the job
+    heartbeat_at = Column(DateTime, nullable=True)  # last sign of life from that process
+    result = Column(Text, nullable=True)  # ExtractedData as JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
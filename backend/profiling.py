@@ -0,0 +1,316 @@
+"""
+On-demand profiling of single requests, for debugging slow calls in production.
+
+Disabled unless PROFILING_TOKEN is set; then nothing below is installed and requests
+take exactly the normal path. When it is set, a request carrying the token in an
+X-Profile-Token header (or a profile_token query parameter) is profiled:
+
+- a sampling profiler records the stacks of the event loop while it runs this request,
+  and of the worker thread running this request's endpoint if it is a sync one
+- every SQL statement is recorded with its duration
+- time spent in FastAPI response validation and serialization (pydantic), or in the
+  orjson fast path of serialization.py, is measured separately from time spent in SQL
+
+Nothing is patched: the middleware holds the request's session in a contextvar, routes
+are created as ProfiledRoute so endpoints report to it, and serialization.json_response
+times itself with serialization_timer.
+
+The samples are written to PROFILE_DIR as <id>.folded, in the collapsed-stack format
+read by flamegraph.pl, speedscope and similar tools. A summary with the SQL statements
+is written as <id>.json. The response carries the id in X-Profile-Id and the timings in
+a Server-Timing header.
+"""
+import asyncio
+import contextlib
+import functools
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import parse_qs
+
+import anyio.to_thread
+from fastapi import Header, HTTPException, Query, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 1))
+
+# Statements longer than this are truncated in the summary
+MAX_STATEMENT_CHARS = 2000
+
+# While any request is profiled, the GIL switch interval is lowered so the sampler thread
+# gets to run about once per sample interval instead of once per default 5 ms
+_sessions_lock = threading.Lock()
+_running_sessions = 0
+_default_switch_interval = sys.getswitchinterval()
+
+_active: ContextVar[Optional["ProfileSession"]] = ContextVar("active_profile", default=None)
+
+
+def token_matches(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN and token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def is_profiling() -> bool:
+    """Whether the current request is being profiled"""
+    return _active.get() is not None
+
+
+def require_profiling_token(
+    x_profile_token: Optional[str] = Header(None),
+    profile_token: Optional[str] = Query(None)
+):
+    """Dependency guarding the profile endpoints; 404 when profiling is disabled"""
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(x_profile_token or profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.samples = Counter()
+        self.statements = []
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        # thread id -> frame below which that thread's stack belongs to this request
+        self.threads = {}
+        # (time, db_seconds) when the endpoint returned a value FastAPI still has to serialize
+        self.endpoint_returned = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+
+    def start(self, thread_id: int, root_frame):
+        global _running_sessions
+        with _sessions_lock:
+            _running_sessions += 1
+            sys.setswitchinterval(min(_default_switch_interval, PROFILE_SAMPLE_INTERVAL_MS / 1000))
+        self.threads[thread_id] = root_frame
+        self._sampler.start()
+
+    def stop(self):
+        global _running_sessions
+        self._stop.set()
+        self._sampler.join()
+        with _sessions_lock:
+            _running_sessions -= 1
+            if not _running_sessions:
+                sys.setswitchinterval(_default_switch_interval)
+
+    def _sample(self):
+        interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for thread_id, root in list(self.threads.items()):
+                stack = _stack_above(frames.get(thread_id), root)
+                if stack:
+                    self.samples[";".join(stack)] += 1
+
+    def response_started(self):
+        """Count the time since the endpoint returned, less SQL run meanwhile, as serialization"""
+        if self.endpoint_returned is not None:
+            returned_at, db_before = self.endpoint_returned
+            self.serialization_seconds += (time.perf_counter() - returned_at) - (self.db_seconds - db_before)
+            self.endpoint_returned = None
+
+    def timings(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "serialization_ms": round(self.serialization_seconds * 1000, 3),
+        }
+
+    def save(self, status: int) -> dict:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.folded"), "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        summary = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            **self.timings(),
+            "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+            "samples": sum(self.samples.values()),
+            "statement_count": len(self.statements),
+            "statements": self.statements,
+        }
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def _stack_above(frame, root) -> list:
+    """Frame labels from just above root up to frame, outermost first; empty if root is not on the stack"""
+    labels = []
+    while frame is not None and frame is not root:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    if frame is None:
+        return []
+    labels.reverse()
+    return labels
+
+
+def load_profile(profile_id: str, folded: bool = False) -> Optional[str]:
+    """Contents of a stored profile, or None if there is no such profile"""
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.{'folded' if folded else 'json'}")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that carry a valid profiling token"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not token_matches(_request_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_profile(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                session.response_started()
+                timings = session.timings()
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.id.encode()),
+                    (b"server-timing", (
+                        f"total;dur={timings['total_ms']}, db;dur={timings['db_ms']}, "
+                        f"serialize;dur={timings['serialization_ms']}"
+                    ).encode()),
+                ]
+            await send(message)
+
+        token = _active.set(session)
+        session.start(threading.get_ident(), sys._getframe())
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _active.reset(token)
+            session.stop()
+            await anyio.to_thread.run_sync(session.save, status)
+
+
+def _request_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"x-profile-token":
+            return value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if b"profile_token=" in query:
+        values = parse_qs(query.decode("latin-1")).get("profile_token")
+        return values[0] if values else None
+    return None
+
+
+@contextlib.contextmanager
+def serialization_timer():
+    """Add the time spent in the block to the profiled request's serialization time"""
+    session = _active.get()
+    if session is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.serialization_seconds += time.perf_counter() - start
+
+
+def _endpoint_returned(session: ProfileSession, result):
+    # Responses built by the endpoint go out as they are; anything else is serialized by FastAPI
+    if not isinstance(result, Response):
+        session.endpoint_returned = (time.perf_counter(), session.db_seconds)
+
+
+def _profiled_endpoint(call):
+    """Wrap an endpoint so it reports to the profiled request running it, if any"""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            result = await call(*args, **kwargs)
+            session = _active.get()
+            if session is not None:
+                _endpoint_returned(session, result)
+            return result
+        return endpoint
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        # Sync endpoints run in a worker thread, with the request's context copied over
+        session = _active.get()
+        if session is None:
+            return call(*args, **kwargs)
+        thread_id = threading.get_ident()
+        session.threads[thread_id] = sys._getframe()
+        try:
+            result = call(*args, **kwargs)
+        finally:
+            session.threads.pop(thread_id, None)
+        _endpoint_returned(session, result)
+        return result
+    return endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint registers its worker thread with the sampler and marks when it returned"""
+
+    def get_route_handler(self):
+        # The dependant is already built from the endpoint's signature; only the call is wrapped
+        self.dependant.call = _profiled_endpoint(self.dependant.call)
+        return super().get_route_handler()
+
+
+def _instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        session = _active.get()
+        if session is None or not conn.info.get("profile_start"):
+            return
+        elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+        session.db_seconds += elapsed
+        session.statements.append({
+            "statement": statement[:MAX_STATEMENT_CHARS],
+            "executemany": executemany,
+            "duration_ms": round(elapsed * 1000, 3),
+        })
+
+
+def install(app, engine):
+    """Enable profiling on app if PROFILING_TOKEN is set; otherwise do nothing. Call before adding routes."""
+    if not PROFILING_TOKEN:
+        return
+    app.router.route_class = ProfiledRoute
+    _instrument_engine(engine)
+    app.add_middleware(ProfilingMiddleware)
@@ -0,0 +1,105 @@
+"""
+Shared query helpers for procurement requests: server-side filters and keyset pagination
+"""
+import base64
+import binascii
+import heapq
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from models import ProcurementRequest
+import schemas
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC, so compare against naive UTC"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def apply_request_filters(query, filters: schemas.RequestFilters, model=ProcurementRequest):
+    """Restrict a query on requests (or on model, e.g. the archived requests) to the given filters"""
+    if filters.status:
+        query = query.filter(model.status == filters.status)
+    if filters.department:
+        query = query.filter(model.department == filters.department)
+    if filters.vendor_name:
+        query = query.filter(model.vendor_name == filters.vendor_name)
+    if filters.commodity_group_id:
+        query = query.filter(model.commodity_group_id == filters.commodity_group_id)
+    if filters.min_cost is not None:
+        query = query.filter(model.total_cost >= filters.min_cost)
+    if filters.max_cost is not None:
+        query = query.filter(model.total_cost <= filters.max_cost)
+    if filters.created_from is not None:
+        query = query.filter(model.created_at >= _naive_utc(filters.created_from))
+    if filters.created_to is not None:
+        query = query.filter(model.created_at < _naive_utc(filters.created_to))
+    return query
+
+
+def encode_cursor(created_at: datetime, request_id: int) -> str:
+    """Encode the (created_at, id) position of a row as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{request_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, request_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(request_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _seek_page(query, limit: int, cursor: Optional[str], model):
+    """Up to limit + 1 rows of query after cursor, newest first; the extra row tells whether more exist"""
+    if cursor:
+        created_at, request_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < request_id),
+            )
+        )
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+
+def _page(rows: list, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def paginate_requests(query, limit: int, cursor: Optional[str] = None, model=ProcurementRequest):
+    """
+    Fetch one page of requests newest first, continuing after the given cursor.
+
+    Ordering and seeking on (created_at, id) lets the composite indexes serve every
+    page with a range scan, so page N costs the same as page 1.
+    """
+    return _page(_seek_page(query, limit, cursor, model), limit)
+
+
+def paginate_merged(queries: List[Tuple[object, object]], limit: int, cursor: Optional[str] = None):
+    """
+    paginate_requests over several (query, model) pairs at once, e.g. live and archived
+    requests: each is seeked on its own indexes and the pages are merged.
+    """
+    pages = [_seek_page(query, limit, cursor, model) for query, model in queries]
+    rows, seen = [], set()
+    # A request archived between the queries may show up in both
+    for row in heapq.merge(*pages, key=lambda row: (row.created_at, row.id), reverse=True):
+        if row.id not in seen:
+            seen.add(row.id)
+            rows.append(row)
+        if len(rows) > limit:
+            break
+    return _page(rows, limit)
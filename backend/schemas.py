@@ -32,23 +32,95 @@ class ProcurementRequestBase(BaseModel):
 class ProcurementRequestCreate(ProcurementRequestBase):
     order_lines: List[OrderLineCreate]
 
-class ProcurementRequest(ProcurementRequestBase):
+class ProcurementRequestSummary(ProcurementRequestBase):
     id: int
     status: str
     created_at: datetime
     updated_at: datetime
-    order_lines: List[OrderLine]
 
     class Config:
         from_attributes = True
 
+class ProcurementRequest(ProcurementRequestSummary):
+    order_lines: List[OrderLine]
+
+class ProcurementRequestPage(BaseModel):
+    items: List[ProcurementRequest]
+    next_cursor: Optional[str] = None
+
+class ProcurementRequestSummaryPage(BaseModel):
+    items: List[ProcurementRequestSummary]
+    next_cursor: Optional[str] = None
+
+class ProcurementRequestSearchHit(ProcurementRequestSummary):
+    score: float
+
+class ProcurementRequestSearchPage(BaseModel):
+    items: List[ProcurementRequestSearchHit]
+    next_offset: Optional[int] = None
+
+class RequestFilters(BaseModel):
+    status: Optional[str] = None
+    department: Optional[str] = None
+    vendor_name: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    min_cost: Optional[float] = None
+    max_cost: Optional[float] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class BulkCreateResult(BaseModel):
+    index: int
+    status: str  # created or invalid
+    id: Optional[int] = None
+    commodity_group_id: Optional[str] = None
+    errors: Optional[List[dict]] = None
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkCreateResult]
+
 class StatusUpdate(BaseModel):
     new_status: str
     notes: Optional[str] = None
 
+class BulkStatusUpdate(StatusUpdate):
+    # Exactly one of ids and filters selects the requests
+    ids: Optional[List[int]] = None
+    filters: Optional[RequestFilters] = None
+
+class BulkStatusResult(BaseModel):
+    id: int
+    outcome: str  # updated, unchanged, not_found or archived
+    old_status: Optional[str] = None
+
+class BulkStatusResponse(BaseModel):
+    updated: int
+    unchanged: int
+    not_found: int
+    archived: int = 0
+    results: List[BulkStatusResult]
+
 class ExtractedData(BaseModel):
     vendor_name: Optional[str] = None
     vat_id: Optional[str] = None
     department: Optional[str] = None
     order_lines: List[OrderLineCreate] = []
     total_cost: Optional[float] = None
+
+class ExtractionJob(BaseModel):
+    id: str
+    filename: str
+    status: str
+    result: Optional[ExtractedData] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class BatchExtractionResult(BaseModel):
+    filename: str
+    sha256: str
+    status: str  # completed or failed
+    result: Optional[ExtractedData] = None
+    error: Optional[str] = None
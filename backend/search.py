@@ -0,0 +1,182 @@
+"""
+Full-text search over request titles, vendor names and order-line descriptions.
+
+Each request is one document in request_search: an FTS5 table on SQLite, or a table
+with a weighted tsvector and a GIN index on PostgreSQL. Titles weigh more than vendor
+names, which weigh more than order-line descriptions. Documents are written with one
+INSERT ... SELECT per batch of new requests, after their order lines, so the index
+stays in step with every insert path. Run this file directly to rebuild the index.
+"""
+import os
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, column, func, literal_column, table, text
+from sqlalchemy.orm import Session
+
+from models import ProcurementRequest
+from queries import apply_request_filters
+import schemas
+
+# Matches ranked per query, newest first; see search_requests
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", 2000))
+
+# Relative weights of title, vendor name and order-line descriptions
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def ensure_search_index(db: Session):
+    """Create the search table if needed and fill it for databases created before it existed"""
+    if _is_postgres(db.get_bind()):
+        db.execute(text(
+            "CREATE TABLE IF NOT EXISTS request_search ("
+            "request_id INTEGER PRIMARY KEY REFERENCES procurement_requests (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_request_search_document ON request_search USING GIN (document)"))
+    else:
+        # The prefix indexes make 2- and 3-character prefix queries as cheap as whole-word ones
+        db.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5("
+            "title, vendor_name, descriptions, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+    db.commit()
+
+    if db.execute(text("SELECT 1 FROM request_search LIMIT 1")).first() is None \
+            and db.query(ProcurementRequest.id).first() is not None:
+        rebuild_search_index(db)
+
+
+def _index_statement(bind, where: str):
+    """INSERT ... SELECT writing the search documents of the requests matching where"""
+    if _is_postgres(bind):
+        return text(f"""
+            INSERT INTO request_search (request_id, document)
+            SELECT r.id,
+                   setweight(to_tsvector('simple', r.title), 'A')
+                   || setweight(to_tsvector('simple', r.vendor_name), 'B')
+                   || setweight(to_tsvector('simple', coalesce(string_agg(l.position_description, ' '), '')), 'C')
+            FROM procurement_requests r LEFT JOIN order_lines l ON l.request_id = r.id
+            WHERE {where}
+            GROUP BY r.id
+            ON CONFLICT (request_id) DO UPDATE SET document = excluded.document
+        """)
+    return text(f"""
+        INSERT OR REPLACE INTO request_search (rowid, title, vendor_name, descriptions)
+        SELECT r.id, r.title, r.vendor_name, coalesce(group_concat(l.position_description, ' '), '')
+        FROM procurement_requests r LEFT JOIN order_lines l ON l.request_id = r.id
+        WHERE {where}
+        GROUP BY r.id
+    """)
+
+
+def index_requests(conn, ids: List[int]):
+    """(Re)index the given requests; conn is a Session or Connection inside the inserting transaction"""
+    if not ids:
+        return
+    stmt = _index_statement(conn.get_bind() if isinstance(conn, Session) else conn, "r.id IN :ids")
+    conn.execute(stmt.bindparams(bindparam("ids", expanding=True)), {"ids": list(ids)})
+
+
+def index_request_range(conn, first_id: int, last_id: int):
+    """(Re)index the requests with ids in [first_id, last_id], for bulk loads"""
+    stmt = _index_statement(conn.get_bind() if isinstance(conn, Session) else conn, "r.id BETWEEN :first AND :last")
+    conn.execute(stmt, {"first": first_id, "last": last_id})
+
+
+def rebuild_search_index(db: Session, batch_size: int = 50_000):
+    db.execute(text("DELETE FROM request_search"))
+    last_id = db.query(ProcurementRequest.id).order_by(ProcurementRequest.id.desc()).limit(1).scalar() or 0
+    for first in range(1, last_id + 1, batch_size):
+        index_request_range(db, first, first + batch_size - 1)
+    db.commit()
+
+
+def _query_terms(q: str) -> List[str]:
+    return _TERM_RE.findall(q.lower())
+
+
+def _match_expression(bind, terms: List[str]) -> str:
+    """
+    Every term must match; the last one also as a prefix so results follow the user's
+    typing, unless it is a single character (there is no prefix index that short).
+    """
+    prefix = len(terms[-1]) >= 2
+    if _is_postgres(bind):
+        return " & ".join(terms[:-1] + [terms[-1] + (":*" if prefix else "")])
+    quoted = [f'"{term}"' for term in terms]
+    if prefix:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _candidates(db: Session, filters: schemas.RequestFilters):
+    """Subquery of (id, score) for the newest SEARCH_RANK_CANDIDATES matches passing the filters"""
+    if _is_postgres(db.get_bind()):
+        index = table("request_search", column("request_id"), column("document"))
+        newest_first = index.c.request_id.desc()
+        tsquery = func.to_tsquery("simple", bindparam("match"))
+        query = db.query(
+            ProcurementRequest.id.label("id"), func.ts_rank_cd(index.c.document, tsquery).label("score")
+        ).join(index, index.c.request_id == ProcurementRequest.id).filter(index.c.document.op("@@")(tsquery))
+    else:
+        index = table("request_search", column("rowid"))
+        # Ordering on the FTS rowid lets FTS5 return matches newest first and stop early
+        newest_first = index.c.rowid.desc()
+        weights = ", ".join(str(w) for w in SQLITE_BM25_WEIGHTS)
+        # bm25 is lower for better matches
+        query = db.query(
+            ProcurementRequest.id.label("id"), literal_column(f"-bm25(request_search, {weights})").label("score")
+        ).join(index, index.c.rowid == ProcurementRequest.id).filter(text("request_search MATCH :match"))
+
+    query = apply_request_filters(query, filters)
+    return query.order_by(newest_first).limit(SEARCH_RANK_CANDIDATES).subquery("candidates")
+
+
+def search_requests(
+    db: Session,
+    q: str,
+    filters: schemas.RequestFilters,
+    limit: int,
+    offset: int = 0
+) -> Tuple[List[Tuple[ProcurementRequest, float]], Optional[int]]:
+    """
+    Best matching requests for q with their scores, and the offset of the next page if any.
+
+    Scoring every match of a very common term would cost time proportional to the
+    table, so only the newest SEARCH_RANK_CANDIDATES matches are ranked. Below that
+    many matches the ranking is exact.
+    """
+    terms = _query_terms(q)
+    if not terms:
+        return [], None
+
+    candidates = _candidates(db, filters)
+    rows = db.query(ProcurementRequest, candidates.c.score).join(
+        candidates, candidates.c.id == ProcurementRequest.id
+    ).params(match=_match_expression(db.get_bind(), terms)).order_by(
+        candidates.c.score.desc(), ProcurementRequest.id.desc()
+    ).offset(offset).limit(limit + 1).all()
+
+    next_offset = offset + limit if len(rows) > limit else None
+    return [(request, score) for request, score in rows[:limit]], next_offset
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine, Base
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Rebuilding search index...")
+        ensure_search_index(db)
+        rebuild_search_index(db)
+        print("✓ Search index rebuilt")
+    finally:
+        db.close()
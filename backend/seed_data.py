@@ -1,10 +1,25 @@
 """
-Script to populate the database with sample procurement requests for demo purposes
+Script to populate the database with sample procurement requests for demo and capacity testing.
+
+Generation is seeded and reproducible and writes with chunked bulk Core inserts, so
+millions of rows take minutes rather than hours:
+
+    python seed_data.py                                  # 20 demo requests
+    python seed_data.py --count 1000000 --seed 42 --chunk-size 20000
 """
+import argparse
 import random
+import sys
+import time
 from datetime import datetime, timedelta, timezone
-from database import SessionLocal, engine, Base
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from database import engine as default_engine, Base
 from models import ProcurementRequest, OrderLine, StatusHistory
+from aggregates import rebuild_aggregates
+from analytics import rebuild_spend_rollups, rebuild_lead_time_rollups
+from versioning import ensure_data_version, bump_version
+from search import ensure_search_index, index_request_range
 
 # Sample data pools
 REQUESTORS = ["John Smith", "Maria Garcia", "David Chen", "Sarah Johnson", "Ahmed Hassan"]
@@ -58,146 +73,168 @@ COMMODITY_GROUPS = {
 }
 
 STATUSES = ["Open", "In Progress", "Closed"]
-
-def generate_sample_requests(count=20):
-    """Generate sample procurement requests"""
-    db = SessionLocal()
-
-    try:
-        print(f"Generating {count} sample procurement requests...")
-
-        for i in range(count):
-            # Random category
-            category = random.choice(list(PRODUCTS.keys()))
-            commodity_group_id, commodity_group = COMMODITY_GROUPS[category]
-
-            # Random vendor and requestor
-            vendor = random.choice(VENDORS)
-            requestor = random.choice(REQUESTORS)
-            department = random.choice(DEPARTMENTS)
-            vat_id = random.choice(VAT_IDS)
-
-            # Generate 1-4 order lines
-            num_lines = random.randint(1, 4)
-            selected_products = random.sample(PRODUCTS[category], min(num_lines, len(PRODUCTS[category])))
-
-            order_lines_data = []
-            total_cost = 0
-
-            for product_name, unit_price, unit in selected_products:
-                # Random quantity (can be fractional for some products)
-                if unit in ["GB", "hours", "calls"]:
-                    amount = round(random.uniform(100, 10000), 2)
-                elif unit in ["licenses"]:
-                    amount = random.randint(5, 100)
-                else:
-                    amount = random.randint(1, 25)
-
-                total_price = round(unit_price * amount, 2)
-                total_cost += total_price
-
-                order_lines_data.append({
-                    "position_description": product_name,
-                    "unit_price": unit_price,
-                    "amount": float(amount),
-                    "unit": unit,
-                    "total_price": total_price
-                })
-
-            # Create title
-            title = f"{category} Purchase - {selected_products[0][0]}"
-            if len(selected_products) > 1:
-                title += f" and more"
-
-            # Random status with realistic distribution
-            status_weights = [0.3, 0.4, 0.3]  # 30% Open, 40% In Progress, 30% Closed
-            status = random.choices(STATUSES, weights=status_weights)[0]
-
-            # Create procurement request
-            request = ProcurementRequest(
-                requestor_name=requestor,
-                title=title,
-                vendor_name=vendor,
-                vat_id=vat_id,
-                commodity_group_id=commodity_group_id,
-                commodity_group=commodity_group,
-                total_cost=total_cost,
-                department=department,
-                status=status
-            )
-
-            # Set realistic timestamps (created in the last 30 days)
-            days_ago = random.randint(0, 30)
-            created_at = datetime.now(timezone.utc) - timedelta(days=days_ago)
-            request.created_at = created_at
-            request.updated_at = created_at + timedelta(hours=random.randint(1, 48))
-
-            db.add(request)
-            db.flush()  # Get the request ID
-
-            # Add order lines
-            for line_data in order_lines_data:
-                order_line = OrderLine(
-                    request_id=request.id,
-                    **line_data
-                )
-                db.add(order_line)
-
-            # Add status history
-            status_history = StatusHistory(
-                request_id=request.id,
-                old_status=None,
-                new_status="Open",
-                changed_at=created_at,
-                notes="Request created"
-            )
-            db.add(status_history)
-
-            # If status changed, add more history entries
-            if status == "In Progress":
-                progress_time = created_at + timedelta(hours=random.randint(2, 24))
-                status_history = StatusHistory(
-                    request_id=request.id,
-                    old_status="Open",
-                    new_status="In Progress",
-                    changed_at=progress_time,
-                    notes="Status changed to In Progress"
-                )
-                db.add(status_history)
-
-            elif status == "Closed":
-                progress_time = created_at + timedelta(hours=random.randint(2, 12))
-                status_history = StatusHistory(
-                    request_id=request.id,
-                    old_status="Open",
-                    new_status="In Progress",
-                    changed_at=progress_time,
-                    notes="Status changed to In Progress"
-                )
-                db.add(status_history)
-
-                closed_time = progress_time + timedelta(hours=random.randint(6, 48))
-                status_history = StatusHistory(
-                    request_id=request.id,
-                    old_status="In Progress",
-                    new_status="Closed",
-                    changed_at=closed_time,
-                    notes="Status changed to Closed"
-                )
-                db.add(status_history)
-
-            print(f"  {i+1}. Created: {title} - {status} - €{total_cost:,.2f}")
-
-        db.commit()
-        print(f"\n✓ Successfully created {count} sample requests!")
-
-    except Exception as e:
-        print(f"Error: {e}")
-        db.rollback()
-    finally:
-        db.close()
+DEFAULT_STATUS_WEIGHTS = [0.3, 0.4, 0.3]  # 30% Open, 40% In Progress, 30% Closed
+
+def _amount(rng: random.Random, unit: str) -> float:
+    # Random quantity (can be fractional for some products)
+    if unit in ["GB", "hours", "calls"]:
+        return round(rng.uniform(100, 10000), 2)
+    elif unit in ["licenses"]:
+        return float(rng.randint(5, 100))
+    return float(rng.randint(1, 25))
+
+def _created_at(rng: random.Random, now: datetime, days: int, date_distribution: str) -> datetime:
+    if date_distribution == "recent":
+        # Exponential decay: most requests are recent, with a long tail back to `days`
+        days_ago = min(rng.expovariate(4 / max(days, 1)), days)
+    else:
+        days_ago = rng.uniform(0, days)
+    return now - timedelta(days=days_ago)
+
+def _generate_chunk(rng, first_id, size, now, status_weights, days, date_distribution, min_lines, max_lines):
+    """Build the request, order line and status history rows for ids first_id .. first_id + size - 1"""
+    requests, lines, history = [], [], []
+
+    for request_id in range(first_id, first_id + size):
+        category = rng.choice(list(PRODUCTS.keys()))
+        commodity_group_id, commodity_group = COMMODITY_GROUPS[category]
+
+        num_lines = rng.randint(min_lines, max_lines)
+        selected_products = rng.sample(PRODUCTS[category], min(num_lines, len(PRODUCTS[category])))
+
+        total_cost = 0
+        for product_name, unit_price, unit in selected_products:
+            amount = _amount(rng, unit)
+            total_price = round(unit_price * amount, 2)
+            total_cost += total_price
+            lines.append({
+                "request_id": request_id,
+                "position_description": product_name,
+                "unit_price": unit_price,
+                "amount": amount,
+                "unit": unit,
+                "total_price": total_price
+            })
+
+        title = f"{category} Purchase - {selected_products[0][0]}"
+        if len(selected_products) > 1:
+            title += " and more"
+
+        status = rng.choices(STATUSES, weights=status_weights)[0]
+        created_at = _created_at(rng, now, days, date_distribution)
+
+        transitions = [{
+            "request_id": request_id, "old_status": None, "new_status": "Open",
+            "changed_at": created_at, "notes": "Request created"
+        }]
+        # If status changed, add more history entries
+        if status in ("In Progress", "Closed"):
+            progress_time = created_at + timedelta(hours=rng.randint(2, 24 if status == "In Progress" else 12))
+            transitions.append({
+                "request_id": request_id, "old_status": "Open", "new_status": "In Progress",
+                "changed_at": progress_time, "notes": "Status changed to In Progress"
+            })
+        if status == "Closed":
+            transitions.append({
+                "request_id": request_id, "old_status": "In Progress", "new_status": "Closed",
+                "changed_at": progress_time + timedelta(hours=rng.randint(6, 48)), "notes": "Status changed to Closed"
+            })
+        history.extend(transitions)
+
+        requests.append({
+            "id": request_id,
+            "requestor_name": rng.choice(REQUESTORS),
+            "title": title,
+            "vendor_name": rng.choice(VENDORS),
+            "vat_id": rng.choice(VAT_IDS),
+            "commodity_group_id": commodity_group_id,
+            "commodity_group": commodity_group,
+            "total_cost": round(total_cost, 2),
+            "department": rng.choice(DEPARTMENTS),
+            "status": status,
+            "created_at": created_at,
+            # A request was last updated by its latest status change, as the endpoints do it
+            "updated_at": transitions[-1]["changed_at"]
+        })
+
+    return requests, lines, history
+
+def generate_sample_requests(
+    count=20,
+    seed=None,
+    chunk_size=10_000,
+    status_weights=None,
+    days=30,
+    date_distribution="uniform",
+    min_lines=1,
+    max_lines=4,
+    engine=None
+):
+    """
+    Generate sample procurement requests with bulk inserts, one transaction per chunk.
+
+    The same seed always produces the same rows (timestamps are relative to now).
+    """
+    engine = engine or default_engine
+    rng = random.Random(seed)
+    status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+    now = datetime.now(timezone.utc)
+
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        ensure_search_index(db)
+    with engine.connect() as conn:
+        next_id = (conn.execute(func.max(ProcurementRequest.id).select()).scalar() or 0) + 1
+
+    print(f"Generating {count:,} sample procurement requests...")
+    started = time.perf_counter()
+    written = 0
+    while written < count:
+        size = min(chunk_size, count - written)
+        requests, lines, history = _generate_chunk(
+            rng, next_id + written, size, now, status_weights, days, date_distribution, min_lines, max_lines
+        )
+        with engine.begin() as conn:
+            conn.execute(insert(ProcurementRequest), requests)
+            conn.execute(insert(OrderLine), lines)
+            conn.execute(insert(StatusHistory), history)
+            index_request_range(conn, next_id + written, next_id + written + size - 1)
+        written += size
+
+        elapsed = time.perf_counter() - started
+        print(f"  {written:,}/{count:,} requests ({written / elapsed * 60:,.0f} per minute)", flush=True)
+
+    with Session(engine) as db:
+        ensure_data_version(db)
+        bump_version(db)
+        rebuild_aggregates(db)
+        rebuild_spend_rollups(db)
+        rebuild_lead_time_rollups(db)
+    print(f"\n✓ Successfully created {count:,} sample requests in {time.perf_counter() - started:.1f}s!")
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Populate the database with sample procurement requests")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="requests per insert transaction")
+    parser.add_argument("--status-weights", default="0.3,0.4,0.3", help="Open,In Progress,Closed weights")
+    parser.add_argument("--days", type=int, default=30, help="spread creation dates over this many days")
+    parser.add_argument("--date-distribution", choices=["uniform", "recent"], default="uniform")
+    parser.add_argument("--min-lines", type=int, default=1)
+    parser.add_argument("--max-lines", type=int, default=4)
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
     print("Sample Data Generator for askLio Procurement System")
     print("=" * 60)
-    generate_sample_requests(20)
+    generate_sample_requests(
+        args.count,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        status_weights=[float(w) for w in args.status_weights.split(",")],
+        days=args.days,
+        date_distribution=args.date_distribution,
+        min_lines=args.min_lines,
+        max_lines=args.max_lines
+    )
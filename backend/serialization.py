@@ -0,0 +1,80 @@
+"""
+Fast JSON path for the request list, detail and search responses.
+
+Through response_model, FastAPI validates every ORM object into pydantic models
+(from_attributes), dumps them back to dicts and encodes those with the stdlib json
+module; for a page of requests with order lines that costs more than the query. Here
+requests are read as plain column rows, turned straight into dicts with the fields of
+the schemas, and encoded with orjson. Bodies of at least JSON_GZIP_MIN_BYTES are
+gzip-compressed for clients that accept it. The endpoints keep their response_model so
+the OpenAPI schema still describes these responses.
+"""
+import gzip
+import os
+from typing import Iterable, List
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from models import ProcurementRequest, OrderLine, ArchivedOrderLine
+from profiling import serialization_timer
+import schemas
+
+JSON_GZIP_MIN_BYTES = int(os.getenv("JSON_GZIP_MIN_BYTES", 1024))
+JSON_GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", 5))
+
+# Field order follows the schemas so the output matches what response_model produced
+SUMMARY_FIELDS = tuple(schemas.ProcurementRequestSummary.model_fields)
+ORDER_LINE_FIELDS = tuple(schemas.OrderLine.model_fields)
+
+
+def summary_query(db: Session, model=ProcurementRequest):
+    """Query for summaries of model's requests as column rows, ready for filters and paginate_requests"""
+    return db.query(*[getattr(model, field) for field in SUMMARY_FIELDS])
+
+
+def summaries(rows: Iterable) -> List[dict]:
+    """Dicts shaped like schemas.ProcurementRequestSummary from summary_query rows"""
+    return [dict(zip(SUMMARY_FIELDS, row)) for row in rows]
+
+
+def summary_from_request(request: ProcurementRequest) -> dict:
+    """The summary dict of an already loaded ORM request"""
+    return {field: getattr(request, field) for field in SUMMARY_FIELDS}
+
+
+def with_order_lines(db: Session, items: List[dict], include_archived: bool = False) -> List[dict]:
+    """Add order_lines to request dicts, loading them in one IN query (per table)"""
+    by_request = {item["id"]: [] for item in items}
+    for item in items:
+        item["order_lines"] = by_request[item["id"]]
+    if not by_request:
+        return items
+    for model in (OrderLine, ArchivedOrderLine) if include_archived else (OrderLine,):
+        lines = db.query(*[getattr(model, field) for field in ORDER_LINE_FIELDS]).filter(
+            model.request_id.in_(list(by_request))
+        ).order_by(model.id)
+        for line in lines:
+            line = dict(zip(ORDER_LINE_FIELDS, line))
+            by_request[line["request_id"]].append(line)
+    return items
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def json_response(request: Request, content, status_code: int = 200) -> Response:
+    """Encode content with orjson, gzip-compressed if it is large and the client accepts it"""
+    with serialization_timer():
+        body = dumps(content)
+        headers = {"vary": "Accept-Encoding"}
+        if len(body) >= JSON_GZIP_MIN_BYTES and accepts_gzip(request):
+            body = gzip.compress(body, compresslevel=JSON_GZIP_LEVEL)
+            headers["content-encoding"] = "gzip"
+        return Response(body, status_code=status_code, headers=headers, media_type="application/json")
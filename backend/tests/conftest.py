@@ -0,0 +1,169 @@
+"""
+Shared fixtures. The app is imported against a throwaway SQLite database, cache and
+profile directory, with profiling enabled and no OpenAI key, so tests never touch
+procurement.db or call OpenAI.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import contextlib
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func
+
+_directory = tempfile.mkdtemp(prefix="asklio-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_directory}/procurement.db",
+    "CACHE_DB_PATH": f"{_directory}/cache.db",
+    "PROFILING_TOKEN": "test-token",
+    "PROFILE_DIR": f"{_directory}/profiles",
+    "OPENAI_API_KEY": "",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from aggregates import rebuild_aggregates  # noqa: E402
+from analytics import rebuild_lead_time_rollups, rebuild_spend_rollups  # noqa: E402
+from models import (  # noqa: E402
+    ProcurementRequest, OrderLine, StatusHistory,
+    ArchivedProcurementRequest, ArchivedOrderLine, ArchivedStatusHistory
+)
+from search import rebuild_search_index  # noqa: E402
+import archive  # noqa: E402
+from versioning import bump_version  # noqa: E402
+import main  # noqa: E402
+
+PROFILING_TOKEN = os.environ["PROFILING_TOKEN"]
+
+# Endpoints served from the statistics aggregates and analytics rollups
+DERIVED_ENDPOINTS = [
+    "/api/statistics",
+    *[f"/api/analytics/spend?interval=day&group_by={dimension}" for dimension in ("department", "vendor", "commodity_group")],
+    "/api/analytics/lead-times",
+]
+
+
+def rebuild_derived(db):
+    """Recompute aggregates, rollups and the search index from the tables"""
+    rebuild_aggregates(db)
+    rebuild_spend_rollups(db)
+    rebuild_lead_time_rollups(db)
+    rebuild_search_index(db)
+    bump_version(db)
+    db.commit()
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_requests():
+    """
+    Replace all live and archived requests with count new ones, each with lines order lines,
+    and rebuild what is derived from them; returns their ids
+    """
+    def make(count: int, lines: int = 3) -> list:
+        now = datetime.now(timezone.utc)
+        with SessionLocal() as db:
+            for model in (
+                OrderLine, StatusHistory, ProcurementRequest,
+                ArchivedOrderLine, ArchivedStatusHistory, ArchivedProcurementRequest
+            ):
+                db.query(model).delete()
+            requests = [
+                ProcurementRequest(
+                    requestor_name="Test", title=f"Request {i}", vendor_name=f"Vendor {i % 5}",
+                    vat_id="DE123456789", total_cost=100.0 * lines, department="IT",
+                    created_at=now - timedelta(minutes=i), updated_at=now - timedelta(minutes=i),
+                    order_lines=[
+                        OrderLine(
+                            position_description=f"Item {j}", unit_price=100.0, amount=1,
+                            unit="pieces", total_price=100.0
+                        )
+                        for j in range(lines)
+                    ],
+                )
+                for i in range(count)
+            ]
+            db.add_all(requests)
+            db.commit()
+            rebuild_derived(db)
+            return [request.id for request in requests]
+    return make
+
+
+@pytest.fixture
+def archive_requests(client):
+    """
+    Closes the given requests and archives them. The newest request is closed last and
+    stays live, as archival never moves the request holding the highest ids.
+    """
+    def archive_(ids: list):
+        with SessionLocal() as db:
+            newest = db.query(func.max(ProcurementRequest.id)).scalar()
+        assert newest not in ids
+        for request_id in [*ids, newest]:
+            response = client.patch(f"/api/requests/{request_id}/status", json={"new_status": "Closed"})
+            assert response.status_code == 200
+        with SessionLocal() as db:
+            assert archive.archive_batch(db, datetime.now(timezone.utc) + timedelta(days=1)) == len(ids)
+    return archive_
+
+
+@pytest.fixture
+def read_derived(client):
+    """Reads the aggregate and rollup endpoints, normalized for comparison"""
+    def read() -> list:
+        return [_normalized(client.get(path).json()) for path in DERIVED_ENDPOINTS]
+    return read
+
+
+@pytest.fixture
+def assert_derived_consistent(read_derived):
+    """Asserts the aggregate and rollup endpoints read the same as after a rebuild from the tables"""
+    read = read_derived
+
+    def check():
+        before = read()
+        with SessionLocal() as db:
+            rebuild_derived(db)
+        assert before == read()
+    return check
+
+
+def _normalized(value):
+    """Rounds floats and sorts lists so payloads compare regardless of summation and row order"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _normalized(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((_normalized(item) for item in value), key=repr)
+    return value
+
+
+@pytest.fixture
+def count_statements():
+    """Context manager yielding a list that collects the SQL statements executed inside it"""
+    @contextlib.contextmanager
+    def count():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return count
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import sqlite
+
+import aggregates
+import analytics
+from aggregates import UnsupportedDatabaseError, upsert_dialect
+from database import SessionLocal
+from models import SpendRollup
+
+
+def _db(dialect_name: str):
+    """Stand-in session bound to a backend of the given dialect"""
+    bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect_name))
+    return SimpleNamespace(get_bind=lambda: bind, execute=lambda stmt: pytest.fail("no SQL may be run"))
+
+
+def test_sqlite_builds_sqlite_upserts(client):
+    with SessionLocal() as db:
+        assert upsert_dialect(db) is sqlite
+
+
+@pytest.mark.parametrize("write", [
+    lambda db: aggregates._upsert(db, "Open", "Software", 1, 10.0),
+    lambda db: analytics._increment(db, SpendRollup, {"dimension": "department"}, request_count=1),
+    aggregates.ensure_aggregates,
+], ids=["aggregates", "analytics", "startup"])
+def test_other_backends_are_refused(write):
+    with pytest.raises(UnsupportedDatabaseError, match="PostgreSQL or SQLite, not mysql"):
+        write(_db("mysql"))
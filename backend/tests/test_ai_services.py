@@ -0,0 +1,77 @@
+import asyncio
+
+import openai
+import pytest
+
+import ai_services
+from benchmarks.openai_stub import StubConfig, start_stub
+
+MESSAGES = [{"role": "system", "content": "You are a data extraction assistant. Always return valid JSON."}]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """OpenAI stub the shared sync client points at, with fresh circuit breakers"""
+    config = StubConfig(latency_ms=0)
+    server = start_stub(0, config)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    monkeypatch.setattr(ai_services, "_client", openai.OpenAI(api_key="stub-key", base_url=base_url, max_retries=0))
+    monkeypatch.setattr(ai_services, "_async_client", openai.AsyncOpenAI(
+        api_key="stub-key", base_url=base_url, max_retries=0
+    ))
+    monkeypatch.setattr(openai, "api_key", "stub-key")
+    monkeypatch.setattr(ai_services, "_breakers", {})
+    monkeypatch.setattr(ai_services, "LLM_MAX_RETRIES", 0)
+    yield config
+    server.shutdown()
+
+
+@pytest.fixture
+def scaled_deadlines(monkeypatch):
+    """The timeouts scaled from seconds to tenths: a generic attempt 0.1 s, an extraction attempt 0.6 s"""
+    monkeypatch.setattr(ai_services, "LLM_ATTEMPT_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(ai_services, "EXTRACTION_ATTEMPT_TIMEOUT_SECONDS", 0.6)
+    monkeypatch.setattr(ai_services, "EXTRACTION_TIMEOUT_SECONDS", 1.0)
+    monkeypatch.setattr(ai_services, "LLM_HEDGE_AFTER_SECONDS", 0)
+
+
+def _extract(asynchronous: bool) -> dict:
+    if asynchronous:
+        return asyncio.run(ai_services.extract_vendor_offer_data_async("Offer text"))
+    return ai_services.extract_vendor_offer_data("Offer text")
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_slow_extraction_within_its_deadline_completes(stub, scaled_deadlines, asynchronous):
+    # Slower than a generic attempt may take, well within an extraction attempt
+    stub.latency_ms = 300
+
+    result = _extract(asynchronous)
+
+    assert result["vendor_name"] == "Stub Supplies GmbH"
+    assert stub.calls == 1
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_extraction_past_its_deadline_times_out(stub, scaled_deadlines, asynchronous):
+    stub.latency_ms = 900
+
+    with pytest.raises(TimeoutError):
+        _extract(asynchronous)
+    assert ai_services.breaker_for("extraction").stats()["open"] == 0
+
+
+def test_slow_extractions_do_not_trip_classification(stub):
+    stub.latency_ms = 300
+    for _ in range(ai_services.LLM_BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises((TimeoutError, ai_services.LLMUnavailableError)):
+            ai_services._chat_completion(
+                "extraction", deadline=1, attempt_timeout=0.1, model="gpt-4", messages=MESSAGES
+            )
+    assert ai_services.breaker_for("extraction").stats()["open"] == 1
+
+    calls = stub.calls
+    result = ai_services._classify_with_llm("Adobe licenses", [{"position_description": "Photoshop"}])
+    assert result["commodity_group_id"] == "031"
+    assert stub.calls == calls + 1
+    assert ai_services.breaker_for("classification").stats()["open"] == 0
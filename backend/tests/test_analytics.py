@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+
+import analytics
+from database import SessionLocal, engine
+from models import LeadTimeRollup
+
+START = datetime(2025, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db(client):
+    with SessionLocal() as db:
+        db.query(LeadTimeRollup).delete()
+        db.commit()
+        yield db
+        db.query(LeadTimeRollup).delete()
+        db.commit()
+
+
+def _record(db, *seconds):
+    analytics.record_transitions(db, [
+        ("Open", "In Progress", START, START + timedelta(seconds=s)) for s in seconds
+    ])
+    db.commit()
+
+
+def _lead_time(db) -> dict:
+    (transition,) = analytics.get_lead_times(db)["transitions"]
+    return {key: value * 3600 if key.endswith("_hours") else value for key, value in transition.items()}
+
+
+def test_sub_second_transitions_report_sub_second_percentiles(db):
+    _record(db, 0.2, 0.3, 0.4)
+    _record(db, 0.5, 0.6, 0.9)  # a second write to the same rollup rows
+
+    lead_time = _lead_time(db)
+    assert lead_time["count"] == 6
+    for p in analytics.LEAD_TIME_PERCENTILES:
+        assert 0.2 <= lead_time[f"p{p}_hours"] <= 0.9
+    row = db.query(LeadTimeRollup).one()
+    assert (row.min_seconds, row.max_seconds) == (pytest.approx(0.2), pytest.approx(0.9))
+
+
+def test_percentiles_stay_within_observed_lead_times(db):
+    _record(db, *[3600 + i for i in range(100)])
+    lead_time = _lead_time(db)
+    assert 3600 <= lead_time["p50_hours"] <= lead_time["p99_hours"] <= 3699
+    assert lead_time["p50_hours"] == pytest.approx(3650, rel=0.01)
+
+
+def test_rollup_table_without_extremes_is_recreated(db):
+    LeadTimeRollup.__table__.drop(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE lead_time_rollups (from_status VARCHAR, to_status VARCHAR, month DATE, bucket INTEGER, "
+            "transition_count INTEGER, total_seconds FLOAT, PRIMARY KEY (from_status, to_status, month, bucket))"
+        ))
+    analytics.ensure_analytics(db)
+    columns = {column["name"] for column in inspect(engine).get_columns("lead_time_rollups")}
+    assert {"min_seconds", "max_seconds"} <= columns
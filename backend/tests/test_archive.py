@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+
+import archive
+from database import SessionLocal
+from models import (
+    ProcurementRequest, OrderLine, StatusHistory,
+    ArchivedProcurementRequest, ArchivedOrderLine, ArchivedStatusHistory
+)
+
+
+def _close(client, *ids):
+    for request_id in ids:
+        assert client.patch(f"/api/requests/{request_id}/status", json={"new_status": "Closed"}).status_code == 200
+
+
+def _archive() -> int:
+    with SessionLocal() as db:
+        return archive.archive_batch(db, datetime.now(timezone.utc) + timedelta(days=1))
+
+
+def _rows(db, model, ids) -> dict:
+    """Row count per request id in model, for the given ids"""
+    key = model.id if model in (ProcurementRequest, ArchivedProcurementRequest) else model.request_id
+    counts = {}
+    for request_id, in db.query(key).filter(key.in_(ids)):
+        counts[request_id] = counts.get(request_id, 0) + 1
+    return counts
+
+
+def test_archiving_moves_requests_with_lines_and_history(client, make_requests):
+    ids = make_requests(4, lines=2)
+    _close(client, ids[0], ids[1], ids[-1])
+
+    assert _archive() == 2
+
+    moved = ids[:2]
+    with SessionLocal() as db:
+        for model in (ProcurementRequest, OrderLine, StatusHistory):
+            assert _rows(db, model, moved) == {}
+        assert _rows(db, ArchivedProcurementRequest, moved) == {ids[0]: 1, ids[1]: 1}
+        assert _rows(db, ArchivedOrderLine, moved) == {ids[0]: 2, ids[1]: 2}
+        assert _rows(db, ArchivedStatusHistory, moved) == {ids[0]: 1, ids[1]: 1}
+        assert _rows(db, ProcurementRequest, ids[2:]) == {ids[2]: 1, ids[3]: 1}
+
+    detail = client.get(f"/api/requests/{ids[0]}").json()
+    assert (detail["id"], detail["status"], len(detail["order_lines"])) == (ids[0], "Closed", 2)
+    assert client.get("/api/requests/summary", params={"status": "Closed"}).json()["items"][0]["id"] == ids[-1]
+    listed = client.get("/api/requests/summary", params={"status": "Closed", "include_archived": True}).json()
+    assert sorted(item["id"] for item in listed["items"]) == [ids[0], ids[1], ids[-1]]
+
+
+def test_statistics_spend_and_lead_times_do_not_change(client, make_requests, read_derived, assert_derived_consistent):
+    ids = make_requests(5)
+    client.patch(f"/api/requests/{ids[0]}/status", json={"new_status": "In Progress"})
+    _close(client, *ids)
+    before = read_derived()
+
+    assert _archive() == 4
+
+    assert read_derived() == before
+    assert_derived_consistent()
+
+
+def test_archived_requests_reject_writes(client, make_requests, archive_requests):
+    ids = make_requests(3)
+    archive_requests([ids[0]])
+
+    response = client.patch(f"/api/requests/{ids[0]}/status", json={"new_status": "Open"})
+
+    assert response.status_code == 409
+    assert client.get(f"/api/requests/{ids[0]}").json()["status"] == "Closed"
+    assert client.patch(f"/api/requests/{ids[-1] + 1000}/status", json={"new_status": "Open"}).status_code == 404
+
+
+def test_archived_requests_leave_search(client, make_requests, archive_requests):
+    ids = make_requests(3)
+    assert {item["id"] for item in client.get("/api/requests/search", params={"q": "request"}).json()["items"]} == set(ids)
+
+    archive_requests([ids[0]])
+
+    assert {item["id"] for item in client.get("/api/requests/search", params={"q": "request"}).json()["items"]} == set(ids[1:])
+
+
+def test_rows_holding_the_highest_ids_stay_live(client, make_requests):
+    ids = make_requests(4)
+    # ids[-1] holds the highest request and order line ids, ids[1] the highest history id
+    _close(client, ids[0], ids[-1], ids[1])
+
+    assert _archive() == 1
+    assert _archive() == 0
+
+    with SessionLocal() as db:
+        assert _rows(db, ArchivedProcurementRequest, ids) == {ids[0]: 1}
+    created = client.post("/api/requests", json={
+        "requestor_name": "Test", "title": "New", "vendor_name": "Vendor", "vat_id": "DE123456789",
+        "department": "IT", "total_cost": 1.0, "commodity_group_id": "031", "commodity_group": "Software",
+        "order_lines": [{"position_description": "Item", "unit_price": 1.0, "amount": 1, "unit": "pieces", "total_price": 1.0}],
+    }).json()
+    assert created["id"] == ids[-1] + 1
+
+    # Once newer rows exist, the previously protected requests move too
+    assert _archive() == 2
@@ -0,0 +1,89 @@
+import pytest
+
+import ai_services
+from database import SessionLocal
+from models import OrderLine, StatusHistory
+
+
+def _item(title: str, lines: int = 2, **fields) -> dict:
+    return {
+        "requestor_name": "Test", "title": title, "vendor_name": "Vendor", "vat_id": "DE123456789",
+        "department": "IT", "total_cost": 10.0 * lines,
+        "order_lines": [
+            {"position_description": f"{title} item {j}", "unit_price": 10.0, "amount": 1, "unit": "pieces", "total_price": 10.0}
+            for j in range(lines)
+        ],
+        **fields,
+    }
+
+
+@pytest.fixture
+def llm_batches(monkeypatch):
+    """Sends every classification to a stubbed batch LLM call, recording the titles per call"""
+    batches = []
+
+    def classify_batch(items):
+        batches.append([title for title, _ in items])
+        return [{"commodity_group_id": "031", "commodity_group": "Software", "confidence": "high"} for _ in items]
+
+    monkeypatch.setattr(ai_services, "CLASSIFICATION_BATCH_SIZE", 2)
+    monkeypatch.setattr(ai_services.classification_cache, "get", lambda key: None)
+    monkeypatch.setattr(ai_services.classification_cache, "set", lambda key, value: None)
+    monkeypatch.setattr(ai_services.local_classifier, "classify", lambda title, order_lines: None)
+    monkeypatch.setattr(ai_services, "_classify_batch_with_llm", classify_batch)
+    return batches
+
+
+def test_invalid_items_are_reported_without_failing_the_batch(client, make_requests, llm_batches):
+    make_requests(0)
+    items = [_item("A"), {"title": "No vendor"}, _item("B"), _item("C", total_cost="lots")]
+
+    response = client.post("/api/requests/bulk", json=items)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [result["status"] for result in body["results"]] == ["created", "invalid", "created", "invalid"]
+    assert [result["index"] for result in body["results"]] == [0, 1, 2, 3]
+    assert {error["loc"][0] for error in body["results"][1]["errors"]} >= {"requestor_name", "vendor_name"}
+    assert [error["loc"] for error in body["results"][3]["errors"]] == [["total_cost"]]
+    assert [client.get(f"/api/requests/{result['id']}").json()["title"] for result in body["results"][::2]] == ["A", "B"]
+
+
+def test_unclassified_items_are_classified_in_batches(client, make_requests, llm_batches):
+    make_requests(0)
+    items = [_item("A"), _item("B"), _item("Preset", commodity_group_id="029", commodity_group="Hardware"),
+             _item("C"), _item("A"), _item("D"), _item("E")]
+
+    results = client.post("/api/requests/bulk", json=items).json()["results"]
+
+    # Duplicates share one classification and pre-classified items are not sent at all
+    assert llm_batches == [["A", "B"], ["C", "D"], ["E"]]
+    assert [result["commodity_group_id"] for result in results] == ["031", "031", "029", "031", "031", "031", "031"]
+
+
+def test_ids_follow_the_input_order(client, make_requests, llm_batches):
+    make_requests(0)
+    titles = [f"Request {i}" for i in range(7)]
+
+    results = client.post("/api/requests/bulk", json=[_item(title) for title in titles]).json()["results"]
+
+    ids = [result["id"] for result in results]
+    assert ids == sorted(ids)
+    assert [client.get(f"/api/requests/{request_id}").json()["title"] for request_id in ids] == titles
+
+
+def test_order_lines_and_history_are_inserted(client, make_requests, llm_batches, assert_derived_consistent):
+    make_requests(0)
+
+    results = client.post("/api/requests/bulk", json=[_item("A", lines=1), _item("B", lines=3)]).json()["results"]
+
+    ids = [result["id"] for result in results]
+    with SessionLocal() as db:
+        for request_id, title, lines in zip(ids, ["A", "B"], [1, 3]):
+            descriptions = db.query(OrderLine.position_description).filter(OrderLine.request_id == request_id).all()
+            assert sorted(description for description, in descriptions) == [f"{title} item {j}" for j in range(lines)]
+            history = db.query(StatusHistory).filter(StatusHistory.request_id == request_id).all()
+            assert [(row.old_status, row.new_status) for row in history] == [(None, "Open")]
+    assert [item["id"] for item in client.get("/api/requests/search", params={"q": "B item"}).json()["items"]] == [ids[1]]
+    assert_derived_consistent()
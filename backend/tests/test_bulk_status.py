@@ -0,0 +1,74 @@
+from database import SessionLocal
+from models import StatusHistory
+
+
+def _history(request_id: int) -> list:
+    with SessionLocal() as db:
+        return [
+            (row.old_status, row.new_status, row.notes)
+            for row in db.query(StatusHistory).filter(StatusHistory.request_id == request_id).order_by(StatusHistory.id)
+        ]
+
+
+def test_mixed_batch_reports_an_outcome_per_id(client, make_requests, archive_requests, assert_derived_consistent):
+    ids = make_requests(6)
+    archive_requests([ids[1]])
+    assert client.patch(f"/api/requests/{ids[3]}/status", json={"new_status": "In Progress"}).status_code == 200
+    missing = ids[-1] + 1000
+
+    response = client.patch("/api/requests/status", json={
+        "ids": [ids[0], ids[3], missing, ids[1], ids[4], ids[0]],
+        "new_status": "In Progress",
+        "notes": "Batch",
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["updated"], body["unchanged"], body["not_found"], body["archived"]) == (2, 1, 1, 1)
+    assert [(result["id"], result["outcome"], result["old_status"]) for result in body["results"]] == [
+        (ids[0], "updated", "Open"),
+        (ids[3], "unchanged", "In Progress"),
+        (missing, "not_found", None),
+        (ids[1], "archived", None),
+        (ids[4], "updated", "Open"),
+    ]
+    for request_id in (ids[0], ids[4]):
+        assert client.get(f"/api/requests/{request_id}").json()["status"] == "In Progress"
+    assert client.get(f"/api/requests/{ids[1]}").json()["status"] == "Closed"
+    assert_derived_consistent()
+
+
+def test_history_is_written_for_changed_ids_only(client, make_requests):
+    ids = make_requests(3)
+    client.patch(f"/api/requests/{ids[1]}/status", json={"new_status": "Closed", "notes": "Single"})
+
+    client.patch("/api/requests/status", json={"ids": ids, "new_status": "Closed", "notes": "Batch"})
+
+    assert _history(ids[0]) == [("Open", "Closed", "Batch")]
+    assert _history(ids[1]) == [("Open", "Closed", "Single")]
+    assert _history(ids[2]) == [("Open", "Closed", "Batch")]
+
+
+def test_filters_select_the_requests(client, make_requests, assert_derived_consistent):
+    ids = make_requests(10)
+
+    response = client.patch("/api/requests/status", json={
+        "filters": {"vendor_name": "Vendor 2"}, "new_status": "Closed"
+    })
+
+    # make_requests spreads the requests over five vendors
+    assert [result["id"] for result in response.json()["results"]] == [ids[2], ids[7]]
+    assert response.json()["updated"] == 2
+    assert_derived_consistent()
+
+
+def test_rejects_ambiguous_selection(client, make_requests):
+    ids = make_requests(1)
+    for payload in (
+        {"new_status": "Closed"},
+        {"ids": ids, "filters": {"status": "Open"}, "new_status": "Closed"},
+        {"filters": {}, "new_status": "Closed"},
+        {"ids": ids, "new_status": "Done"},
+    ):
+        assert client.patch("/api/requests/status", json=payload).status_code == 400
+    assert _history(ids[0]) == []
@@ -0,0 +1,28 @@
+import changes
+from changes import ChangeFeed
+
+
+def _events(*ids):
+    return [(event_id, f"id: {event_id}\n\n") for event_id in ids]
+
+
+def test_feed_waits_for_ids_committed_out_of_order():
+    feed = ChangeFeed()
+    feed._last_id = 10
+
+    # 12 committed before 11: hold it back until 11 shows up
+    assert feed._advance(_events(12)) == []
+    assert feed._last_id == 10
+    assert [event_id for event_id, _ in feed._advance(_events(11, 12))] == [11, 12]
+    assert feed._last_id == 12 and feed._gap is None
+
+
+def test_feed_skips_gap_after_timeout(monkeypatch):
+    feed = ChangeFeed()
+    feed._last_id = 10
+    assert feed._advance(_events(12, 13)) == []
+
+    # 11 was rolled back and will never appear
+    monkeypatch.setattr(changes, "CHANGE_FEED_GAP_SECONDS", 0.0)
+    assert [event_id for event_id, _ in feed._advance(_events(12, 13))] == [12, 13]
+    assert feed._last_id == 13 and feed._gap is None
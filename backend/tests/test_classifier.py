@@ -0,0 +1,78 @@
+import pytest
+
+import ai_services
+import classifier as classifier_module
+from benchmarks.classifier_calibration import LABELLED, MAX_ERROR_RATE, SEED_PRODUCTS, sweep
+from classifier import LocalClassifier
+
+# The one wrong fast-path answer the calibration accepts: filed under Maintenance and Repairs
+KNOWN_MISS = "Coffee machine repair"
+OUT_OF_SCOPE = [(title, descriptions) for title, descriptions, expected in LABELLED if expected is None]
+SEED_REQUESTS = [
+    (f"{category} Purchase - {product}", [{"position_description": product}], group_id)
+    for category, products in SEED_PRODUCTS.items()
+    for product, group_id in products
+]
+
+
+def _lines(descriptions):
+    return [{"position_description": description} for description in descriptions]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return LocalClassifier()
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Routes classify_commodity_group past the cache and records LLM calls instead of making them"""
+    calls = []
+
+    def classify_with_llm(title, order_lines):
+        calls.append(title)
+        return {"commodity_group_id": None, "commodity_group": None, "confidence": "low"}
+
+    monkeypatch.setattr(ai_services.classification_cache, "get", lambda key: None)
+    monkeypatch.setattr(ai_services, "_classify_with_llm", classify_with_llm)
+    return calls
+
+
+@pytest.mark.parametrize("title, order_lines, group_id", [
+    # The example from the original request, as create_request passes it
+    ("Microsoft Office 365 Licenses", [{"position_description": "Microsoft Office 365 Licenses"}], "031"),
+    ("Dell laptops", [{"position_description": "Dell Latitude Laptops"}], "029"),
+    *SEED_REQUESTS,
+])
+def test_example_items_resolve_locally(llm_calls, title, order_lines, group_id):
+    result = ai_services.classify_commodity_group(title, order_lines)
+    assert result["source"] == "local"
+    assert result["commodity_group_id"] == group_id
+    assert llm_calls == []
+
+
+@pytest.mark.parametrize("title, descriptions", [item for item in OUT_OF_SCOPE if item[0] != KNOWN_MISS])
+def test_ambiguous_items_escalate(classifier, title, descriptions):
+    assert classifier.classify(title, _lines(descriptions)) is None
+
+
+def test_partial_match_escalates_to_the_llm(classifier, llm_calls):
+    # "rental" is a keyword of 001 and the softmax alone is confident; "forklift" belongs elsewhere
+    prediction = classifier.predict("Forklift rental", _lines(["Forklift rental, 1 week"]))
+    assert prediction.confidence > classifier_module.LOCAL_CLASSIFIER_THRESHOLD
+    assert prediction.similarity < classifier_module.LOCAL_CLASSIFIER_MIN_SIMILARITY or (
+        prediction.margin < classifier_module.LOCAL_CLASSIFIER_MIN_MARGIN
+    )
+    ai_services.classify_commodity_group("Forklift rental", _lines(["Forklift rental, 1 week"]))
+    assert llm_calls == ["Forklift rental"]
+
+
+def test_defaults_are_the_calibrated_gates(classifier):
+    best, _ = sweep(classifier, MAX_ERROR_RATE)
+    assert (best["threshold"], best["min_similarity"], best["min_margin"]) == (
+        classifier_module.LOCAL_CLASSIFIER_THRESHOLD,
+        classifier_module.LOCAL_CLASSIFIER_MIN_SIMILARITY,
+        classifier_module.LOCAL_CLASSIFIER_MIN_MARGIN,
+    )
+    assert best["error_rate"] <= MAX_ERROR_RATE
+    assert best["coverage"] >= 0.9
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+
+import orjson
+import pytest
+
+import export
+
+IDENTITY = {"accept-encoding": "identity"}
+GZIP = {"accept-encoding": "gzip"}
+
+
+def _export(client, headers: dict, **params):
+    """Status, headers and raw body of an export, without the client undoing the compression"""
+    with client.stream("GET", "/api/export", params=params, headers=headers) as response:
+        return response.status_code, response.headers, b"".join(response.iter_raw())
+
+
+def _rows(format: str, body: bytes) -> list:
+    if format == "csv":
+        return list(csv.DictReader(io.StringIO(body.decode())))
+    return [orjson.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+@pytest.mark.parametrize("compressed", [False, True])
+def test_requests_export(client, make_requests, monkeypatch, format, compressed):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 2)  # several chunks per export
+    ids = make_requests(5, lines=2)
+
+    status, headers, body = _export(client, GZIP if compressed else IDENTITY, format=format)
+
+    assert status == 200
+    assert headers["content-type"].startswith(export.EXPORT_FORMATS[format][0].split(";")[0])
+    assert headers["content-disposition"] == f'attachment; filename="requests.{format}"'
+    if compressed:
+        assert headers["content-encoding"] == "gzip"
+        body = gzip.decompress(body)
+    else:
+        assert "content-encoding" not in headers
+    rows = _rows(format, body)
+    # Oldest first: make_requests creates them newest first
+    assert [int(row["id"]) for row in rows] == ids[::-1]
+    assert {row["title"] for row in rows} == {f"Request {i}" for i in range(5)}
+    assert float(rows[0]["total_cost"]) == 200.0
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_order_lines_export(client, make_requests, format):
+    ids = make_requests(3, lines=2)
+
+    _, _, body = _export(client, IDENTITY, format=format, rows="order_lines")
+
+    rows = _rows(format, body)
+    assert [int(row["request_id"]) for row in rows] == [request_id for request_id in ids[::-1] for _ in range(2)]
+    assert [row["position_description"] for row in rows[:2]] == ["Item 0", "Item 1"]
+    assert rows[0]["title"] == "Request 2" and rows[0]["vendor_name"] == "Vendor 2"
+
+
+def test_filters_and_include_archived(client, make_requests, archive_requests):
+    ids = make_requests(6)
+    archive_requests([ids[1], ids[3]])
+
+    def exported(**params) -> list:
+        _, _, body = _export(client, IDENTITY, format="ndjson", **params)
+        return sorted(row["id"] for row in _rows("ndjson", body))
+
+    assert exported() == sorted(set(ids) - {ids[1], ids[3]})
+    assert exported(include_archived=True) == sorted(ids)
+    # archive_requests closes the newest request too, which stays live
+    assert exported(status="Closed") == [ids[-1]]
+    assert exported(status="Closed", include_archived=True) == sorted([ids[1], ids[3], ids[-1]])
+    assert exported(vendor_name="Vendor 1", include_archived=True) == [ids[1]]
+    _, _, body = _export(client, IDENTITY, format="ndjson", rows="order_lines", vendor_name="Vendor 3",
+                         include_archived="true")
+    assert [row["request_id"] for row in _rows("ndjson", body)] == [ids[3]] * 3
+
+
+def test_parquet_without_pyarrow_is_a_client_error(client, make_requests, monkeypatch):
+    make_requests(1)
+    monkeypatch.setattr(export, "pyarrow", None)
+
+    response = client.get("/api/export", params={"format": "parquet"})
+
+    assert response.status_code == 400
+    assert "pyarrow" in response.json()["detail"]
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/api/export", params={"format": "xlsx"}).status_code == 422
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+import extraction
+from ai_services import PdfLimitError, extract_text_from_pdf
+from benchmarks.load_test import minimal_pdf
+from extraction import UploadedPdf, extract_pdf_data, unpack_batch
+
+
+def _zip(members: dict) -> UploadedPdf:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, contents in members.items():
+            archive.writestr(name, contents)
+    return UploadedPdf.from_bytes("batch.zip", buffer.getvalue())
+
+
+def _no_reads(archive, member):
+    raise AssertionError(f"{member.filename} was inflated")
+
+
+def test_batch_file_count_is_checked_before_inflating(monkeypatch):
+    monkeypatch.setattr(extraction, "MAX_BATCH_FILES", 2)
+    monkeypatch.setattr(extraction, "_read_member", _no_reads)
+    with pytest.raises(ValueError):
+        unpack_batch([_zip({f"{i}.pdf": b"%PDF" for i in range(3)})])
+
+
+def test_batch_size_is_checked_before_inflating(monkeypatch):
+    monkeypatch.setattr(extraction, "MAX_BATCH_BYTES", 1000)
+    monkeypatch.setattr(extraction, "_read_member", _no_reads)
+    # Compresses to almost nothing but inflates past the limit
+    with pytest.raises(PdfLimitError):
+        unpack_batch([_zip({"a.pdf": b"\0" * 600, "b.pdf": b"\0" * 600})])
+
+
+def test_large_members_spill_to_temp_files(monkeypatch):
+    monkeypatch.setattr(extraction, "UPLOAD_MEMORY_THRESHOLD_BYTES", 100)
+    small, large = unpack_batch([_zip({"small.pdf": b"%PDF small", "large.pdf": b"%PDF" + b"x" * 500})])
+    try:
+        assert small.data == b"%PDF small"
+        assert large.data is None and os.path.exists(large.path)
+        assert large.read_bytes() == b"%PDF" + b"x" * 500
+        assert large.digest == extraction.pdf_digest(large.read_bytes())
+    finally:
+        large.cleanup()
+    assert not os.path.exists(large.path)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    sources = []
+
+    async def parse(source):
+        sources.append(source)
+        return extract_text_from_pdf(source)
+
+    async def extract(pdf_text):
+        return {"vendor_name": pdf_text.strip()}
+
+    monkeypatch.setattr(extraction, "extract_text_from_pdf_async", parse)
+    monkeypatch.setattr(extraction, "extract_vendor_offer_data_async", extract)
+    return sources
+
+
+def test_upload_is_parsed_from_the_spooled_file(client, fake_llm):
+    response = client.post(
+        "/api/upload-pdf", files={"file": ("offer.pdf", minimal_pdf("Spooled Vendor GmbH"), "application/pdf")}
+    )
+    assert response.status_code == 200
+    assert response.json()["vendor_name"] == "Spooled Vendor GmbH"
+    assert not isinstance(fake_llm[0], (bytes, str))
+
+
+def test_oversized_upload_is_rejected_from_content_length(client, monkeypatch, fake_llm):
+    monkeypatch.setattr(extraction, "MAX_UPLOAD_BYTES", 1000)
+    response = client.post("/api/upload-pdf", files={"file": ("big.pdf", b"%PDF" + b"x" * 200_000, "application/pdf")})
+    assert response.status_code == 413
+    assert fake_llm == []
+
+
+def test_oversized_upload_without_content_length_is_cut_off(client, monkeypatch, fake_llm):
+    monkeypatch.setattr(extraction, "MAX_UPLOAD_BYTES", 1000)
+
+    def body():
+        for _ in range(100):
+            yield b"x" * 10_000
+
+    # A generator body is sent chunked, so only the byte counter can catch it
+    response = client.post(
+        "/api/upload-pdf", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"}
+    )
+    assert response.status_code == 413
+    assert fake_llm == []
+
+
+def test_cancelled_caller_keeps_its_upload_until_the_shared_parse_ends(monkeypatch):
+    gate = asyncio.Event()
+    parsing = asyncio.Event()
+
+    async def parse(source):
+        parsing.set()
+        await gate.wait()
+        return "text"
+
+    async def extract(pdf_text):
+        return {"vendor_name": pdf_text}
+
+    monkeypatch.setattr(extraction, "extract_text_from_pdf_async", parse)
+    monkeypatch.setattr(extraction, "extract_vendor_offer_data_async", extract)
+
+    async def scenario():
+        contents = b"%PDF shared " + os.urandom(8)
+        first = asyncio.ensure_future(extract_pdf_data(UploadedPdf.from_bytes("first.pdf", contents)))
+        await parsing.wait()
+        second = asyncio.ensure_future(extract_pdf_data(UploadedPdf.from_bytes("second.pdf", contents)))
+        await asyncio.sleep(0)
+
+        # The shared parse reads the first caller's upload, so the first caller must outlive it
+        first.cancel()
+        await asyncio.sleep(0.05)
+        assert not first.done()
+
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert (await second)["vendor_name"] == "text"
+
+    asyncio.run(scenario())
+
+
+def test_extraction_cache_is_read_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def get(key):
+        threads.append(threading.current_thread())
+        return {"vendor_name": "cached"}
+
+    monkeypatch.setattr(extraction.extraction_cache, "get", get)
+    result = asyncio.run(extract_pdf_data(UploadedPdf.from_bytes("cached.pdf", b"%PDF cached")))
+    assert result == {"vendor_name": "cached"}
+    assert threads and threads[0] is not threading.main_thread()
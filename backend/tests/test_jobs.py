@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import OperationalError
+
+import jobs
+from database import SessionLocal
+from extraction import UploadedPdf
+from models import ExtractionJob
+
+RESULT = {"vendor_name": "Stub Supplies GmbH", "order_lines": []}
+
+
+def _status(job_id: str) -> str:
+    with SessionLocal() as db:
+        return db.get(ExtractionJob, job_id).status
+
+
+def test_worker_survives_database_errors(monkeypatch):
+    first = jobs._create(UploadedPdf.from_bytes("first.pdf", b"%PDF-1"))
+    second = jobs._create(UploadedPdf.from_bytes("second.pdf", b"%PDF-2"))
+    claim = jobs._claim
+
+    def flaky_claim(job_id):
+        if job_id == first.id:
+            raise OperationalError("UPDATE extraction_jobs", {}, Exception("database is locked"))
+        return claim(job_id)
+
+    async def extract(upload):
+        return RESULT
+
+    monkeypatch.setattr(jobs, "_claim", flaky_claim)
+    monkeypatch.setattr(jobs, "extract_pdf_data", extract)
+    monkeypatch.setattr(jobs, "_queue", None)
+
+    async def run():
+        jobs._queue = asyncio.Queue()
+        jobs._queue.put_nowait(first.id)
+        jobs._queue.put_nowait(second.id)
+        worker = asyncio.create_task(jobs._worker())
+        await asyncio.wait_for(jobs._queue.join(), timeout=5)
+        assert not worker.done()
+        worker.cancel()
+
+    asyncio.run(run())
+    assert _status(first.id) == "failed"
+    assert _status(second.id) == "completed"
+
+
+def test_prune_deletes_old_finished_jobs():
+    old = jobs._create(UploadedPdf.from_bytes("old.pdf", b"%PDF-old"))
+    recent = jobs._create(UploadedPdf.from_bytes("recent.pdf", b"%PDF-recent"))
+    pending = jobs._create(UploadedPdf.from_bytes("pending.pdf", b"%PDF-pending"))
+    jobs._finish(old.id, RESULT)
+    jobs._finish(recent.id, RESULT)
+    long_ago = datetime.now(timezone.utc) - timedelta(days=jobs.EXTRACTION_JOB_RETENTION_DAYS + 1)
+    with SessionLocal() as db:
+        for job_id in (old.id, pending.id):
+            db.query(ExtractionJob).filter(ExtractionJob.id == job_id).update(
+                {"updated_at": long_ago}, synchronize_session=False
+            )
+        db.commit()
+
+    jobs._prune()
+    with SessionLocal() as db:
+        assert db.get(ExtractionJob, old.id) is None
+        assert db.get(ExtractionJob, recent.id).content is None
+        assert db.get(ExtractionJob, pending.id) is not None
+
+
+def _collect(stream, events: list):
+    async def run():
+        async for message in stream:
+            if not message.startswith(":"):
+                events.append((message.split("\n", 1)[0], asyncio.get_running_loop().time()))
+    return run()
+
+
+def test_events_for_unknown_job_end_with_not_found():
+    events = []
+    asyncio.run(asyncio.wait_for(_collect(jobs.job_events("no-such-job"), events), timeout=5))
+    assert [name for name, _ in events] == ["event: not_found"]
+
+
+def test_events_report_running_as_soon_as_the_job_is_claimed(monkeypatch):
+    job = jobs._create(UploadedPdf.from_bytes("events.pdf", b"%PDF-events"))
+    release = None
+
+    async def extract(upload):
+        await release.wait()
+        return RESULT
+
+    monkeypatch.setattr(jobs, "extract_pdf_data", extract)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        events = []
+        stream = asyncio.create_task(_collect(jobs.job_events(job.id), events))
+        await asyncio.sleep(0.1)
+        started = asyncio.get_running_loop().time()
+        process = asyncio.create_task(jobs._process(job.id))
+        await asyncio.sleep(0.2)
+        # Wakes on the claim, long before the 15 s keep-alive
+        assert [name for name, _ in events] == ["event: status", "event: status"]
+        assert events[1][1] - started < 1
+        release.set()
+        await process
+        jobs._signal(job.id)  # _worker signals after _process returns
+        await asyncio.wait_for(stream, timeout=5)
+        return events
+
+    events = asyncio.run(run())
+    assert [name for name, _ in events][-1] == "event: completed"
+
+
+def test_claim_is_exclusive_and_stamps_the_worker():
+    job = jobs._create(UploadedPdf.from_bytes("claim.pdf", b"%PDF-claim"))
+    assert jobs._claim(job.id) is not None
+    assert jobs._claim(job.id) is None
+    with SessionLocal() as db:
+        row = db.get(ExtractionJob, job.id)
+        assert (row.status, row.worker_id) == ("running", jobs.WORKER_ID)
+        assert row.heartbeat_at is not None
+
+
+def test_recover_leaves_jobs_of_live_workers_alone():
+    live = jobs._create(UploadedPdf.from_bytes("live.pdf", b"%PDF-live"))
+    dead = jobs._create(UploadedPdf.from_bytes("dead.pdf", b"%PDF-dead"))
+    stale = datetime.now(timezone.utc) - timedelta(seconds=jobs.EXTRACTION_JOB_STALE_SECONDS + 1)
+    with SessionLocal() as db:
+        for job_id, worker, heartbeat in ((live.id, "other:1", datetime.now(timezone.utc)), (dead.id, "other:2", stale)):
+            db.query(ExtractionJob).filter(ExtractionJob.id == job_id).update(
+                {"status": "running", "worker_id": worker, "heartbeat_at": heartbeat}, synchronize_session=False
+            )
+        db.commit()
+
+    pending = jobs._recover()
+    assert dead.id in pending and live.id not in pending
+    assert _status(live.id) == "running"
+    assert _status(dead.id) == "pending"
@@ -0,0 +1,68 @@
+import time
+
+import anyio.to_thread
+import fastapi.routing
+
+import main
+import serialization
+from conftest import PROFILING_TOKEN
+
+
+def _server_timing(response) -> dict:
+    phases = {}
+    for entry in response.headers["server-timing"].split(","):
+        name, duration = entry.strip().split(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+
+def test_profiled_list_reports_serialization_time(client, make_requests):
+    make_requests(200, lines=3)
+    response = client.get("/api/requests?limit=200", headers={"X-Profile-Token": PROFILING_TOKEN})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 200
+    timing = _server_timing(response)
+    assert timing["serialize"] > 0
+    assert timing["db"] > 0
+
+
+def test_profiled_detail_reports_serialization_time(client, make_requests):
+    request_id, = make_requests(1)
+    response = client.get(f"/api/requests/{request_id}", headers={"X-Profile-Token": PROFILING_TOKEN})
+    assert response.status_code == 200
+    assert _server_timing(response)["serialize"] > 0
+
+
+def test_profiled_response_model_reports_serialization_time(client, make_requests):
+    make_requests(1)
+    response = client.post("/api/requests", headers={"X-Profile-Token": PROFILING_TOKEN}, json={
+        "requestor_name": "Test", "title": "Profiled", "vendor_name": "Vendor", "vat_id": "DE123456789",
+        "department": "IT", "total_cost": 10.0, "commodity_group_id": "031", "commodity_group": "Software",
+        "order_lines": [{"position_description": "Item", "unit_price": 10.0, "amount": 1, "unit": "pieces", "total_price": 10.0}],
+    })
+    assert response.status_code == 200
+    timing = _server_timing(response)
+    assert 0 < timing["serialize"] < timing["total"]
+
+
+def test_sync_endpoint_thread_is_sampled(client, make_requests, monkeypatch):
+    make_requests(1)
+
+    def slow_statistics(db):
+        time.sleep(0.05)
+        return {}
+
+    monkeypatch.setattr(main, "get_aggregate_statistics", slow_statistics)
+    response = client.get("/api/statistics", headers={"X-Profile-Token": PROFILING_TOKEN})
+
+    folded = client.get(
+        f"/api/profiles/{response.headers['x-profile-id']}", params={"format": "folded"},
+        headers={"X-Profile-Token": PROFILING_TOKEN}
+    ).text
+    assert "slow_statistics" in folded
+
+
+def test_profiling_leaves_library_functions_alone(client):
+    # The app is installed with profiling enabled; nothing may have been wrapped process-wide
+    for function in (anyio.to_thread.run_sync, fastapi.routing.serialize_response, serialization.json_response):
+        assert not hasattr(function, "__wrapped__")
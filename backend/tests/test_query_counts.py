@@ -0,0 +1,33 @@
+"""The request endpoints issue a fixed number of SQL statements however many rows they return"""
+import pytest
+
+
+def _statements_for(client, count_statements, path: str) -> int:
+    with count_statements() as statements:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", ["/api/requests?limit=100", "/api/requests/summary?limit=100"])
+def test_list_statement_count_is_constant(client, make_requests, count_statements, path):
+    counts = []
+    for request_count in (5, 50):
+        make_requests(request_count, lines=4)
+        counts.append(_statements_for(client, count_statements, path))
+    assert counts[0] == counts[1]
+
+
+def test_detail_statement_count_is_constant(client, make_requests, count_statements):
+    counts = []
+    for lines in (2, 20):
+        request_id = make_requests(50, lines=lines)[0]
+        counts.append(_statements_for(client, count_statements, f"/api/requests/{request_id}"))
+    assert counts[0] == counts[1]
+
+
+def test_list_returns_every_order_line(client, make_requests):
+    make_requests(50, lines=4)
+    items = client.get("/api/requests?limit=100").json()["items"]
+    assert len(items) == 50
+    assert all(len(item["order_lines"]) == 4 for item in items)
@@ -0,0 +1,88 @@
+from sqlalchemy import text
+
+from database import SessionLocal
+
+
+def _create(client, title: str, descriptions=(), vendor_name: str = "Vendor", department: str = "IT") -> int:
+    response = client.post("/api/requests", json={
+        "requestor_name": "Test", "title": title, "vendor_name": vendor_name, "vat_id": "DE123456789",
+        "department": department, "total_cost": 10.0 * len(descriptions),
+        "commodity_group_id": "031", "commodity_group": "Software",
+        "order_lines": [
+            {"position_description": description, "unit_price": 10.0, "amount": 1, "unit": "pieces", "total_price": 10.0}
+            for description in descriptions
+        ],
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _search(client, q: str, **filters) -> list:
+    response = client.get("/api/requests/search", params={"q": q, **filters})
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()["items"]]
+
+
+def _indexed(request_id: int) -> bool:
+    with SessionLocal() as db:
+        return db.execute(text("SELECT 1 FROM request_search WHERE rowid = :id"), {"id": request_id}).first() is not None
+
+
+def test_title_hits_outrank_description_hits(client, make_requests):
+    make_requests(0)
+    in_title = _create(client, "Monitor arms", ["Desk mounts"])
+    in_vendor = _create(client, "Desk mounts", ["Articulated"], vendor_name="Monitor Supplies")
+    in_description = _create(client, "Desk equipment", ["Monitor arms"])
+
+    # The newest request comes first on ties, so this order is the weighting alone
+    assert _search(client, "monitor") == [in_title, in_vendor, in_description]
+    scores = [item["score"] for item in client.get("/api/requests/search", params={"q": "monitor"}).json()["items"]]
+    assert scores == sorted(scores, reverse=True) and scores[0] > scores[-1]
+
+
+def test_last_term_matches_as_a_prefix(client, make_requests):
+    make_requests(0)
+    laptops = _create(client, "Laptops for developers", ["Dell Latitude"])
+    _create(client, "Lab equipment", ["Dell centrifuge"])
+
+    assert _search(client, "dell lat") == [laptops]
+    assert _search(client, "lapt") == [laptops]
+    # Only the last term is a prefix, and single characters are not
+    assert _search(client, "lapt dell") == []
+    assert _search(client, "laptops l") == []
+
+
+def test_filters_combine_with_the_query(client, make_requests):
+    make_requests(0)
+    it = _create(client, "Printer toner", ["Toner black"], department="IT")
+    marketing = _create(client, "Printer paper", ["Paper A4"], department="Marketing", vendor_name="Paper Co")
+    _create(client, "Office chairs", ["Chair"], department="Marketing")
+
+    assert sorted(_search(client, "printer")) == sorted([it, marketing])
+    assert _search(client, "printer", department="Marketing") == [marketing]
+    assert _search(client, "printer", vendor_name="Paper Co") == [marketing]
+    assert _search(client, "printer", department="Finance") == []
+
+
+def test_index_follows_creates_updates_and_archival(client, make_requests, archive_requests):
+    ids = make_requests(3)
+    created = _create(client, "Standing desks", ["Height adjustable desk"])
+    newest = _create(client, "Desk lamps", ["LED lamp"])
+    assert _indexed(created)
+    assert _search(client, "adjustable") == [created]
+
+    client.patch(f"/api/requests/{created}/status", json={"new_status": "In Progress"})
+    assert _search(client, "adjustable", status="In Progress") == [created]
+    assert _search(client, "adjustable", status="Open") == []
+
+    bulk = client.post("/api/requests/bulk", json=[{
+        "requestor_name": "Test", "title": "Desk drawers", "vendor_name": "Vendor", "vat_id": "DE123456789",
+        "department": "IT", "total_cost": 0.0, "commodity_group_id": "015", "commodity_group": "Office Supplies",
+        "order_lines": [],
+    }]).json()["results"][0]["id"]
+    assert sorted(_search(client, "desk")) == sorted([created, newest, bulk])
+
+    archive_requests([created, ids[0]])
+    assert not _indexed(created)
+    assert _search(client, "adjustable") == []
+    assert sorted(_search(client, "desk")) == sorted([newest, bulk])
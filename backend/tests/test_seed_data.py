@@ -0,0 +1,23 @@
+import random
+from datetime import datetime, timezone
+
+import seed_data
+
+
+def test_updated_at_is_the_latest_status_change():
+    requests, _, history = seed_data._generate_chunk(
+        random.Random(7), 1, 500, datetime.now(timezone.utc), seed_data.DEFAULT_STATUS_WEIGHTS,
+        30, "uniform", 1, 4
+    )
+
+    changes = {}
+    for row in history:
+        changes.setdefault(row["request_id"], []).append(row)
+    assert {request["status"] for request in requests} == set(seed_data.STATUSES)
+    for request in requests:
+        transitions = changes[request["id"]]
+        times = [row["changed_at"] for row in transitions]
+        assert times == sorted(times)
+        assert times[0] == request["created_at"]
+        assert request["updated_at"] == times[-1]
+        assert transitions[-1]["new_status"] == request["status"]
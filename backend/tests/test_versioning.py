@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+import versioning
+
+
+def _request(title: str) -> dict:
+    return {
+        "requestor_name": "Test", "title": title, "vendor_name": "Vendor", "vat_id": "DE123456789",
+        "department": "IT", "total_cost": 10.0, "commodity_group_id": "031", "commodity_group": "Software",
+        "order_lines": [{"position_description": "Item", "unit_price": 10.0, "amount": 1, "unit": "pieces", "total_price": 10.0}],
+    }
+
+
+def test_get_returns_a_weak_etag(client, make_requests):
+    make_requests(2)
+
+    response = client.get("/api/statistics")
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'W/"{versioning._read_version()}"'
+    assert response.headers["cache-control"] == "no-cache"
+    # Routes outside CONDITIONAL_ROUTES get none
+    assert "etag" not in client.get("/api/commodity-groups").headers
+
+
+def test_matching_if_none_match_gets_a_304(client, make_requests):
+    ids = make_requests(2)
+    etag = client.get(f"/api/requests/{ids[0]}").headers["etag"]
+
+    for if_none_match in (etag, etag.removeprefix("W/"), f'"0", {etag}', "*"):
+        response = client.get(f"/api/requests/{ids[0]}", headers={"if-none-match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    assert client.get(f"/api/requests/{ids[0]}", headers={"if-none-match": 'W/"0"'}).status_code == 200
+
+
+@pytest.mark.parametrize("write", [
+    lambda client, ids: client.post("/api/requests", json=_request("Created")),
+    lambda client, ids: client.post("/api/requests/bulk", json=[_request("Created")]),
+    lambda client, ids: client.patch(f"/api/requests/{ids[0]}/status", json={"new_status": "Closed"}),
+    lambda client, ids: client.patch("/api/requests/status", json={"ids": ids, "new_status": "Closed"}),
+], ids=["create", "bulk_create", "status", "bulk_status"])
+def test_writes_bump_the_version_and_invalidate_cached_responses(client, make_requests, write):
+    ids = make_requests(2)
+    before = client.get("/api/statistics")
+    assert client.get("/api/statistics").json() == before.json()  # now served from the response cache
+
+    assert write(client, ids).status_code == 200
+
+    after = client.get("/api/statistics")
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.json() != before.json()
+    assert client.get("/api/statistics", headers={"if-none-match": before.headers["etag"]}).status_code == 200
+
+
+def test_concurrent_identical_gets_share_one_computation(client, make_requests, monkeypatch):
+    make_requests(2)
+    calls = []
+    statistics = main.get_aggregate_statistics
+
+    def slow_statistics(db):
+        calls.append(threading.get_ident())
+        time.sleep(0.3)
+        return statistics(db)
+
+    monkeypatch.setattr(main, "get_aggregate_statistics", slow_statistics)
+    versioning._responses.clear()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: client.get("/api/statistics"), range(8)))
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert len({response.content for response in responses}) == 1
+    assert len(calls) == 1
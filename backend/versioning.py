@@ -0,0 +1,188 @@
+"""
+Data version and conditional GET handling for the read endpoints.
+
+Every write to procurement requests bumps a single counter in data_version inside its own
+transaction. The counter is the ETag of the list, summary, detail, statistics and
+analytics responses: a client sending it back in If-None-Match gets a 304 without the
+endpoint running at all. Responses to identical GETs at the same version are kept for
+RESPONSE_CACHE_TTL_SECONDS, and concurrent identical GETs share one computation.
+
+Each process caches the counter for up to DATA_VERSION_TTL_SECONDS; its own writes
+refresh it on commit, so only writes made by other processes can go unseen that long.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from starlette.routing import Match
+
+import profiling
+from cache import SingleFlight
+from database import SessionLocal
+from models import DataVersion
+
+DATA_VERSION_TTL_SECONDS = float(os.getenv("DATA_VERSION_TTL_SECONDS", 1.0))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 2.0))
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", 256))
+
+# Route templates whose GET responses depend only on the data version and the query string
+CONDITIONAL_ROUTES = {
+    "/api/requests",
+    "/api/requests/summary",
+    "/api/requests/search",
+    "/api/requests/{request_id}",
+    "/api/statistics",
+    "/api/analytics/spend",
+    "/api/analytics/lead-times",
+}
+
+_lock = threading.Lock()
+_version: Optional[int] = None
+_version_read_at = 0.0
+# Incremented by local commits so a read that raced with one is not cached
+_generation = 0
+
+_responses: "OrderedDict[tuple, tuple]" = OrderedDict()
+_computations = SingleFlight()
+
+
+def ensure_data_version(db: Session):
+    if db.get(DataVersion, 1) is None:
+        db.add(DataVersion(id=1, version=1))
+        db.commit()
+
+
+def bump_version(db: Session):
+    """Advance the data version as part of db's current transaction"""
+    db.execute(update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1))
+    db.info["data_version_bumped"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _forget_version(session):
+    global _version, _generation
+    if session.info.pop("data_version_bumped", False):
+        with _lock:
+            _version = None
+            _generation += 1
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_bump(session):
+    session.info.pop("data_version_bumped", None)
+
+
+def _read_version() -> int:
+    with SessionLocal() as db:
+        return db.get(DataVersion, 1).version
+
+
+async def current_version() -> int:
+    """The data version, read from the database at most once per DATA_VERSION_TTL_SECONDS"""
+    global _version, _version_read_at
+    with _lock:
+        if _version is not None and time.monotonic() - _version_read_at < DATA_VERSION_TTL_SECONDS:
+            return _version
+        generation = _generation
+    read_at = time.monotonic()
+    version = await run_in_threadpool(_read_version)
+    with _lock:
+        if generation == _generation:
+            _version, _version_read_at = version, read_at
+    return version
+
+
+def _cached_response(key: tuple) -> Optional[tuple]:
+    with _lock:
+        entry = _responses.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _responses[key]
+            return None
+        _responses.move_to_end(key)
+        return entry[1]
+
+
+def _store_response(key: tuple, response: tuple):
+    with _lock:
+        _responses[key] = (time.monotonic() + RESPONSE_CACHE_TTL_SECONDS, response)
+        _responses.move_to_end(key)
+        while len(_responses) > RESPONSE_CACHE_ENTRIES:
+            _responses.popitem(last=False)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+class ConditionalGetMiddleware:
+    """ASGI middleware answering GETs on CONDITIONAL_ROUTES with ETags, 304s and cached responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Profiled requests always run the endpoint so there is something to profile
+        conditional = scope["type"] == "http" and scope["method"] == "GET" and not profiling.is_profiling()
+        if not conditional or not self._match_route(scope):
+            await self.app(scope, receive, send)
+            return
+
+        version = await current_version()
+        etag = f'W/"{version}"'
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match and _etag_matches(if_none_match.decode("latin-1"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode()), (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Response encoding depends on what the client accepts, so it is part of the key
+        key = (scope["path"], scope["query_string"], headers.get(b"accept-encoding", b""), version)
+        response = _cached_response(key)
+        if response is None:
+            response = await _computations.do(key, lambda: self._compute(scope, receive, key))
+
+        status, response_headers, body = response
+        if status == 200:
+            response_headers = response_headers + [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _match_route(self, scope) -> bool:
+        """Resolve the route up front, as the router would, and check it is a conditional one"""
+        for route in scope["app"].router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                if getattr(route, "path", None) not in CONDITIONAL_ROUTES:
+                    return False
+                scope.update(child_scope)
+                return True
+        return False
+
+    async def _compute(self, scope, receive, key: tuple) -> tuple:
+        """Run the endpoint, buffering its response; successful ones are cached"""
+        start, chunks = {}, []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(dict(scope), receive, capture)
+        response = (start["status"], list(start.get("headers", [])), b"".join(chunks))
+        if response[0] == 200:
+            _store_response(key, response)
+        return response
@@ -1,27 +1,82 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import DashboardStats from './DashboardStats'
 import './Dashboard.css'
 
 const API_URL = 'http://localhost:8000/api'
+const PAGE_SIZE = 50
+
+// Newest first, matching the API's (created_at, id) ordering
+const compareRequests = (a, b) =>
+  b.created_at.localeCompare(a.created_at) || b.id - a.id
 
 function Dashboard() {
   const [requests, setRequests] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [statusCounts, setStatusCounts] = useState({})
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [filter, setFilter] = useState('All')
   const [selectedRequest, setSelectedRequest] = useState(null)
   const [updatingStatus, setUpdatingStatus] = useState(false)
   const [refreshStats, setRefreshStats] = useState(0)
+  const [statsVersion, setStatsVersion] = useState(0)
   const [showStats, setShowStats] = useState(false)
+  const statsRefreshTimer = useRef(null)
 
   useEffect(() => {
     fetchRequests()
-  }, [])
+  }, [filter])
+
+  useEffect(() => {
+    fetchStatusCounts()
+  }, [refreshStats])
+
+  // Apply the server's change feed to the loaded rows instead of refetching the list
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/changes`)
+    source.addEventListener('request_created', (event) => applyChange(JSON.parse(event.data)))
+    source.addEventListener('status_changed', (event) => applyChange(JSON.parse(event.data)))
+    source.addEventListener('reset', () => {
+      fetchRequests()
+      setRefreshStats(prev => prev + 1)
+    })
+    return () => {
+      source.close()
+      clearTimeout(statsRefreshTimer.current)
+    }
+  }, [filter])
+
+  const applyChange = (request) => {
+    const matches = filter === 'All' || request.status === filter
+    setRequests(prev => {
+      const rows = prev.filter(row => row.id !== request.id)
+      // Rows older than the last loaded one arrive with "Load more"
+      const loaded = rows.length === 0 || compareRequests(request, rows[rows.length - 1]) <= 0
+      if (!matches || !loaded) return rows
+      return [...rows, request].sort(compareRequests)
+    })
+    setStatusCounts(prev => {
+      const counts = { ...prev, [request.status]: (prev[request.status] || 0) + 1 }
+      if (request.old_status) counts[request.old_status] = (prev[request.old_status] || 0) - 1
+      return counts
+    })
+    setSelectedRequest(prev => prev && prev.id === request.id ? { ...prev, ...request } : prev)
+    // Coalesce bursts of changes into one statistics reload for the sidebar
+    clearTimeout(statsRefreshTimer.current)
+    statsRefreshTimer.current = setTimeout(() => setStatsVersion(prev => prev + 1), 1000)
+  }
+
+  const fetchRequests = async (cursor = null) => {
+    const params = { limit: PAGE_SIZE }
+    if (filter !== 'All') params.status = filter
+    if (cursor) params.cursor = cursor
 
-  const fetchRequests = async () => {
     try {
-      const response = await axios.get(`${API_URL}/requests`)
-      setRequests(response.data)
+      const response = await axios.get(`${API_URL}/requests/summary`, { params })
+      const { items, next_cursor } = response.data
+      setRequests(prev => cursor ? [...prev, ...items] : items)
+      setNextCursor(next_cursor)
     } catch (error) {
       console.error('Error fetching requests:', error)
     } finally {
@@ -29,6 +84,30 @@ function Dashboard() {
     }
   }
 
+  const fetchStatusCounts = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/statistics`)
+      setStatusCounts(response.data.status_distribution || {})
+    } catch (error) {
+      console.error('Error fetching status counts:', error)
+    }
+  }
+
+  const viewRequest = async (requestId) => {
+    try {
+      const response = await axios.get(`${API_URL}/requests/${requestId}`)
+      setSelectedRequest(response.data)
+    } catch (error) {
+      console.error('Error fetching request details:', error)
+    }
+  }
+
+  const loadMore = async () => {
+    setLoadingMore(true)
+    await fetchRequests(nextCursor)
+    setLoadingMore(false)
+  }
+
   const updateStatus = async (requestId, newStatus) => {
     setUpdatingStatus(true)
     try {
@@ -36,8 +115,7 @@ function Dashboard() {
         new_status: newStatus,
         notes: `Status changed to ${newStatus}`
       })
-      await fetchRequests()
-      setRefreshStats(prev => prev + 1) // Trigger stats refresh
+      // The change feed updates the table and counts
       setSelectedRequest(null)
     } catch (error) {
       console.error('Error updating status:', error)
@@ -47,9 +125,7 @@ function Dashboard() {
     }
   }
 
-  const filteredRequests = filter === 'All'
-    ? requests
-    : requests.filter(req => req.status === filter)
+  const totalCount = Object.values(statusCounts).reduce((sum, count) => sum + count, 0)
 
   const getStatusClass = (status) => {
     return status.toLowerCase().replace(' ', '-')
@@ -82,25 +158,25 @@ function Dashboard() {
               className={filter === 'All' ? 'active' : ''}
               onClick={() => setFilter('All')}
             >
-              All ({requests.length})
+              All ({totalCount})
             </button>
             <button
               className={filter === 'Open' ? 'active' : ''}
               onClick={() => setFilter('Open')}
             >
-              Open ({requests.filter(r => r.status === 'Open').length})
+              Open ({statusCounts['Open'] || 0})
             </button>
             <button
               className={filter === 'In Progress' ? 'active' : ''}
               onClick={() => setFilter('In Progress')}
             >
-              In Progress ({requests.filter(r => r.status === 'In Progress').length})
+              In Progress ({statusCounts['In Progress'] || 0})
             </button>
             <button
               className={filter === 'Closed' ? 'active' : ''}
               onClick={() => setFilter('Closed')}
             >
-              Closed ({requests.filter(r => r.status === 'Closed').length})
+              Closed ({statusCounts['Closed'] || 0})
             </button>
           </div>
         </div>
@@ -122,14 +198,14 @@ function Dashboard() {
             </tr>
           </thead>
           <tbody>
-            {filteredRequests.length === 0 ? (
+            {requests.length === 0 ? (
               <tr>
                 <td colSpan="10" style={{ textAlign: 'center' }}>
                   No requests found
                 </td>
               </tr>
             ) : (
-              filteredRequests.map(request => (
+              requests.map(request => (
                 <tr key={request.id}>
                   <td>{request.id}</td>
                   <td>{request.title}</td>
@@ -147,7 +223,7 @@ function Dashboard() {
                   <td>
                     <button
                       className="btn-view"
-                      onClick={() => setSelectedRequest(request)}
+                      onClick={() => viewRequest(request.id)}
                     >
                       View
                     </button>
@@ -157,6 +233,13 @@ function Dashboard() {
             )}
           </tbody>
         </table>
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn-load-more" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
 
       {selectedRequest && (
@@ -255,7 +338,7 @@ function Dashboard() {
         </div>
       )}
       </div>
-      {showStats && <DashboardStats refreshTrigger={refreshStats} />}
+      {showStats && <DashboardStats refreshTrigger={refreshStats + statsVersion} />}
     </div>
   )
 }